@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException, status
 from stustapay.bon.bon import BonJson
 from stustapay.core.http.auth_user import CurrentAuthToken
 from stustapay.core.http.context import ContextOrderService
-from stustapay.core.http.normalize_data import NormalizedList, normalize_list
+from stustapay.core.http.normalize_data import AfterId, NormalizedList, PageLimit, normalize_list
 from stustapay.core.schema.order import CompletedSaleProducts, EditSaleProducts, Order
 
 router = APIRouter(
@@ -14,8 +14,20 @@ router = APIRouter(
 
 
 @router.get("/by-till/{till_id}", response_model=NormalizedList[Order, int])
-async def list_orders_by_till(token: CurrentAuthToken, till_id: int, order_service: ContextOrderService, node_id: int):
-    return normalize_list(await order_service.list_orders_by_till(token=token, till_id=till_id, node_id=node_id))
+async def list_orders_by_till(
+    token: CurrentAuthToken,
+    till_id: int,
+    order_service: ContextOrderService,
+    node_id: int,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
+):
+    return normalize_list(
+        await order_service.list_orders_by_till(
+            token=token, till_id=till_id, node_id=node_id, after_id=after_id, limit=limit
+        ),
+        limit=limit,
+    )
 
 
 @router.get("", response_model=NormalizedList[Order, int])
@@ -24,9 +36,14 @@ async def list_orders(
     order_service: ContextOrderService,
     node_id: int,
     customer_account_id: int,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
 ):
     return normalize_list(
-        await order_service.list_orders(token=token, customer_account_id=customer_account_id, node_id=node_id)
+        await order_service.list_orders(
+            token=token, customer_account_id=customer_account_id, node_id=node_id, after_id=after_id, limit=limit
+        ),
+        limit=limit,
     )
 
 
@@ -1,19 +1,26 @@
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
 from stustapay.core.http.auth_user import CurrentAuthToken
 from stustapay.core.http.context import ContextOrderService
+from stustapay.core.service.order.live_stats import live_order_stats
 from stustapay.core.service.order.stats import (
     FreeTicketStats,
     PaymentMethodStatsResponse,
     ProductStats,
+    StatsOverview,
     TimeseriesStats,
     TimeseriesStatsQuery,
     VoucherStats,
 )
 
+# comment lines sent while no deltas arrive, keeps proxies from closing idle streams
+LIVE_STATS_KEEPALIVE_INTERVAL = 15.0
+
 router = APIRouter(
     prefix="/stats",
     tags=["stats"],
@@ -122,3 +129,43 @@ async def get_free_ticket_stats(
         query=TimeseriesStatsQuery(to_time=to_timestamp, from_time=from_timestamp),
         node_id=node_id,
     )
+
+
+@router.get("/overview", response_model=StatsOverview)
+async def get_stats_overview(
+    token: CurrentAuthToken,
+    order_service: ContextOrderService,
+    node_id: int,
+    to_timestamp: Optional[datetime] = None,
+    from_timestamp: Optional[datetime] = None,
+):
+    return await order_service.stats.get_stats_overview(
+        token=token,
+        query=TimeseriesStatsQuery(to_time=to_timestamp, from_time=from_timestamp),
+        node_id=node_id,
+    )
+
+
+async def _live_stats_events(node_id: int) -> AsyncIterator[str]:
+    with live_order_stats.subscribe(node_id) as subscription:
+        while True:
+            try:
+                delta = await asyncio.wait_for(subscription.get(), timeout=LIVE_STATS_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if delta is None:
+                # deltas were lost, the client has to reload the full stats and reconnect
+                yield "event: reset\ndata: {}\n\n"
+                return
+            yield f"event: delta\ndata: {delta.model_dump_json()}\n\n"
+
+
+@router.get("/live", response_class=StreamingResponse)
+async def get_live_stats(token: CurrentAuthToken, order_service: ContextOrderService, node_id: int):
+    """
+    Server-sent events with the revenue, order count and per product deltas of all sales at this node and its
+    children, see LiveStatsDelta.
+    """
+    await order_service.stats.check_live_stats_access(token=token, node_id=node_id)
+    return StreamingResponse(_live_stats_events(node_id), media_type="text/event-stream")
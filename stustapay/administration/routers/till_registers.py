@@ -3,7 +3,7 @@ from pydantic import BaseModel
 
 from stustapay.core.http.auth_user import CurrentAuthToken
 from stustapay.core.http.context import ContextCashierService, ContextOrderService, ContextTillService
-from stustapay.core.http.normalize_data import NormalizedList, normalize_list
+from stustapay.core.http.normalize_data import AfterId, NormalizedList, PageLimit, normalize_list
 from stustapay.core.schema.cashier import CashierShift
 from stustapay.core.schema.order import Transaction
 from stustapay.core.schema.till import CashRegister, NewCashRegister
@@ -44,11 +44,14 @@ async def list_transactions(
     order_service: ContextOrderService,
     node_id: int,
     register_id: int,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
 ):
     return normalize_list(
         await order_service.list_transactions_by_cash_register(
-            token=token, cash_register_id=register_id, node_id=node_id
-        )
+            token=token, cash_register_id=register_id, node_id=node_id, after_id=after_id, limit=limit
+        ),
+        limit=limit,
     )
 
 
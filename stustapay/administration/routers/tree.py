@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from stustapay.bon.bon import BonJson
 from stustapay.core.http.auth_user import CurrentAuthToken
 from stustapay.core.http.context import ContextDsfinvkService, ContextTreeService, ContextWebhookService
+from stustapay.core.http.normalize_data import AfterId, PageLimit
 from stustapay.core.schema.audit_logs import AuditLog, AuditLogDetail
 from stustapay.core.schema.media import EventDesign, NewBlob
 from stustapay.core.schema.tree import (
@@ -260,8 +261,14 @@ async def configure_sumup_token(
 
 
 @router.get("/nodes/{node_id}/audit-logs", response_model=list[AuditLog])
-async def list_audit_logs(token: CurrentAuthToken, tree_service: ContextTreeService, node_id: int):
-    return await tree_service.list_audit_logs(token=token, node_id=node_id)
+async def list_audit_logs(
+    token: CurrentAuthToken,
+    tree_service: ContextTreeService,
+    node_id: int,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
+):
+    return await tree_service.list_audit_logs(token=token, node_id=node_id, after_id=after_id, limit=limit)
 
 
 @router.get("/nodes/{node_id}/audit-logs/{audit_log_id}", response_model=AuditLogDetail)
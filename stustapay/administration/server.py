@@ -10,20 +10,26 @@ from stustapay.core.config import Config
 from stustapay.core.database import get_database
 from stustapay.core.healthcheck import run_healthcheck
 from stustapay.core.http.context import Context
-from stustapay.core.service.account import AccountService
+from stustapay.core.service.account import AccountService, system_account_id_cache
 from stustapay.core.service.cashier import CashierService
+from stustapay.core.service.common.decorators import transaction_retry_counters
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.common.privileges import user_privilege_cache
 from stustapay.core.service.config import ConfigService
 from stustapay.core.service.customer.customer import CustomerService
 from stustapay.core.service.dsfinvk import DsfinvkService
 from stustapay.core.service.mail import MailService
 from stustapay.core.service.media import MediaService
 from stustapay.core.service.order import OrderService
+from stustapay.core.service.order.live_stats import live_order_stats
+from stustapay.core.service.order.stats_cache import order_stats_cache
 from stustapay.core.service.product import ProductService
 from stustapay.core.service.sumup import SumUpService
 from stustapay.core.service.tax_rate import TaxRateService
 from stustapay.core.service.terminal import TerminalService
 from stustapay.core.service.ticket import TicketService
 from stustapay.core.service.till.till import TillService
+from stustapay.core.service.tree.cache import event_settings_cache, node_tree_cache
 from stustapay.core.service.tree.service import TreeService
 from stustapay.core.service.tse import TseService
 from stustapay.core.service.user import AuthService, UserService
@@ -152,7 +158,31 @@ class Api:
             mail_service=mail_service,
         )
         try:
-            self.server.add_task(asyncio.create_task(run_healthcheck(db, service_name="administration")))
+            self.server.add_task(
+                asyncio.create_task(
+                    run_healthcheck(
+                        db,
+                        service_name="administration",
+                        metrics=[
+                            event_settings_cache.metrics,
+                            transaction_retry_counters.metrics,
+                            live_order_stats.metrics,
+                            order_stats_cache.metrics,
+                        ],
+                    )
+                )
+            )
+            notification_listener = NotificationListener(
+                [
+                    node_tree_cache,
+                    event_settings_cache,
+                    user_privilege_cache,
+                    live_order_stats,
+                    order_stats_cache,
+                    system_account_id_cache,
+                ]
+            )
+            self.server.add_task(asyncio.create_task(notification_listener.run(self.cfg.database, db_pool)))
             self.server.add_task(asyncio.create_task(mail_service.run_mail_service()))
             self.server.add_task(asyncio.create_task(terminal_service.run_mdm_polling()))
             await self.server.run(context)
@@ -232,7 +232,8 @@ async def generate_bon_json(db_pool: asyncpg.Pool, order_id: int) -> BonJson | N
 
         aggregations = await conn.fetch_many(
             TaxRateAggregation,
-            "select tax_name, tax_rate, total_price, total_tax, total_no_tax "
+            "select tax_name, tax_rate, tax_rate_total_price as total_price, tax_rate_total_tax as total_tax, "
+            "   tax_rate_total_no_tax as total_no_tax "
             "from order_tax_rates "
             "where id = $1 "
             "order by tax_rate",
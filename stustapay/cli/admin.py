@@ -1,9 +1,11 @@
 import asyncio
-from typing import Annotated
+from typing import Annotated, Optional
 
 import typer
 
 from stustapay.core import admin, populate
+from stustapay.core.schema.account import AccountType
+from stustapay.core.service.account import HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES
 
 admin_cli = typer.Typer()
 
@@ -26,6 +28,26 @@ def register_tag_with_user(
     asyncio.run(admin.register_tag_with_user(config=ctx.obj.config, user_id=user_id, tag_pin=tag_pin, tag_uid=tag_uid))
 
 
+@admin_cli.command()
+def shard_system_accounts(
+    ctx: typer.Context,
+    node_id: Annotated[int, typer.Option(help="Id of the event node whose system accounts should be sharded")],
+    n_shards: Annotated[int, typer.Option("--n-shards", "-n", help="Number of balance shards, 1 disables sharding")],
+    account_types: Annotated[
+        Optional[list[AccountType]], typer.Option("--account-type", help="System accounts to shard")
+    ] = None,
+):
+    """Split the balance of high traffic system accounts such that bookings of different tills do not block each other."""
+    asyncio.run(
+        admin.shard_system_accounts(
+            config=ctx.obj.config,
+            node_id=node_id,
+            n_shards=n_shards,
+            account_types=account_types or list(HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES),
+        )
+    )
+
+
 @admin_cli.command()
 def create_cash_registers(
     ctx: typer.Context,
@@ -5,6 +5,7 @@ from typing import Annotated, Optional
 
 import typer
 
+from stustapay.festivalsimulator.booking_benchmark import BookingBenchmark
 from stustapay.festivalsimulator.database_setup import DatabaseSetup, TagEntryCustom
 from stustapay.festivalsimulator.festivalsetup import FestivalSetup
 from stustapay.festivalsimulator.festivalsimulator import Simulator
@@ -101,3 +102,27 @@ def start(
     config = ctx.obj.config
     simulator = Simulator(config=config, bookings_per_second=bookings_per_second)
     asyncio.run(simulator.run())
+
+
+@simulate_cli.command()
+def booking_benchmark(
+    ctx: typer.Context,
+    node_id: Annotated[int, typer.Option(help="Id of the event node whose system accounts are used")],
+    till_counts: Annotated[
+        list[int], typer.Option("--n-tills", help="Numbers of concurrently booking tills to measure")
+    ] = [1, 2, 4, 8, 16, 32],
+    n_shards: Annotated[int, typer.Option(help="Number of system account balance shards to compare against")] = 16,
+    duration: Annotated[float, typer.Option(help="Seconds to measure per number of tills")] = 5.0,
+    hold_time: Annotated[float, typer.Option(help="Seconds each booking transaction is kept open")] = 0.005,
+):
+    """Measure how booking throughput scales with the number of tills, with and without sharded system accounts."""
+    config = ctx.obj.config
+    benchmark = BookingBenchmark(
+        config=config,
+        node_id=node_id,
+        till_counts=till_counts,
+        n_shards=n_shards,
+        duration=duration,
+        hold_time=hold_time,
+    )
+    asyncio.run(benchmark.run())
@@ -3,6 +3,7 @@ from typing import Annotated, Optional
 
 import typer
 
+from stustapay.tse.claim_benchmark import TseClaimBenchmark
 from stustapay.tse.signature_processor import SignatureProcessor
 from stustapay.tse.simulator import Simulator
 from stustapay.tse.tse_switchover import TseSwitchover
@@ -56,3 +57,26 @@ def tse_switchover(
 ):
     switch = TseSwitchover(config=ctx.obj.config, show=show, nc=nc, disable=disable, tse=tse)
     asyncio.run(switch.run())
+
+
+@tse_cli.command()
+def claim_benchmark(
+    ctx: typer.Context,
+    node_id: Annotated[int, typer.Option(help="Id of the tree node the benchmark tills and TSEs are created at")],
+    tse_counts: Annotated[
+        list[int], typer.Option("--n-tses", help="Numbers of concurrently signing TSEs to measure")
+    ] = [1, 2, 4, 8],
+    n_tills: Annotated[int, typer.Option(help="Number of tills sharing the TSEs")] = 50,
+    n_orders: Annotated[int, typer.Option(help="Number of orders to sign per number of TSEs")] = 2000,
+    sign_time: Annotated[float, typer.Option(help="Seconds a simulated TSE takes per signature")] = 0.0,
+):
+    """Measure how signature request claiming scales with the number of TSEs."""
+    benchmark = TseClaimBenchmark(
+        config=ctx.obj.config,
+        node_id=node_id,
+        tse_counts=tse_counts,
+        n_tills=n_tills,
+        n_orders=n_orders,
+        sign_time=sign_time,
+    )
+    asyncio.run(benchmark.run())
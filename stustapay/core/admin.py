@@ -4,7 +4,9 @@ from pprint import pprint
 from . import database
 from .config import Config
 from .database import get_database
+from .schema.account import AccountType
 from .schema.user import NewUser, RoleToNode, User
+from .service.account import set_system_account_balance_shards
 from .service.auth import AuthService
 from .service.tree.common import fetch_node
 from .service.user import UserService, fetch_user, list_user_roles, update_user
@@ -80,3 +82,20 @@ async def register_tag_with_user(config: Config, user_id: int, tag_pin: str, tag
             pprint(final_user)
     finally:
         await db_pool.close()
+
+
+async def shard_system_accounts(config: Config, node_id: int, n_shards: int, account_types: list[AccountType]):
+    db = get_database(config.database)
+    db_pool = await db.create_pool()
+    try:
+        await database.check_revision_version(db)
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                node = await fetch_node(conn=conn, node_id=node_id)
+                assert node is not None
+                await set_system_account_balance_shards(
+                    conn=conn, node=node, n_shards=n_shards, account_types=account_types
+                )
+        print(f"system accounts {', '.join(t.name for t in account_types)} now use {n_shards} balance shards")
+    finally:
+        await db_pool.close()
@@ -34,6 +34,8 @@ class CoreConfig(BaseModel):
 
     mdm_synchronization_interval: timedelta = timedelta(minutes=5)
 
+    terminal_heartbeat_flush_interval: timedelta = timedelta(seconds=5)
+
 
 class CustomerPortalApiConfig(HTTPServerConfig):
     base_url: str
@@ -41,12 +43,19 @@ class CustomerPortalApiConfig(HTTPServerConfig):
     port: int = 8082
 
 
+class TseConfig(BaseModel):
+    # local address of the signature processor metrics endpoint
+    metrics_host: str = "localhost"
+    metrics_port: int = 8084
+
+
 class Config(BaseModel):
     database: DatabaseConfig
     core: CoreConfig
     administration: AdministrationApiConfig
     terminalserver: TerminalApiConfig
     customerportal: CustomerPortalApiConfig
+    tse: TseConfig = TseConfig()
 
 
 def read_config(config_path: os.PathLike) -> Config:
@@ -5,6 +5,7 @@ import os
 import traceback
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Sequence
 
 from pydantic import BaseModel
 from sftkit.database import Database
@@ -16,6 +17,7 @@ class Healtcheck(BaseModel):
     timestamp: str
     service_name: str
     healthy: bool
+    metrics: dict[str, float] = {}
 
 
 def get_healthcheck_dir() -> Path:
@@ -26,7 +28,19 @@ def get_healthcheck_dir() -> Path:
     return prod_path
 
 
-async def write_healtcheck_status(db: Database, healthcheck_dir: Path, service_name: str):
+MetricsCallback = Callable[[], dict[str, float]]
+
+
+def _collect_metrics(metrics: Sequence[MetricsCallback]) -> dict[str, float]:
+    collected: dict[str, float] = {}
+    for callback in metrics:
+        collected.update(callback())
+    return collected
+
+
+async def write_healtcheck_status(
+    db: Database, healthcheck_dir: Path, service_name: str, metrics: Sequence[MetricsCallback] = ()
+):
     try:
         await check_revision_version(db)
         healthy = True
@@ -34,7 +48,12 @@ async def write_healtcheck_status(db: Database, healthcheck_dir: Path, service_n
         healthy = False
 
     try:
-        status = Healtcheck(timestamp=datetime.now().isoformat(), service_name=service_name, healthy=healthy)
+        status = Healtcheck(
+            timestamp=datetime.now().isoformat(),
+            service_name=service_name,
+            healthy=healthy,
+            metrics=_collect_metrics(metrics),
+        )
         status_file_name = healthcheck_dir / f"{service_name}.json"
         status_file_name.parent.mkdir(parents=True, exist_ok=True)
         with status_file_name.open("w+") as f:
@@ -43,7 +62,7 @@ async def write_healtcheck_status(db: Database, healthcheck_dir: Path, service_n
         logging.error(f"An unexpected error occured during healthcheck {traceback.format_exc()}")
 
 
-async def run_healthcheck(db: Database, service_name: str):
+async def run_healthcheck(db: Database, service_name: str, metrics: Sequence[MetricsCallback] = ()):
     try:
         healthcheck_dir = get_healthcheck_dir()
     except:  # pylint: disable=bare-except
@@ -52,7 +71,9 @@ async def run_healthcheck(db: Database, service_name: str):
 
     try:
         while True:
-            await write_healtcheck_status(db, service_name=service_name, healthcheck_dir=healthcheck_dir)
+            await write_healtcheck_status(
+                db, service_name=service_name, healthcheck_dir=healthcheck_dir, metrics=metrics
+            )
             await asyncio.sleep(30)
     except asyncio.CancelledError:
         return
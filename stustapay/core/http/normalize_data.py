@@ -1,17 +1,31 @@
-from typing import Generic, TypeVar
+from typing import Annotated, Generic, Optional, TypeVar
 
+from fastapi import Query
 from pydantic import BaseModel
 
 T = TypeVar("T")
 K = TypeVar("K")
 
+MAX_PAGE_SIZE = 1000
+
+# keyset pagination of list endpoints, a page contains the entries following the entry with id after_id
+AfterId = Annotated[Optional[int], Query(description="Only list entries after the entry with this id")]
+PageLimit = Annotated[
+    Optional[int], Query(gt=0, le=MAX_PAGE_SIZE, description="Maximum number of entries, all entries if not given")
+]
+
 
 class NormalizedList(BaseModel, Generic[T, K]):
     ids: list[K]
     entities: dict[K, T]
+    # set if the list was limited and more entries might follow, pass as after_id to fetch the next page
+    next_after_id: Optional[K] = None
 
 
-def normalize_list(elements: list[T], primary_key="id") -> NormalizedList[T, K]:
+def normalize_list(elements: list[T], primary_key="id", limit: Optional[int] = None) -> NormalizedList[T, K]:
+    ids = [getattr(x, primary_key) for x in elements]
     return NormalizedList(
-        ids=[getattr(x, primary_key) for x in elements], entities={getattr(x, primary_key): x for x in elements}
+        ids=ids,
+        entities={getattr(x, primary_key): x for x in elements},
+        next_after_id=ids[-1] if limit is not None and len(ids) >= limit else None,
     )
@@ -74,6 +74,20 @@ class UserTagHistoryEntry(BaseModel):
         return format_user_tag_uid(self.user_tag_uid)
 
 
+class AccountCore(BaseModel):
+    """account fields required for bookings, see the account_core view"""
+
+    node_id: int
+    id: int
+    type: AccountType
+    balance: float
+    vouchers: int
+
+    user_tag_id: Optional[int]
+    user_tag_uid: Optional[int]
+    user_tag_variant_ids: list[int] = []
+
+
 class Account(BaseModel):
     node_id: int
     id: int
@@ -0,0 +1,16 @@
+-- migration: 5d2c9e07
+-- requires: a8f3e291
+
+-- high traffic system accounts (e.g. sale_exit, cash_entry) can split their balance into multiple shards such that
+-- concurrent bookings from different tills do not serialize on the row lock of the account.
+-- the effective balance of an account is its own balance plus the sum of all its shard balances
+alter table account add column balance_shards int not null default 1;
+
+create table account_balance_shard (
+    account_id bigint  not null references account (id),
+    shard      int     not null,
+    primary key (account_id, shard),
+
+    balance    numeric not null default 0,
+    vouchers   bigint  not null default 0
+);
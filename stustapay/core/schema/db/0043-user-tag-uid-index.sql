@@ -0,0 +1,6 @@
+-- migration: 7b1e4c92
+-- requires: 5d2c9e07
+
+-- customers are looked up by the uid of their tag on every terminal request, the covering index allows resolving the
+-- tag id and node without touching the table
+create index user_tag_uid_idx on user_tag (uid) include (id, node_id);
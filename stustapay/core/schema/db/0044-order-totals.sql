@@ -0,0 +1,19 @@
+-- migration: c4a85f1d
+-- requires: 7b1e4c92
+
+-- order totals are stored on the order itself instead of being aggregated from its line items on every read,
+-- they are kept up to date by the update_order_totals trigger on line_item
+alter table ordr add column total_price numeric not null default 0;
+alter table ordr add column total_tax numeric not null default 0;
+alter table ordr add column total_no_tax numeric not null default 0;
+
+update ordr o set
+    total_price = t.total_price,
+    total_tax = t.total_tax,
+    total_no_tax = t.total_price - t.total_tax
+from (
+    select l.order_id, sum(l.total_price) as total_price, sum(l.total_tax) as total_tax
+    from line_item l
+    group by l.order_id
+) t
+where o.id = t.order_id;
@@ -0,0 +1,14 @@
+-- migration: 9e3b7a60
+-- requires: c4a85f1d
+
+-- the order and transaction listings are paginated by id, these indices return the entries of a till, customer,
+-- cashier or account in id order such that a page only reads the rows it returns
+drop index ordr_till_id_idx;
+drop index ordr_customer_account_id_idx;
+drop index ordr_cashier_id_idx;
+create index ordr_till_id_idx on ordr (till_id, id);
+create index ordr_customer_account_id_idx on ordr (customer_account_id, id);
+create index ordr_cashier_id_idx on ordr (cashier_id, till_id, id);
+
+create index transaction_source_account_idx on transaction (source_account, id);
+create index transaction_target_account_idx on transaction (target_account, id);
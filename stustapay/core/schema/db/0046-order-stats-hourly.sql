@@ -0,0 +1,37 @@
+-- migration: 3f6d2b18
+-- requires: 9e3b7a60
+
+-- hourly rollup of all line items per till, product, payment method and order type, the statistics endpoints read
+-- from it instead of aggregating all orders of an event. It is kept up to date by the update_order_stats_hourly
+-- triggers on line_item. n_orders counts every order once, on the row of its first line item.
+create table order_stats_hourly (
+    till_id           bigint      not null references till (id),
+    hour              timestamptz not null,
+    product_id        bigint      not null references product (id),
+    payment_method    text        not null references payment_method (name),
+    order_type        text        not null references order_type (name),
+    primary key (till_id, hour, product_id, payment_method, order_type),
+
+    n_orders          bigint      not null default 0,
+    quantity          bigint      not null default 0,
+    total_price       numeric     not null default 0,
+    vouchers_redeemed bigint      not null default 0
+);
+
+insert into order_stats_hourly (
+    till_id, hour, product_id, payment_method, order_type, n_orders, quantity, total_price, vouchers_redeemed
+)
+select
+    o.till_id,
+    date_trunc('hour', o.booked_at),
+    l.product_id,
+    o.payment_method,
+    o.order_type,
+    count(*) filter (where l.item_id = f.first_item_id),
+    sum(l.quantity),
+    sum(l.total_price),
+    sum(l.vouchers_redeemed)
+from line_item l
+    join ordr o on l.order_id = o.id
+    join (select order_id, min(item_id) as first_item_id from line_item group by order_id) f on l.order_id = f.order_id
+group by o.till_id, date_trunc('hour', o.booked_at), l.product_id, o.payment_method, o.order_type;
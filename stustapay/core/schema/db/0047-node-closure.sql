@@ -0,0 +1,16 @@
+-- migration: b84f0c3a
+-- requires: 3f6d2b18
+
+-- closure of the node tree, contains a row for every node and each of its ancestors including the node itself.
+-- subtree filters join on it instead of checking node.parent_ids, which cannot be answered by an index.
+-- it is filled by the insert_node_closure trigger, tree moves are not allowed.
+create table node_closure (
+    ancestor_id bigint not null references node (id) on delete cascade,
+    node_id     bigint not null references node (id) on delete cascade,
+    primary key (ancestor_id, node_id)
+);
+create index node_closure_node_id_idx on node_closure (node_id, ancestor_id);
+
+insert into node_closure (ancestor_id, node_id)
+select distinct a.ancestor_id, n.id
+from node n, unnest(n.parent_ids || n.id) as a(ancestor_id);
@@ -69,9 +69,43 @@ create view user_to_roles_aggregated as
         user_to_role utr
     group by utr.user_id, utr.node_id;
 
+-- lean projection of accounts for the booking paths, account_with_history additionally aggregates the tag history
+create view account_core as
+    select
+        a.id,
+        a.node_id,
+        a.type,
+        a.balance + coalesce(shards.balance, 0) as balance,
+        a.vouchers + coalesce(shards.vouchers, 0) as vouchers,
+        a.user_tag_id,
+        ut.uid                                              as user_tag_uid,
+        coalesce(variants.variant_ids, '{}'::bigint array) as user_tag_variant_ids
+    from
+        account a
+        left join user_tag ut on a.user_tag_id = ut.id
+        left join lateral (
+            select sum(s.balance) as balance, sum(s.vouchers) as vouchers
+            from account_balance_shard s where s.account_id = a.id
+        ) shards on true
+        left join lateral (
+            select array_agg(utv.id order by utv.priority, utv.variant_name) as variant_ids
+            from user_tag_to_variant uttv join user_tag_variant utv on uttv.variant_id = utv.id
+            where uttv.user_tag_id = a.user_tag_id
+        ) variants on true;
+
 create view account_with_history as
     select
-        a.*,
+        a.id,
+        a.type,
+        a.name,
+        a.comment,
+        -- the effective balance of accounts with balance shards is spread across the account and its shards
+        a.balance + coalesce(shards.balance, 0) as balance,
+        a.vouchers + coalesce(shards.vouchers, 0) as vouchers,
+        a.node_id,
+        a.user_tag_id,
+        a.activated_at,
+        a.balance_shards,
         ut.uid                                 as user_tag_uid,
         ut.pin                                 as user_tag_pin,
         ut.comment                             as user_tag_comment,
@@ -81,6 +115,10 @@ create view account_with_history as
     from
         account a
         left join user_tag ut on a.user_tag_id = ut.id
+        left join lateral (
+            select sum(s.balance) as balance, sum(s.vouchers) as vouchers
+            from account_balance_shard s where s.account_id = a.id
+        ) shards on true
         left join (
             select
                 uttv.user_tag_id,
@@ -334,23 +372,28 @@ create view line_item_aggregated_json as
     )
     select
         order_id,
-        sum(total_price)                                       as total_price,
-        sum(total_tax)                                         as total_tax,
-        sum(total_price - total_tax)                           as total_no_tax,
         coalesce(json_agg(line_item_json), json_build_array()) as line_items
     from
         line_item_json
     group by
         order_id;
 
+-- orders with their stored totals but without their line items, for everything which does not need the line items
+create view order_summary as
+    select
+        ordr.*,
+        ut.uid as customer_tag_uid,
+        ut.id  as customer_tag_id
+    from
+        ordr
+        left join account a on ordr.customer_account_id = a.id
+        left join user_tag ut on a.user_tag_id = ut.id;
+
 create view order_value as
     select
         ordr.*,
         ut.uid                                      as customer_tag_uid,
         ut.id                                       as customer_tag_id,
-        coalesce(li.total_price, 0)                 as total_price,
-        coalesce(li.total_tax, 0)                   as total_tax,
-        coalesce(li.total_no_tax, 0)                as total_no_tax,
         coalesce(li.line_items, json_build_array()) as line_items
     from
         ordr
@@ -367,29 +410,39 @@ create view transaction_with_order as
         left join order_value o on t.order_id = o.id
     order by t.id asc;
 
--- show all line items
+-- show all line items, the line item totals are renamed as they clash with the stored order totals
 create view order_items as
     select
         ordr.*,
-        line_item.*
+        line_item.order_id,
+        line_item.item_id,
+        line_item.product_id,
+        line_item.product_price,
+        line_item.quantity,
+        line_item.tax_name,
+        line_item.tax_rate,
+        line_item.tax_rate_id,
+        line_item.vouchers_redeemed,
+        line_item.total_price as item_total_price,
+        line_item.total_tax   as item_total_tax
     from
         ordr
         left join line_item on (ordr.id = line_item.order_id);
 
--- aggregated tax rate of items
+-- aggregated tax rate of items, the totals per tax rate are prefixed as they clash with the stored order totals
 create view order_tax_rates as
     select
         ordr.*,
-        tax_name,
-        tax_rate,
-        sum(total_price)             as total_price,
-        sum(total_tax)               as total_tax,
-        sum(total_price - total_tax) as total_no_tax
+        l.tax_name,
+        l.tax_rate,
+        sum(l.total_price)               as tax_rate_total_price,
+        sum(l.total_tax)                 as tax_rate_total_tax,
+        sum(l.total_price - l.total_tax) as tax_rate_total_no_tax
     from
         ordr
-        join line_item on (ordr.id = order_id)
+        join line_item l on (ordr.id = l.order_id)
     group by
-        ordr.id, tax_rate, tax_name;
+        ordr.id, l.tax_rate, l.tax_name;
 
 create view event_with_translations as
     select
@@ -115,6 +115,25 @@ create trigger update_trace_trigger
     for each row
 execute function update_node_path();
 
+create or replace function insert_node_closure() returns trigger as
+$$
+begin
+    insert into node_closure (ancestor_id, node_id)
+    select distinct a.ancestor_id, NEW.id
+    from unnest(NEW.parent_ids || NEW.id) as a(ancestor_id);
+
+    return NEW;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists insert_node_closure_trigger on node;
+create trigger insert_node_closure_trigger
+    after insert
+    on node
+    for each row
+execute function insert_node_closure();
+
 create or replace function check_node_update() returns trigger as
 $$
 begin
@@ -424,7 +443,7 @@ begin
     values (
         NEW.id
     );
-    perform pg_notify('tse_signature', NEW.id::text);
+    perform pg_notify('tse_signature', json_build_object('order_id', NEW.id, 'till_id', NEW.till_id)::text);
 
     -- send general notifications, used e.g. for instant UI updates
     perform pg_notify('order',
@@ -443,6 +462,131 @@ create trigger new_order_trigger
     for each row
 execute function new_order_added();
 
+create or replace function update_order_totals() returns trigger as
+$$
+begin
+    -- recomputed from all line items of the affected orders, independent of how many statements inserted them
+    update ordr o set
+        total_price = t.total_price,
+        total_tax = t.total_tax,
+        total_no_tax = t.total_price - t.total_tax
+    from (
+        select l.order_id, sum(l.total_price) as total_price, sum(l.total_tax) as total_tax
+        from line_item l
+        where l.order_id in (select n.order_id from new_line_items n)
+        group by l.order_id
+    ) t
+    where o.id = t.order_id;
+
+    return null;
+end;
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists line_item_insert_order_totals_trigger on line_item;
+create trigger line_item_insert_order_totals_trigger
+    after insert
+    on line_item
+    referencing new table as new_line_items
+    for each statement
+execute function update_order_totals();
+
+drop trigger if exists line_item_update_order_totals_trigger on line_item;
+create trigger line_item_update_order_totals_trigger
+    after update
+    on line_item
+    referencing new table as new_line_items
+    for each statement
+execute function update_order_totals();
+
+create or replace function add_line_items_to_order_stats_hourly() returns trigger as
+$$
+begin
+    -- an order is counted on its first line item, unless some of its line items were inserted by an earlier statement
+    insert into order_stats_hourly as s (
+        till_id, hour, product_id, payment_method, order_type, n_orders, quantity, total_price, vouchers_redeemed
+    )
+    select
+        o.till_id,
+        date_trunc('hour', o.booked_at),
+        n.product_id,
+        o.payment_method,
+        o.order_type,
+        count(*) filter (
+            where n.item_id = f.first_item_id
+            and f.n_items = (select count(*) from line_item l where l.order_id = n.order_id)
+        ),
+        sum(n.quantity),
+        sum(n.total_price),
+        sum(n.vouchers_redeemed)
+    from new_line_items n
+        join ordr o on n.order_id = o.id
+        join (
+            select order_id, min(item_id) as first_item_id, count(*) as n_items from new_line_items group by order_id
+        ) f on n.order_id = f.order_id
+    group by o.till_id, date_trunc('hour', o.booked_at), n.product_id, o.payment_method, o.order_type
+    on conflict (till_id, hour, product_id, payment_method, order_type) do update set
+        n_orders = s.n_orders + excluded.n_orders,
+        quantity = s.quantity + excluded.quantity,
+        total_price = s.total_price + excluded.total_price,
+        vouchers_redeemed = s.vouchers_redeemed + excluded.vouchers_redeemed;
+
+    return null;
+end;
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists line_item_insert_order_stats_hourly_trigger on line_item;
+create trigger line_item_insert_order_stats_hourly_trigger
+    after insert
+    on line_item
+    referencing new table as new_line_items
+    for each statement
+execute function add_line_items_to_order_stats_hourly();
+
+create or replace function update_line_items_in_order_stats_hourly() returns trigger as
+$$
+begin
+    -- updated line items still belong to the same order, therefore only the line item sums change
+    insert into order_stats_hourly as s (
+        till_id, hour, product_id, payment_method, order_type, quantity, total_price, vouchers_redeemed
+    )
+    select
+        o.till_id,
+        date_trunc('hour', o.booked_at),
+        d.product_id,
+        o.payment_method,
+        o.order_type,
+        sum(d.quantity),
+        sum(d.total_price),
+        sum(d.vouchers_redeemed)
+    from (
+        select n.order_id, n.product_id, n.quantity, n.total_price, n.vouchers_redeemed
+        from new_line_items n
+        union all
+        select p.order_id, p.product_id, -p.quantity, -p.total_price, -p.vouchers_redeemed
+        from old_line_items p
+    ) d
+        join ordr o on d.order_id = o.id
+    group by o.till_id, date_trunc('hour', o.booked_at), d.product_id, o.payment_method, o.order_type
+    on conflict (till_id, hour, product_id, payment_method, order_type) do update set
+        quantity = s.quantity + excluded.quantity,
+        total_price = s.total_price + excluded.total_price,
+        vouchers_redeemed = s.vouchers_redeemed + excluded.vouchers_redeemed;
+
+    return null;
+end;
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists line_item_update_order_stats_hourly_trigger on line_item;
+create trigger line_item_update_order_stats_hourly_trigger
+    after update
+    on line_item
+    referencing old table as old_line_items new table as new_line_items
+    for each statement
+execute function update_line_items_in_order_stats_hourly();
+
 create or replace function tse_signature_update_trigger_procedure() returns trigger as
 $$
 begin
@@ -568,3 +712,171 @@ create trigger create_customer_info_trigger
     for each row
     when (NEW.type = 'private')
 execute function create_customer_info();
+
+-- notify the node tree caches of the api servers about any change in the tree, events or their translations
+create or replace function notify_tree_changed() returns trigger as
+$$
+begin
+    perform pg_notify('tree_changed', '');
+    return null;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists node_tree_changed_trigger on node;
+create trigger node_tree_changed_trigger
+    after insert or update or delete
+    on node
+    for each statement
+execute function notify_tree_changed();
+
+drop trigger if exists event_tree_changed_trigger on event;
+create trigger event_tree_changed_trigger
+    after insert or update or delete
+    on event
+    for each statement
+execute function notify_tree_changed();
+
+drop trigger if exists translation_text_tree_changed_trigger on translation_text;
+create trigger translation_text_tree_changed_trigger
+    after insert or update or delete
+    on translation_text
+    for each statement
+execute function notify_tree_changed();
+
+drop trigger if exists forbidden_objects_at_node_tree_changed_trigger on forbidden_objects_at_node;
+create trigger forbidden_objects_at_node_tree_changed_trigger
+    after insert or update or delete
+    on forbidden_objects_at_node
+    for each statement
+execute function notify_tree_changed();
+
+drop trigger if exists forbidden_objects_in_subtree_at_node_tree_changed_trigger on forbidden_objects_in_subtree_at_node;
+create trigger forbidden_objects_in_subtree_at_node_tree_changed_trigger
+    after insert or update or delete
+    on forbidden_objects_in_subtree_at_node
+    for each statement
+execute function notify_tree_changed();
+
+-- notify the privilege caches of the api servers about any change in role assignments or role privileges
+create or replace function notify_privileges_changed() returns trigger as
+$$
+begin
+    perform pg_notify('privileges_changed', '');
+    return null;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists user_to_role_privileges_changed_trigger on user_to_role;
+create trigger user_to_role_privileges_changed_trigger
+    after insert or update or delete
+    on user_to_role
+    for each statement
+execute function notify_privileges_changed();
+
+drop trigger if exists user_role_to_event_privilege_privileges_changed_trigger on user_role_to_event_privilege;
+create trigger user_role_to_event_privilege_privileges_changed_trigger
+    after insert or update or delete
+    on user_role_to_event_privilege
+    for each statement
+execute function notify_privileges_changed();
+
+drop trigger if exists user_role_to_node_privilege_privileges_changed_trigger on user_role_to_node_privilege;
+create trigger user_role_to_node_privilege_privileges_changed_trigger
+    after insert or update or delete
+    on user_role_to_node_privilege
+    for each statement
+execute function notify_privileges_changed();
+
+-- notify the event settings caches of the api servers about any change in the event settings or their translations
+create or replace function notify_event_settings_changed() returns trigger as
+$$
+begin
+    perform pg_notify('event_settings_changed', '');
+    return null;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists event_settings_changed_trigger on event;
+create trigger event_settings_changed_trigger
+    after insert or update or delete
+    on event
+    for each statement
+execute function notify_event_settings_changed();
+
+drop trigger if exists translation_text_event_settings_changed_trigger on translation_text;
+create trigger translation_text_event_settings_changed_trigger
+    after insert or update or delete
+    on translation_text
+    for each statement
+execute function notify_event_settings_changed();
+
+create or replace function notify_till_catalog_changed() returns trigger as
+$$
+begin
+    perform pg_notify('till_catalog_changed', '');
+    return null;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists product_till_catalog_changed_trigger on product;
+create trigger product_till_catalog_changed_trigger
+    after insert or update or delete
+    on product
+    for each statement
+execute function notify_till_catalog_changed();
+
+drop trigger if exists tax_rate_till_catalog_changed_trigger on tax_rate;
+create trigger tax_rate_till_catalog_changed_trigger
+    after insert or update or delete
+    on tax_rate
+    for each statement
+execute function notify_till_catalog_changed();
+
+drop trigger if exists product_user_tag_variant_till_catalog_changed_trigger on product_user_tag_variant;
+create trigger product_user_tag_variant_till_catalog_changed_trigger
+    after insert or update or delete
+    on product_user_tag_variant
+    for each statement
+execute function notify_till_catalog_changed();
+
+drop trigger if exists till_button_product_till_catalog_changed_trigger on till_button_product;
+create trigger till_button_product_till_catalog_changed_trigger
+    after insert or update or delete
+    on till_button_product
+    for each statement
+execute function notify_till_catalog_changed();
+
+drop trigger if exists till_layout_to_button_till_catalog_changed_trigger on till_layout_to_button;
+create trigger till_layout_to_button_till_catalog_changed_trigger
+    after insert or update or delete
+    on till_layout_to_button
+    for each statement
+execute function notify_till_catalog_changed();
+
+drop trigger if exists till_profile_till_catalog_changed_trigger on till_profile;
+create trigger till_profile_till_catalog_changed_trigger
+    after insert or update or delete
+    on till_profile
+    for each statement
+execute function notify_till_catalog_changed();
+
+-- notify the signature processor about any change in the till to tse assignment
+create or replace function notify_till_tse_changed() returns trigger as
+$$
+begin
+    perform pg_notify('till_tse_changed', '');
+    return null;
+end
+$$ language plpgsql
+    set search_path = "$user", public;
+
+drop trigger if exists till_tse_changed_trigger on till;
+create trigger till_tse_changed_trigger
+    after insert or update of tse_id or delete
+    on till
+    for each statement
+execute function notify_till_tse_changed();
@@ -46,11 +46,14 @@ alter table transaction add constraint conducting_user_id_or_order_is_set
     check ((order_id is null) != (conducting_user_id is null));
 alter table transaction add constraint source_target_account_different
     check (source_account != target_account);
+
 alter table transaction add constraint amount_positive
     check (amount >= 0);
 alter table transaction add constraint vouchers_positive
     check (vouchers >= 0);
 
+alter table account add constraint balance_shards_positive check ( balance_shards >= 1 );
+
 alter table tse_signature add constraint result_message_set
     check ((result_message is null) = (signature_status = 'new' or signature_status = 'pending'));
 alter table tse_signature add constraint tse_id_set
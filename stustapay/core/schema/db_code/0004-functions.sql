@@ -1,3 +1,56 @@
+-- add amount and vouchers_amount to the balance of an account.
+-- accounts with multiple balance shards are not updated directly, instead the balance of the shard selected by
+-- balance_shard_key (e.g. the till id) is updated such that concurrent bookings do not wait on the same row lock
+create or replace function add_to_account_balance(
+    account_id bigint,
+    amount numeric,
+    vouchers_amount bigint,
+    balance_shard_key bigint default null
+) returns void as
+$$
+<<locals>> declare
+    n_shards int;
+    balance_after_booking numeric;
+    rounding_epsilon numeric;
+begin
+    -- keep in sync with stustapay/core/schema/account.py is_balance_negative
+    rounding_epsilon := 0.001;
+
+    if balance_shard_key is not null then
+        select a.balance_shards into locals.n_shards from account a where a.id = add_to_account_balance.account_id;
+    end if;
+
+    if coalesce(locals.n_shards, 1) <= 1 then
+        update account a set
+            balance = a.balance + add_to_account_balance.amount,
+            vouchers = a.vouchers + add_to_account_balance.vouchers_amount
+            where a.id = add_to_account_balance.account_id
+            returning a.balance into locals.balance_after_booking;
+        if abs(locals.balance_after_booking) < locals.rounding_epsilon then
+            update account a set balance = 0 where a.id = add_to_account_balance.account_id;
+        end if;
+    else
+        insert into account_balance_shard as s (account_id, shard, balance, vouchers)
+        values (
+            add_to_account_balance.account_id,
+            mod(abs(add_to_account_balance.balance_shard_key), locals.n_shards),
+            add_to_account_balance.amount,
+            add_to_account_balance.vouchers_amount
+        )
+        on conflict on constraint account_balance_shard_pkey do update set
+            balance = s.balance + excluded.balance,
+            vouchers = s.vouchers + excluded.vouchers
+        returning s.balance into locals.balance_after_booking;
+        if abs(locals.balance_after_booking) < locals.rounding_epsilon then
+            update account_balance_shard s set balance = 0
+            where s.account_id = add_to_account_balance.account_id
+                and s.shard = mod(abs(add_to_account_balance.balance_shard_key), locals.n_shards);
+        end if;
+    end if;
+end;
+$$ language plpgsql
+    set search_path = "$user", public;
+
 -- book a new transaction and update the account balances automatically, returns the new transaction_id
 create or replace function book_transaction(
     order_id bigint,
@@ -7,19 +60,14 @@ create or replace function book_transaction(
     amount numeric,
     vouchers_amount bigint,
     booked_at timestamptz default now(),
-    conducting_user_id bigint default null
+    conducting_user_id bigint default null,
+    balance_shard_key bigint default null
 ) returns bigint as
 $$
 <<locals>> declare
     transaction_id  bigint;
-    target_balance_after_booking numeric;
-    source_balance_after_booking numeric;
     temp_account_id bigint;
-    rounding_epsilon numeric;
 begin
-    -- keep in sync with stustapay/core/schema/account.py is_balance_negative
-    rounding_epsilon := 0.001;
-
     if vouchers_amount * amount < 0 then raise 'vouchers_amount and amount must have the same sign'; end if;
 
     if amount < 0 or vouchers_amount < 0 then
@@ -48,16 +96,18 @@ begin
     returning id into locals.transaction_id;
 
     -- update account values
-    update account set balance = balance - amount, vouchers = vouchers - vouchers_amount
-        where id = source_account_id returning balance into locals.source_balance_after_booking;
-    if abs(locals.source_balance_after_booking) < locals.rounding_epsilon then
-        update account set balance = 0 where id = source_account_id;
-    end if;
-    update account set balance = balance + amount, vouchers = vouchers + vouchers_amount
-        where id = target_account_id returning balance into locals.target_balance_after_booking;
-    if abs(locals.target_balance_after_booking) < locals.rounding_epsilon then
-        update account set balance = 0 where id = target_account_id;
-    end if;
+    perform add_to_account_balance(
+        account_id => book_transaction.source_account_id,
+        amount => -book_transaction.amount,
+        vouchers_amount => -book_transaction.vouchers_amount,
+        balance_shard_key => book_transaction.balance_shard_key
+    );
+    perform add_to_account_balance(
+        account_id => book_transaction.target_account_id,
+        amount => book_transaction.amount,
+        vouchers_amount => book_transaction.vouchers_amount,
+        balance_shard_key => book_transaction.balance_shard_key
+    );
 
     return locals.transaction_id;
 
@@ -65,6 +115,48 @@ end;
 $$ language plpgsql
     set search_path = "$user", public;
 
+-- book a set of transactions in one call, the i-th transaction moves amounts[i] and vouchers_amounts[i] from
+-- source_account_ids[i] to target_account_ids[i], returns the new transaction ids in the same order
+create or replace function book_transactions(
+    order_id bigint,
+    source_account_ids bigint array,
+    target_account_ids bigint array,
+    amounts numeric array,
+    vouchers_amounts bigint array default null,
+    descriptions text array default null,
+    booked_at timestamptz default now(),
+    conducting_user_id bigint default null,
+    balance_shard_key bigint default null
+) returns setof bigint as
+$$
+<<locals>> declare
+    n_transactions integer;
+begin
+    n_transactions := coalesce(array_length(amounts, 1), 0);
+    if coalesce(array_length(source_account_ids, 1), 0) != n_transactions
+        or coalesce(array_length(target_account_ids, 1), 0) != n_transactions
+        or (vouchers_amounts is not null and coalesce(array_length(vouchers_amounts, 1), 0) != n_transactions)
+        or (descriptions is not null and coalesce(array_length(descriptions, 1), 0) != n_transactions) then
+        raise 'all booking arrays must have the same length';
+    end if;
+
+    for i in 1 .. locals.n_transactions loop
+        return next book_transaction(
+            order_id => book_transactions.order_id,
+            description => case when book_transactions.descriptions is null then '' else book_transactions.descriptions[i] end,
+            source_account_id => book_transactions.source_account_ids[i],
+            target_account_id => book_transactions.target_account_ids[i],
+            amount => book_transactions.amounts[i],
+            vouchers_amount => coalesce(book_transactions.vouchers_amounts[i], 0),
+            booked_at => book_transactions.booked_at,
+            conducting_user_id => book_transactions.conducting_user_id,
+            balance_shard_key => book_transactions.balance_shard_key
+        );
+    end loop;
+end;
+$$ language plpgsql
+    set search_path = "$user", public;
+
 create or replace function user_event_privileges(
     user_id bigint,
     event_node_id bigint
@@ -241,9 +333,6 @@ begin
         ordr.*,
         ut.uid                                      as customer_tag_uid,
         ut.id                                       as customer_tag_id,
-        coalesce(li.total_price, 0)                 as total_price,
-        coalesce(li.total_tax, 0)                   as total_tax,
-        coalesce(li.total_no_tax, 0)                as total_no_tax,
         coalesce(li.line_items, json_build_array()) as line_items
     from ordr
         left join line_item_aggregated_json li ON ordr.id = li.order_id and li.order_id = any(order_value_prefiltered.order_ids)
@@ -259,16 +348,34 @@ $$ language plpgsql
 
 create or replace function orders_at_node_and_children(
     node_id bigint
-) returns setof order_value as
+) returns setof order_summary as
 $$
 
 select
     o.*
-from order_value o
+from order_summary o
     join till t on o.till_id = t.id
-    join node n on n.id = t.node_id
+    join node_closure c on c.node_id = t.node_id
+where
+    c.ancestor_id = orders_at_node_and_children.node_id;
+
+$$ language sql
+    stable
+    security invoker
+    set search_path = "$user", public;
+
+create or replace function order_stats_hourly_at_node_and_children(
+    node_id bigint
+) returns setof order_stats_hourly as
+$$
+
+select
+    s.*
+from order_stats_hourly s
+    join till t on s.till_id = t.id
+    join node_closure c on c.node_id = t.node_id
 where
-    orders_at_node_and_children.node_id = any(n.parent_ids) or n.id = orders_at_node_and_children.node_id;
+    c.ancestor_id = order_stats_hourly_at_node_and_children.node_id;
 
 $$ language sql
     stable
@@ -304,9 +304,9 @@ class LineItem(PendingLineItem):
     total_tax: float
 
 
-class Order(BaseModel):
+class OrderSummary(BaseModel):
     """
-    represents a completely finished order with all relevant data
+    a completely finished order with its totals but without its line items
     """
 
     id: int
@@ -334,6 +334,12 @@ class Order(BaseModel):
     def customer_tag_uid_hex(self) -> Optional[str]:
         return format_user_tag_uid(self.customer_tag_uid)
 
+
+class Order(OrderSummary):
+    """
+    represents a completely finished order with all relevant data
+    """
+
     line_items: list[LineItem]
 
 
@@ -6,7 +6,8 @@ from uuid import UUID
 from pydantic import BaseModel
 
 from stustapay.core.schema.till import Till
-from stustapay.core.schema.user import AssignableUserRolesAtNode, EventPrivilege, NodePrivilege
+from stustapay.core.schema.tree import Node
+from stustapay.core.schema.user import AssignableUserRolesAtNode, CurrentUser, EventPrivilege, NodePrivilege
 from stustapay.mdm.mdm_provider import DeviceStatus
 
 
@@ -104,6 +105,19 @@ class CurrentTerminal(BaseModel):
     till: Till | None
 
 
+class TerminalContext(BaseModel):
+    """
+    Everything needed to authorize a terminal request, resolved in a single database round trip.
+    The nodes are fetched without their children.
+    """
+
+    terminal: CurrentTerminal
+    event_node: Node | None
+    # node of the till assigned to the terminal, if any
+    till_node: Node | None
+    active_user: CurrentUser | None
+
+
 class MdmType(enum.Enum):
     headwind = "headwind"
 
@@ -1,4 +1,5 @@
-from typing import Optional
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
 
 import asyncpg
 from pydantic import BaseModel
@@ -6,7 +7,7 @@ from sftkit.database import Connection
 from sftkit.service import Service, with_db_transaction
 
 from stustapay.core.config import Config
-from stustapay.core.schema.account import Account, AccountType
+from stustapay.core.schema.account import Account, AccountCore, AccountType
 from stustapay.core.schema.audit_logs import AuditType
 from stustapay.core.schema.customer import Customer
 from stustapay.core.schema.order import NewFreeTicketGrant
@@ -20,8 +21,10 @@ from stustapay.core.service.common.decorators import (
     requires_user,
 )
 from stustapay.core.service.common.error import InvalidArgument, NotFound
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedCache
 from stustapay.core.service.customer.common import fetch_customer
 from stustapay.core.service.transaction import book_transaction
+from stustapay.core.service.tree.cache import TREE_CHANGED_CHANNEL
 
 
 class MoneyOverview(BaseModel):
@@ -30,10 +33,135 @@ class MoneyOverview(BaseModel):
     total_cash_register_balance: float
 
 
-async def get_system_account_for_node(*, conn: Connection, node: Node, account_type: AccountType) -> Account:
+SYSTEM_ACCOUNT_TYPES = frozenset(
+    {
+        AccountType.cash_entry,
+        AccountType.cash_exit,
+        AccountType.sale_exit,
+        AccountType.sumup_entry,
+        AccountType.sumup_online_entry,
+        AccountType.cash_imbalance,
+        AccountType.cash_vault,
+        AccountType.cash_topup_source,
+        AccountType.voucher_create,
+        AccountType.donation_exit,
+        AccountType.sepa_exit,
+    }
+)
+
+
+class SystemAccountIdCache(NotificationInvalidatedCache):
+    """
+    Process-wide cache of the system account ids of all events, keyed by event node id.
+
+    System accounts are created together with their event and never change. The cache is nevertheless cleared on every
+    change of the node tree, e.g. the deletion of an event node, via the tree_changed notification channel, see
+    notify_tree_changed in 0002-triggers.sql. Entries are only filled from a fresh pool connection, never from a
+    request transaction which may roll back.
+    """
+
+    channels = (TREE_CHANGED_CHANNEL,)
+
+    def __init__(self):
+        super().__init__()
+        self._entries: dict[int, Mapping[AccountType, int]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def get(self, event_node_id: int) -> Mapping[AccountType, int] | None:
+        return self._entries.get(event_node_id)
+
+    def put(self, event_node_id: int, account_ids: Mapping[AccountType, int], generation: int) -> None:
+        if not self.listening or generation != self._generation:
+            return
+        self._entries[event_node_id] = account_ids
+
+
+system_account_id_cache = SystemAccountIdCache()
+
+
+async def _fetch_system_account_ids(conn: Connection, event_node_id: int) -> Mapping[AccountType, int]:
+    rows = await conn.fetch(
+        "select id, type from account where node_id = $1 and type = any($2)",
+        event_node_id,
+        [t.value for t in SYSTEM_ACCOUNT_TYPES],
+    )
+    return MappingProxyType({AccountType(row["type"]): row["id"] for row in rows})
+
+
+async def get_system_account_ids(*, conn: Connection, node: Node) -> Mapping[AccountType, int]:
+    """
+    Ids of the system accounts of the event the node belongs to, cached in system_account_id_cache.
+    """
+    if node.event_node_id is None:
+        raise InvalidArgument("System accounts only exist for nodes within an event")
+
+    account_ids = system_account_id_cache.get(node.event_node_id)
+    if account_ids is not None:
+        return account_ids
+
+    generation = system_account_id_cache.generation
+    async with system_account_id_cache.fill_connection() as fill_conn:
+        if fill_conn is not None:
+            account_ids = await _fetch_system_account_ids(fill_conn, node.event_node_id)
+            # an event which has not been committed yet is only visible to the request transaction
+            if len(account_ids) == len(SYSTEM_ACCOUNT_TYPES):
+                system_account_id_cache.put(node.event_node_id, account_ids, generation=generation)
+                return account_ids
+
+    return await _fetch_system_account_ids(conn, node.event_node_id)
+
+
+# system accounts which are part of nearly every booking at an event, candidates for balance sharding
+HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES = (AccountType.sale_exit, AccountType.cash_entry)
+
+
+async def set_system_account_balance_shards(
+    *,
+    conn: Connection,
+    node: Node,
+    n_shards: int,
+    account_types: Iterable[AccountType] = HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES,
+) -> None:
+    """
+    Split the balance of the given system accounts of an event into n_shards balance shards, bookings then only lock
+    the shard of their till instead of the account itself. Existing shard balances are folded back into the account.
+    """
+    if n_shards < 1:
+        raise InvalidArgument("The number of balance shards must be at least 1")
+    account_types = set(account_types)
+    if not account_types <= SYSTEM_ACCOUNT_TYPES:
+        raise InvalidArgument("Only system accounts can have balance shards")
+
+    system_account_ids = await get_system_account_ids(conn=conn, node=node)
+    await conn.execute(
+        "with folded as ( "
+        "   delete from account_balance_shard where account_id = any($2) returning account_id, balance, vouchers "
+        ") "
+        "update account a set "
+        "   balance = a.balance + coalesce((select sum(f.balance) from folded f where f.account_id = a.id), 0), "
+        "   vouchers = a.vouchers + coalesce((select sum(f.vouchers) from folded f where f.account_id = a.id), 0), "
+        "   balance_shards = $1 "
+        "where a.id = any($2)",
+        n_shards,
+        [system_account_ids[account_type] for account_type in account_types],
+    )
+
+
+async def get_system_account_for_node(*, conn: Connection, node: Node, account_type: AccountType) -> AccountCore:
     return await conn.fetch_one(
-        Account,
-        "select * from account_with_history where type = $1 and node_id = any($2)",
+        AccountCore,
+        "select * from account_core where type = $1 and node_id = any($2)",
         account_type.value,
         node.ids_to_event_node,
     )
@@ -48,6 +176,15 @@ async def get_account_by_id(*, conn: Connection, node: Node, account_id: int) ->
     )
 
 
+async def get_account_core_by_id(*, conn: Connection, node: Node, account_id: int) -> Optional[AccountCore]:
+    return await conn.fetch_maybe_one(
+        AccountCore,
+        "select * from account_core where id = $1 and node_id = any($2)",
+        account_id,
+        node.ids_to_event_node,
+    )
+
+
 async def get_account_by_tag_uid(*, conn: Connection, node: Node, tag_uid: int) -> Optional[Account]:
     return await conn.fetch_maybe_one(
         Account,
@@ -219,15 +356,14 @@ class AccountService(Service[Config]):
         if account is None:
             return False
 
-        voucher_create_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.voucher_create
-        )
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        voucher_create_acc_id = system_account_ids[AccountType.voucher_create]
 
         imbalance = new_voucher_amount - account.vouchers
         await book_transaction(
             conn=conn,
             description="Admin override for account voucher amount",
-            source_account_id=voucher_create_acc.id,
+            source_account_id=voucher_create_acc_id,
             target_account_id=account.id,
             voucher_amount=imbalance,
             conducting_user_id=current_user.id,
@@ -252,15 +388,14 @@ class AccountService(Service[Config]):
         if account is None:
             raise InvalidArgument(f"Tag {format_user_tag_uid(user_tag_uid)} is not registered")
 
-        voucher_create_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.voucher_create
-        )
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        voucher_create_acc_id = system_account_ids[AccountType.voucher_create]
 
         try:
             await book_transaction(
                 conn=conn,
                 description="voucher grant",
-                source_account_id=voucher_create_acc.id,
+                source_account_id=voucher_create_acc_id,
                 target_account_id=account.id,
                 voucher_amount=vouchers,
                 conducting_user_id=current_user.id,
@@ -304,15 +439,14 @@ class AccountService(Service[Config]):
             "update user_tag set uid = $1 where id = $2", new_free_ticket_grant.user_tag_uid, user_tag["user_tag_id"]
         )
 
-        voucher_create_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.voucher_create
-        )
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        voucher_create_acc_id = system_account_ids[AccountType.voucher_create]
 
         if new_free_ticket_grant.initial_voucher_amount > 0:
             await book_transaction(
                 conn=conn,
                 description="Initial voucher amount for volunteer ticket",
-                source_account_id=voucher_create_acc.id,
+                source_account_id=voucher_create_acc_id,
                 target_account_id=account_id,
                 voucher_amount=new_free_ticket_grant.initial_voucher_amount,
                 conducting_user_id=current_user.id,
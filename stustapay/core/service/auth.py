@@ -1,6 +1,9 @@
+import asyncio
+import logging
 import uuid
 from typing import Optional
 
+import asyncpg
 from jose import JWTError, jwt
 from pydantic import BaseModel, ValidationError
 from sftkit.database import Connection
@@ -8,9 +11,16 @@ from sftkit.service import Service, with_db_transaction
 
 from stustapay.core.config import Config
 from stustapay.core.schema.customer import Customer
-from stustapay.core.schema.terminal import CurrentTerminal, Terminal
-from stustapay.core.schema.till import Till
+from stustapay.core.schema.terminal import TerminalContext
 from stustapay.core.schema.user import CurrentUser
+from stustapay.core.service.common.privileges import (
+    fetch_user_privileges_at_node_for_role,
+    user_privilege_cache,
+)
+from stustapay.core.service.common.terminal_heartbeat import TerminalHeartbeatBuffer
+from stustapay.core.service.tree.cache import node_tree_cache
+
+logger = logging.getLogger(__name__)
 
 
 class UserTokenMetadata(BaseModel):
@@ -28,12 +38,142 @@ class TerminalTokenMetadata(BaseModel):
     session_uuid: uuid.UUID
 
 
+async def _fetch_terminal_context(
+    conn: Connection, terminal_id: int, session_uuid: uuid.UUID | None, include_nodes: bool, include_privileges: bool
+) -> Optional[TerminalContext]:
+    return await conn.fetch_maybe_one(
+        TerminalContext,
+        "with term as ( "
+        "   select * from terminal where id = $1 and ($2::uuid is null or session_uuid = $2) "
+        "), "
+        "term_till as ( "
+        "   select tl.* from till_with_cash_register tl join term on tl.terminal_id = term.id "
+        "), "
+        "term_event_node as ( "
+        "   select n.event_node_id as id from node n join term on n.id = term.node_id "
+        "), "
+        "ctx_node as ( "
+        "   select "
+        "       n.id, "
+        "       to_jsonb(n) || jsonb_build_object( "
+        "           'children', '[]'::jsonb, "
+        "           'event', n.event::jsonb || jsonb_build_object('translation_texts', coalesce(tt.texts, '{}'::jsonb)) "
+        "       ) as json_row "
+        "   from node_with_allowed_objects n "
+        "   left join lateral ( "
+        "       select jsonb_object_agg(t.lang_code, t.texts) as texts "
+        "       from ( "
+        "           select lang_code, jsonb_object_agg(type, content) as texts "
+        "           from translation_text where event_id = n.event_id group by lang_code "
+        "       ) t "
+        "   ) tt on true "
+        "   where n.id in (select id from term_event_node union all select node_id from term_till) "
+        ") "
+        "select "
+        "   to_jsonb(term) || jsonb_build_object('till', (select to_jsonb(term_till) from term_till)) as terminal, "
+        "   case when $3 then (select json_row from ctx_node where id = (select id from term_event_node)) "
+        "   end as event_node, "
+        "   case when $3 then (select json_row from ctx_node where id = (select node_id from term_till)) "
+        "   end as till_node, "
+        "   ( "
+        "       select to_jsonb(u) from ( "
+        "           select "
+        "               usr.*, "
+        "               ut.uid as user_tag_uid, "
+        "               term.active_user_role_id as active_role_id, "
+        "               ur.name as active_role_name, "
+        "               case when $4 then user_event_privileges_for_role( "
+        "                   usr.id, (select id from term_event_node), term.active_user_role_id "
+        "               ) else '{}'::text array end as event_privileges, "
+        "               case when $4 then user_node_privileges_for_role( "
+        "                   usr.id, (select node_id from term_till), term.active_user_role_id "
+        "               ) else '{}'::text array end as node_privileges "
+        "           from usr "
+        "           join user_tag ut on usr.user_tag_id = ut.id "
+        "           left join user_role ur on ur.id = term.active_user_role_id "
+        "           where usr.id = term.active_user_id "
+        "       ) u "
+        "   ) as active_user "
+        "from term",
+        terminal_id,
+        session_uuid,
+        include_nodes,
+        include_privileges,
+    )
+
+
+async def fetch_terminal_context(
+    conn: Connection, terminal_id: int, session_uuid: uuid.UUID | None = None
+) -> Optional[TerminalContext]:
+    """
+    Resolve the terminal, its till, the event node, the till node and the logged-in user including the privileges
+    of their active role in one query.
+    If a session_uuid is given the terminal must currently be registered with this session.
+    While the node tree or privilege caches are active the nodes and privileges are taken from the caches instead.
+    """
+    include_nodes = not node_tree_cache.active
+    include_privileges = not user_privilege_cache.listening
+    context = await _fetch_terminal_context(
+        conn=conn,
+        terminal_id=terminal_id,
+        session_uuid=session_uuid,
+        include_nodes=include_nodes,
+        include_privileges=include_privileges,
+    )
+    if context is None:
+        return None
+
+    if not include_nodes:
+        terminal_node = node_tree_cache.get_node(context.terminal.node_id)
+        if terminal_node is not None and terminal_node.event_node_id is not None:
+            context.event_node = node_tree_cache.get_node(terminal_node.event_node_id)
+        if context.terminal.till is not None:
+            context.till_node = node_tree_cache.get_node(context.terminal.till.node_id)
+
+        if terminal_node is None or (context.terminal.till is not None and context.till_node is None):
+            # the cache has been invalidated in the meantime
+            return await _fetch_terminal_context(
+                conn=conn,
+                terminal_id=terminal_id,
+                session_uuid=session_uuid,
+                include_nodes=True,
+                include_privileges=True,
+            )
+
+    user = context.active_user
+    if not include_privileges and user is not None and user.active_role_id is not None:
+        event_privileges, node_privileges = await fetch_user_privileges_at_node_for_role(
+            conn=conn,
+            user_id=user.id,
+            role_id=user.active_role_id,
+            event_node_id=context.event_node.id if context.event_node is not None else None,
+            node_id=context.terminal.till.node_id if context.terminal.till is not None else None,
+        )
+        user.event_privileges = list(event_privileges)
+        user.node_privileges = list(node_privileges)
+    return context
+
+
 class AuthService(Service[Config]):
     """
     Extra service to check login tokens
     It is needed in every service with uses `requires_user_privileges` or `requires_terminal`
     """
 
+    def __init__(self, db_pool: asyncpg.Pool, config: Config):
+        super().__init__(db_pool, config)
+        self.terminal_heartbeats = TerminalHeartbeatBuffer()
+
+    async def run_terminal_heartbeat_flush(self) -> None:
+        interval = self.config.core.terminal_heartbeat_flush_interval.total_seconds()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with self.db_pool.acquire() as conn:
+                    await self.terminal_heartbeats.flush(conn=conn)
+            except Exception:
+                logger.exception("Flushing terminal heartbeats failed")
+
     def decode_user_jwt_payload(self, token: str) -> Optional[UserTokenMetadata]:
         try:
             payload = jwt.decode(token, self.config.core.secret_key, algorithms=[self.config.core.jwt_token_algorithm])
@@ -111,35 +251,14 @@ class AuthService(Service[Config]):
         return encoded_jwt
 
     @with_db_transaction(read_only=True)
-    async def get_terminal_from_token(self, *, conn: Connection, token: str) -> Optional[CurrentTerminal]:
+    async def get_terminal_context_from_token(self, *, conn: Connection, token: str) -> Optional[TerminalContext]:
         token_payload: TerminalTokenMetadata | None = self.decode_terminal_jwt_payload(token)
         if token_payload is None:
             return None
 
-        terminal = await conn.fetch_maybe_one(
-            Terminal,
-            "select t.*, till.id as till_id "
-            "from terminal t "
-            "left join till on t.id = till.terminal_id "
-            "where t.id = $1 and session_uuid = $2",
-            token_payload.terminal_id,
-            token_payload.session_uuid,
-        )
-        if terminal is None:
-            return None
-
-        till = await conn.fetch_maybe_one(
-            Till,
-            "select * from till where terminal_id = $1",
-            token_payload.terminal_id,
-        )
-
-        return CurrentTerminal(
-            id=terminal.id,
-            node_id=terminal.node_id,
-            name=terminal.name,
-            description=terminal.description,
-            active_user_id=terminal.active_user_id,
-            active_user_role_id=terminal.active_user_role_id,
-            till=till,
+        context = await fetch_terminal_context(
+            conn=conn, terminal_id=token_payload.terminal_id, session_uuid=token_payload.session_uuid
         )
+        if context is not None:
+            self.terminal_heartbeats.record(context.terminal.id)
+        return context
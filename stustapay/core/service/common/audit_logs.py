@@ -10,12 +10,18 @@ from stustapay.core.schema.tree import Node
 async def fetch_audit_logs(
     conn: Connection,
     node: Node,
+    after_id: int | None = None,
+    limit: int | None = None,
 ) -> list[AuditLog]:
     return await conn.fetch_many(
         AuditLog,
         "select a.id, a.created_at, a.node_id, a.log_type, a.originating_user_id, a.originating_terminal_id "
-        "from audit_log as a join node as n on a.node_id = n.id where $1 = any(n.parent_ids) or n.id = $1",
+        "from audit_log as a join node_closure as c on a.node_id = c.node_id "
+        "where c.ancestor_id = $1 and ($2::bigint is null or a.id > $2) "
+        "order by a.id limit $3",
         node.id,
+        after_id,
+        limit,
     )
 
 
@@ -26,7 +32,7 @@ async def fetch_audit_log(
 ) -> AuditLogDetail:
     row = await conn.fetchrow(
         "select a.id, a.created_at, a.node_id, a.log_type, a.originating_user_id, a.originating_terminal_id, a.content "
-        "from audit_log as a join node as n on a.node_id = n.id where ($1 = any(n.parent_ids) or n.id = $1) and a.id = $2",
+        "from audit_log as a join node_closure as c on a.node_id = c.node_id where c.ancestor_id = $1 and a.id = $2",
         node.id,
         audit_log_id,
     )
@@ -1,17 +1,23 @@
+import asyncio
+import logging
+import random
+import typing
+from collections import defaultdict
 from functools import wraps
 from inspect import Parameter, signature
 from typing import Awaitable, Callable, Optional, TypeVar
 
+import asyncpg
 from sftkit.database import Connection
 
-from stustapay.core.schema.terminal import CurrentTerminal
-from stustapay.core.schema.till import Till
+from stustapay.core.schema.terminal import CurrentTerminal, TerminalContext
 from stustapay.core.schema.tree import Node, ObjectType
 from stustapay.core.schema.user import (
     CurrentUser,
     EventPrivilege,
     NodePrivilege,
 )
+from stustapay.core.service.auth import fetch_terminal_context
 from stustapay.core.service.common.error import (
     AccessDenied,
     EventRequired,
@@ -20,11 +26,10 @@ from stustapay.core.service.common.error import (
     ResourceNotAllowed,
     Unauthorized,
 )
-from stustapay.core.service.common.privileges import (
-    fetch_user_privileges_at_node,
-    fetch_user_privileges_at_node_for_role,
-)
-from stustapay.core.service.tree.common import fetch_event_node_for_node, fetch_node
+from stustapay.core.service.common.privileges import fetch_user_privileges_at_node
+from stustapay.core.service.tree.common import fetch_node
+
+logger = logging.getLogger(__name__)
 
 R = TypeVar("R")
 
@@ -273,65 +278,39 @@ def requires_terminal(
             token = kwargs.get("token")
             terminal: CurrentTerminal | None = kwargs.get("current_terminal")
             conn: Connection = kwargs["conn"]
-            if terminal is None:
-                if self.__class__.__name__ == "AuthService":
-                    terminal = await self.get_terminal_from_token(conn=conn, token=token)
-                elif hasattr(self, "auth_service"):
-                    terminal = await self.auth_service.get_terminal_from_token(conn=conn, token=token)
-                else:
-                    raise RuntimeError("requires_terminal needs self.auth_service to be a AuthService instance")
+            context: TerminalContext | None
+            if terminal is not None:
+                context = await fetch_terminal_context(conn=conn, terminal_id=terminal.id)
+            elif self.__class__.__name__ == "AuthService":
+                context = await self.get_terminal_context_from_token(conn=conn, token=token)
+            elif hasattr(self, "auth_service"):
+                context = await self.auth_service.get_terminal_context_from_token(conn=conn, token=token)
+            else:
+                raise RuntimeError("requires_terminal needs self.auth_service to be a AuthService instance")
 
-            if terminal is None:
+            if context is None:
                 raise Unauthorized("invalid terminal token")
 
-            await conn.execute("update terminal set last_seen = now() where id = $1", terminal.id)
-
-            till = await conn.fetch_maybe_one(
-                Till,
-                "select * from till_with_cash_register where terminal_id = $1",
-                terminal.id,
-            )
+            terminal = context.terminal
+            till = terminal.till
             if till is None and requires_till:
                 raise Unauthorized("Terminal does not have an assigned till but one is required")
 
             signature_params = signature(func).parameters
             func_is_read_only = _is_func_read_only(kwargs, func)
 
-            event_node = await fetch_event_node_for_node(conn=conn, node_id=terminal.node_id)
+            event_node = context.event_node
             if event_node is None:
                 raise InvalidArgument("Terminals should not be able to be created outside of events")
 
             node: Node | None = event_node
             if till is not None:
-                node = await fetch_node(conn=conn, node_id=till.node_id)
+                node = context.till_node
             assert node is not None
 
-            logged_in_user = await conn.fetch_maybe_one(
-                CurrentUser,
-                "select "
-                "   usr.*, "
-                "   ut.uid as user_tag_uid, "
-                "   $2::bigint as active_role_id, "
-                "   urwp.name as active_role_name "
-                "from usr "
-                "join user_tag ut on usr.user_tag_id = ut.id "
-                "left join user_role urwp on urwp.id = $2 "
-                "where usr.id = $1",
-                terminal.active_user_id,
-                terminal.active_user_role_id,
-            )
+            logged_in_user = context.active_user
 
             if logged_in_user is not None and terminal.active_user_role_id is not None:
-                till_node_id = till.node_id if till is not None else None
-                user_event_privileges, user_node_privileges = await fetch_user_privileges_at_node_for_role(
-                    conn,
-                    user_id=logged_in_user.id,
-                    role_id=terminal.active_user_role_id,
-                    event_node_id=event_node.id,
-                    node_id=till_node_id,
-                )
-                logged_in_user.event_privileges = user_event_privileges
-                logged_in_user.node_privileges = user_node_privileges
 
                 def check_privileges(required_privs, user_privs, priv_type: str):
                     if required_privs is not None:
@@ -398,3 +377,101 @@ def requires_terminal(
         return wrapper
 
     return f
+
+
+class TransactionRetryCounters:
+    """
+    Per service method counters of transactions which were retried due to serialization failures or deadlocks and of
+    calls which failed after exhausting all attempts, exported as healthcheck metrics to find contention hotspots.
+    """
+
+    def __init__(self):
+        self.retries: defaultdict[str, int] = defaultdict(int)
+        self.failures: defaultdict[str, int] = defaultdict(int)
+
+    def metrics(self) -> dict[str, float]:
+        metrics: dict[str, float] = {}
+        for method, retries in self.retries.items():
+            metrics[f"transaction_retries.{method}"] = retries
+        for method, failures in self.failures.items():
+            metrics[f"transaction_retry_failures.{method}"] = failures
+        return metrics
+
+
+transaction_retry_counters = TransactionRetryCounters()
+
+RETRYABLE_TRANSACTION_ERRORS = (asyncpg.exceptions.SerializationError, asyncpg.exceptions.DeadlockDetectedError)
+
+
+def _retry_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # exponential backoff with full jitter, such that concurrent retries of conflicting transactions spread out
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def _with_retrying_db_transaction(
+    func: Callable[..., Awaitable[R]], max_attempts: int | None, base_delay: float, max_delay: float
+) -> Callable[..., Awaitable[R]]:
+    method = func.__qualname__
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        _add_readonly_to_kwargs(False, kwargs, func)
+        if "conn" in kwargs:
+            # the caller owns the transaction and is responsible for retrying it
+            return await func(self, *args, **kwargs)
+
+        # same retry budget as sftkit's with_db_transaction unless configured otherwise
+        n_attempts = max_attempts or self.default_transaction_retries
+        async with self.db_pool.acquire() as conn:
+            attempt = 1
+            while True:
+                try:
+                    async with conn.transaction(isolation="serializable"):
+                        return await func(self, *args, conn=conn, **kwargs)
+                except RETRYABLE_TRANSACTION_ERRORS:
+                    if attempt >= n_attempts:
+                        transaction_retry_counters.failures[method] += 1
+                        logger.warning(f"{method} failed after {attempt} conflicting transaction attempts")
+                        raise
+                    transaction_retry_counters.retries[method] += 1
+                    await asyncio.sleep(_retry_delay(attempt, base_delay=base_delay, max_delay=max_delay))
+                    attempt += 1
+
+    return wrapper
+
+
+@typing.overload
+def with_retrying_db_transaction(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[R]]:
+    """Case without arguments"""
+
+
+@typing.overload
+def with_retrying_db_transaction(
+    *, max_attempts: int | None = None, base_delay: float = 0.005, max_delay: float = 0.2
+) -> Callable[[Callable[..., Awaitable[R]]], Callable[..., Awaitable[R]]]:
+    """Case with arguments"""
+
+
+@typing.no_type_check
+def with_retrying_db_transaction(
+    func=None, *, max_attempts: int | None = None, base_delay: float = 0.005, max_delay: float = 0.2
+):
+    """
+    Runs the decorated service method in a new serializable transaction, like with_db_transaction(read_only=False).
+    Transactions aborted due to serialization failures or deadlocks are rerun up to max_attempts times with
+    jittered exponential backoff, retries are counted per method in transaction_retry_counters. By default the
+    transaction retry budget of the service is used, i.e. the same number of attempts as with_db_transaction.
+
+    Only meant for booking paths which write to the database. The decorated method is executed again on every retry,
+    it must therefore be idempotent and must not have side effects outside of the database transaction, such as
+    requests to external payment providers.
+    """
+    if func is not None:
+        return _with_retrying_db_transaction(
+            func, max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay
+        )
+
+    def decorator(f):
+        return _with_retrying_db_transaction(f, max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay)
+
+    return decorator
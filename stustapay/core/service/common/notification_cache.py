@@ -0,0 +1,210 @@
+import asyncio
+import contextlib
+import logging
+import ssl
+from typing import AsyncIterator, Generic, Literal, Sequence, TypeVar
+
+import asyncpg
+from sftkit.database import Connection, DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S")
+
+# seconds a cache waits for a pool connection to fill itself, see NotificationInvalidatedCache.fill_connection
+FILL_CONNECTION_TIMEOUT = 0.5
+
+
+class NotificationInvalidatedCache:
+    """
+    Base class for process-wide caches which are kept consistent with the database via postgres notifications.
+
+    A cache may only be used while it is listening, i.e. while a NotificationListener it is registered with is
+    connected. Every notification on one of the channels of the cache calls `invalidate`. The cache is cleared
+    whenever the listener is not active, e.g. after the connection was lost, and only used again once listening has
+    been reestablished.
+    """
+
+    channels: tuple[str, ...] = ()
+
+    def __init__(self):
+        self._listening = False
+        self._connection_lost = asyncio.Event()
+        self._db_pool: asyncpg.Pool | None = None
+
+    @property
+    def listening(self) -> bool:
+        return self._listening
+
+    @contextlib.asynccontextmanager
+    async def fill_connection(self) -> AsyncIterator[Connection | None]:
+        """
+        Yields a pool connection outside of the transaction of the caller to fill the cache from, None if the cache is
+        not listening or no connection became available in time, callers then have to query without caching.
+
+        Results read within a request transaction must never be stored: they may contain uncommitted changes or stem
+        from a snapshot taken before an invalidation. The generation of the cache has to be taken before the first
+        query on the fill connection.
+        """
+        db_pool = self._db_pool
+        if not self.listening or db_pool is None:
+            yield None
+            return
+        try:
+            conn = await db_pool.acquire(timeout=FILL_CONNECTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            yield None
+            return
+        try:
+            yield conn
+        finally:
+            await db_pool.release(conn)
+
+    def invalidate(self) -> None:
+        raise NotImplementedError()
+
+    async def _listen(self, db_pool: asyncpg.Pool) -> None:
+        """
+        Runs while the listener is active, returns once the listener connection has been lost. Database work has to
+        use short-lived connections from db_pool, the listener connection is shared by all caches.
+        """
+        del db_pool
+        await self._connection_lost.wait()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        del connection, pid, channel, payload
+        self.invalidate()
+
+    def _on_connection_established(self, db_pool: asyncpg.Pool):
+        self._db_pool = db_pool
+        self._connection_lost.clear()
+        self._listening = True
+        self.invalidate()
+
+    def _on_connection_terminated(self, connection):
+        del connection
+        self._listening = False
+        self._connection_lost.set()
+        self.invalidate()
+
+
+async def _connect(config: DatabaseConfig) -> Connection:
+    # same connection settings as sftkit's create_db_pool
+    sslctx: ssl.SSLContext | Literal["verify-full", "prefer"]
+    if config.sslrootcert and config.require_ssl:
+        sslctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=config.sslrootcert)
+        sslctx.check_hostname = True
+    else:
+        sslctx = "verify-full" if config.require_ssl else "prefer"
+    return await asyncpg.connect(
+        user=config.user,
+        password=config.password,
+        database=config.dbname,
+        host=config.host,
+        port=config.port,
+        connection_class=Connection,
+        ssl=sslctx,
+        server_settings={"jit": "off"},
+    )
+
+
+class NotificationListener:
+    """
+    Keeps the notification invalidated caches of a process consistent with the database.
+
+    A single dedicated database connection, outside of the request pool, listens on the channels of all caches and
+    forwards every notification to the caches registered for its channel. Only one listener should be run per process
+    and cache. While connected the `_listen` loops of all caches run, they use db_pool for their queries. When the
+    connection is lost all caches are deactivated and the listener reconnects.
+    """
+
+    def __init__(self, caches: Sequence[NotificationInvalidatedCache]):
+        self.caches = list(caches)
+        self._caches_by_channel: dict[str, list[NotificationInvalidatedCache]] = {}
+        for cache in self.caches:
+            for channel in cache.channels:
+                self._caches_by_channel.setdefault(channel, []).append(cache)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        for cache in self._caches_by_channel.get(channel, ()):
+            cache._on_notification(connection, pid, channel, payload)
+
+    def _on_connection_terminated(self, connection):
+        for cache in self.caches:
+            cache._on_connection_terminated(connection)
+
+    async def _run_caches(self, db_pool: asyncpg.Pool) -> None:
+        for cache in self.caches:
+            cache._on_connection_established(db_pool)
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for cache in self.caches:
+                    task_group.create_task(cache._listen(db_pool))
+        finally:
+            for cache in self.caches:
+                cache._listening = False
+                cache.invalidate()
+
+    async def run(self, db_config: DatabaseConfig, db_pool: asyncpg.Pool) -> None:
+        while True:
+            try:
+                conn = await _connect(db_config)
+                try:
+                    for channel in self._caches_by_channel:
+                        await conn.add_listener(channel, self._on_notification)
+                    conn.add_termination_listener(self._on_connection_terminated)
+                    await self._run_caches(db_pool)
+                finally:
+                    conn.remove_termination_listener(self._on_connection_terminated)
+                    conn.terminate()
+                logger.warning("notification listener lost its connection, reconnecting")
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("notification listener failed, retrying")
+                await asyncio.sleep(1)
+
+
+class NotificationInvalidatedSnapshot(NotificationInvalidatedCache, Generic[S]):
+    """
+    Notification invalidated cache which holds a complete snapshot of some database state.
+
+    Every notification drops the current snapshot and triggers a reload with a pooled connection, until the reload
+    has finished all lookups fall back to the database. Snapshots which were loaded while an invalidation happened are
+    discarded based on a version counter.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._snapshot: S | None = None
+        self._version = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def active(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._snapshot = None
+        self._changed.set()
+
+    async def _load_snapshot(self, conn: Connection) -> S:
+        raise NotImplementedError()
+
+    async def _listen(self, db_pool: asyncpg.Pool) -> None:
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            if not self.listening:
+                return
+            version = self._version
+            async with db_pool.acquire() as conn:
+                snapshot = await self._load_snapshot(conn=conn)
+            if version == self._version:
+                self._snapshot = snapshot
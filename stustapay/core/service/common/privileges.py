@@ -1,31 +1,127 @@
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
 from sftkit.database import Connection
 
 from stustapay.core.schema.user import EventPrivilege, NodePrivilege
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedCache
+
+PRIVILEGES_CHANGED_CHANNEL = "privileges_changed"
+
+# user id, role id (None for all roles of the user), event node id, node id
+PrivilegeCacheKey = tuple[int, int | None, int | None, int | None]
+Privileges = tuple[frozenset[EventPrivilege], frozenset[NodePrivilege]]
+
+
+class UserPrivilegeCache(NotificationInvalidatedCache):
+    """
+    Process-wide LRU cache of resolved user privileges with a bounded size and a maximum entry age.
+
+    Invalidated via the privileges_changed notification channel, see notify_privileges_changed in 0002-triggers.sql.
+    Results which were resolved while an invalidation happened are not stored. Entries are only filled from a fresh
+    pool connection, never from a request transaction whose snapshot may predate a revocation or which may roll back.
+    While the cache is active privileges therefore reflect the committed state, not changes of the calling transaction.
+    """
+
+    channels = (PRIVILEGES_CHANGED_CHANNEL,)
+
+    def __init__(self, max_size: int = 10000, ttl: timedelta = timedelta(minutes=5)):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[PrivilegeCacheKey, tuple[float, Privileges]] = OrderedDict()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def get(self, key: PrivilegeCacheKey) -> Privileges | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, privileges = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return privileges
+
+    def put(self, key: PrivilegeCacheKey, privileges: Privileges, generation: int) -> None:
+        if not self.listening or generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl.total_seconds(), privileges)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+user_privilege_cache = UserPrivilegeCache()
+
+
+async def _resolve_privileges(
+    conn: Connection, *, user_id: int, role_id: int | None, event_node_id: int | None, node_id: int | None
+) -> Privileges:
+    event_privileges = []
+    node_privileges = []
+    if role_id is None:
+        if event_node_id is not None:
+            event_privileges = await conn.fetchval("select user_event_privileges($1, $2)", user_id, event_node_id)
+        if node_id is not None:
+            node_privileges = await conn.fetchval("select user_node_privileges($1, $2)", user_id, node_id)
+    else:
+        if event_node_id is not None:
+            event_privileges = await conn.fetchval(
+                "select user_event_privileges_for_role($1, $2, $3)", user_id, event_node_id, role_id
+            )
+        if node_id is not None:
+            node_privileges = await conn.fetchval(
+                "select user_node_privileges_for_role($1, $2, $3)", user_id, node_id, role_id
+            )
+    return (
+        frozenset(EventPrivilege[val] for val in event_privileges),
+        frozenset(NodePrivilege[val] for val in node_privileges),
+    )
+
+
+async def _fetch_privileges(
+    conn: Connection, *, user_id: int, role_id: int | None, event_node_id: int | None, node_id: int | None
+) -> tuple[set[EventPrivilege], set[NodePrivilege]]:
+    key = (user_id, role_id, event_node_id, node_id)
+    cached = user_privilege_cache.get(key)
+    if cached is not None:
+        return set(cached[0]), set(cached[1])
+
+    generation = user_privilege_cache.generation
+    async with user_privilege_cache.fill_connection() as fill_conn:
+        if fill_conn is not None:
+            privileges = await _resolve_privileges(
+                fill_conn, user_id=user_id, role_id=role_id, event_node_id=event_node_id, node_id=node_id
+            )
+            user_privilege_cache.put(key, privileges, generation=generation)
+            return set(privileges[0]), set(privileges[1])
+
+    privileges = await _resolve_privileges(
+        conn, user_id=user_id, role_id=role_id, event_node_id=event_node_id, node_id=node_id
+    )
+    return set(privileges[0]), set(privileges[1])
 
 
 async def fetch_user_privileges_at_node(
     conn: Connection, *, user_id: int, event_node_id: int | None, node_id: int | None
 ) -> tuple[set[EventPrivilege], set[NodePrivilege]]:
-    event_privileges = []
-    if event_node_id is not None:
-        event_privileges = await conn.fetchval("select user_event_privileges($1, $2)", user_id, event_node_id)
-    node_privileges = []
-    if node_id is not None:
-        node_privileges = await conn.fetchval("select user_node_privileges($1, $2)", user_id, node_id)
-    return set(EventPrivilege[val] for val in event_privileges), set(NodePrivilege[val] for val in node_privileges)
+    return await _fetch_privileges(conn, user_id=user_id, role_id=None, event_node_id=event_node_id, node_id=node_id)
 
 
 async def fetch_user_privileges_at_node_for_role(
     conn: Connection, *, user_id: int, role_id: int, event_node_id: int | None, node_id: int | None
 ) -> tuple[set[EventPrivilege], set[NodePrivilege]]:
-    event_privileges = []
-    if event_node_id is not None:
-        event_privileges = await conn.fetchval(
-            "select user_event_privileges_for_role($1, $2, $3)", user_id, event_node_id, role_id
-        )
-    node_privileges = []
-    if node_id is not None:
-        node_privileges = await conn.fetchval(
-            "select user_node_privileges_for_role($1, $2, $3)", user_id, node_id, role_id
-        )
-    return set(EventPrivilege[val] for val in event_privileges), set(NodePrivilege[val] for val in node_privileges)
+    return await _fetch_privileges(conn, user_id=user_id, role_id=role_id, event_node_id=event_node_id, node_id=node_id)
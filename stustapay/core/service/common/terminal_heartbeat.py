@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+from sftkit.database import Connection
+
+
+class TerminalHeartbeatBuffer:
+    """
+    Process-local write-behind buffer of terminal last_seen timestamps.
+    Terminal requests only record their heartbeat in memory, the buffered heartbeats are written
+    to the database periodically in one batched update.
+    """
+
+    def __init__(self):
+        self._last_seen: dict[int, datetime] = {}
+
+    def record(self, terminal_id: int) -> None:
+        self._last_seen[terminal_id] = datetime.now(timezone.utc)
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+    async def flush(self, conn: Connection) -> int:
+        if len(self._last_seen) == 0:
+            return 0
+
+        heartbeats, self._last_seen = self._last_seen, {}
+        try:
+            await conn.execute(
+                "update terminal t set last_seen = greatest(t.last_seen, h.last_seen) "
+                "from unnest($1::bigint array, $2::timestamptz array) as h(id, last_seen) "
+                "where t.id = h.id",
+                list(heartbeats.keys()),
+                list(heartbeats.values()),
+            )
+        except Exception:
+            # keep the heartbeats for the next flush unless the terminal has been seen again in the meantime
+            for terminal_id, last_seen in heartbeats.items():
+                self._last_seen.setdefault(terminal_id, last_seen)
+            raise
+
+        return len(heartbeats)
@@ -23,10 +23,10 @@ from stustapay.core.schema.payout import (
 )
 from stustapay.core.schema.tree import Node
 from stustapay.core.schema.user import CurrentUser, EventPrivilege, NodePrivilege, format_user_tag_uid
-from stustapay.core.service.account import get_system_account_for_node
+from stustapay.core.service.account import get_system_account_ids
 from stustapay.core.service.auth import AuthService
 from stustapay.core.service.common.audit_logs import create_audit_log
-from stustapay.core.service.common.decorators import requires_node, requires_user
+from stustapay.core.service.common.decorators import requires_node, requires_user, with_retrying_db_transaction
 from stustapay.core.service.common.error import InvalidArgument, NotFound
 from stustapay.core.service.config import ConfigService
 from stustapay.core.service.customer.common import fetch_customer
@@ -273,7 +273,7 @@ class PayoutService(Service[Config]):
 
         return row["sepa_xml"]
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(event_only=True)
     @requires_user(event_privileges=[EventPrivilege.payout_management])
     async def set_payout_run_as_done(
@@ -291,7 +291,8 @@ class PayoutService(Service[Config]):
             payout_run_id,
             current_user.id,
         )
-        sepa_exit_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.sepa_exit)
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        sepa_exit_acc_id = system_account_ids[AccountType.sepa_exit]
         await conn.execute(
             "select book_transaction("
             "   order_id => null,"
@@ -303,12 +304,10 @@ class PayoutService(Service[Config]):
             "   description => format('payout run %s sepa exit', $1::bigint)) "
             "from payout_view p where payout_run_id = $1 and round(p.amount, 2) > 0",
             payout_run_id,
-            sepa_exit_acc.id,
+            sepa_exit_acc_id,
             current_user.id,
         )
-        donation_exit_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.donation_exit
-        )
+        donation_exit_acc_id = system_account_ids[AccountType.donation_exit]
         await conn.execute(
             "select book_transaction("
             "   order_id => null,"
@@ -320,7 +319,7 @@ class PayoutService(Service[Config]):
             "   description => format('payout run %s donation exit', $1::bigint)) "
             "from payout_view p where payout_run_id = $1 and round(p.donation, 2) > 0",
             payout_run_id,
-            donation_exit_acc.id,
+            donation_exit_acc_id,
             current_user.id,
         )
 
@@ -356,7 +355,7 @@ class PayoutService(Service[Config]):
             node_id=node.id,
         )
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(event_only=True)
     @requires_user(event_privileges=[EventPrivilege.payout_management])
     async def revoke_payout_run(self, *, conn: Connection, node: Node, current_user: CurrentUser, payout_run_id: int):
@@ -377,7 +376,7 @@ class PayoutService(Service[Config]):
             node_id=node.id,
         )
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(event_only=True)
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def create_payout_run(
@@ -501,7 +500,7 @@ class PayoutService(Service[Config]):
             node.id,
         )
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(event_only=True)
     @requires_user(event_privileges=[EventPrivilege.payout_management, EventPrivilege.customer_management])
     async def prevent_customer_payout(
@@ -529,7 +528,7 @@ class PayoutService(Service[Config]):
             node_id=node.id,
         )
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(event_only=True)
     @requires_user(event_privileges=[EventPrivilege.payout_management, EventPrivilege.customer_management])
     async def allow_customer_payout(self, *, conn: Connection, node: Node, current_user: CurrentUser, customer_id: int):
@@ -12,11 +12,11 @@ from stustapay.core.schema.account import AccountType
 from stustapay.core.schema.order import OrderType, PaymentMethod
 from stustapay.core.schema.tree import Node
 from stustapay.core.schema.user import CurrentUser
-from stustapay.core.service.account import get_system_account_for_node
+from stustapay.core.service.account import get_system_account_ids
 from stustapay.core.service.common.error import InvalidArgument
 from stustapay.core.service.product import fetch_money_difference_product, fetch_money_transfer_product
 from stustapay.core.service.till.common import fetch_virtual_till, get_cash_register_account_id
-from stustapay.core.service.transaction import book_transaction
+from stustapay.core.service.transaction import book_transactions
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +27,25 @@ class BookingIdentifier:
     target_account_id: int
 
 
-async def book_prepared_bookings(*, conn: Connection, order_id: int, bookings: dict[BookingIdentifier, float]):
+async def book_prepared_bookings(
+    *,
+    conn: Connection,
+    order_id: int,
+    bookings: dict[BookingIdentifier, float],
+    balance_shard_key: Optional[int] = None,
+):
     """
     insert the selected bookings into the database.
     bookings are (source, target, tax) -> amount
     """
-    for booking_identifier, amount in bookings.items():
-        await book_transaction(
-            conn=conn,
-            order_id=order_id,
-            source_account_id=booking_identifier.source_account_id,
-            target_account_id=booking_identifier.target_account_id,
-            amount=amount,
-        )
+    await book_transactions(
+        conn=conn,
+        order_id=order_id,
+        balance_shard_key=balance_shard_key,
+        source_account_ids=[booking_identifier.source_account_id for booking_identifier in bookings.keys()],
+        target_account_ids=[booking_identifier.target_account_id for booking_identifier in bookings.keys()],
+        amounts=list(bookings.values()),
+    )
 
 
 class NewLineItem(BaseModel):
@@ -135,21 +141,26 @@ async def book_order(
         )
         order_id = order_row["id"]
 
-        for i, line_item in enumerate(line_items):
-            await conn.fetchval(
+        if len(line_items) > 0:
+            await conn.execute(
                 "insert into line_item (order_id, item_id, product_id, product_price, quantity, tax_rate_id, "
                 "   tax_name, tax_rate, vouchers_redeemed) "
-                "select $1, $2, $3, $4, $5, $6, t.name, t.rate, $7 "
-                "from tax_rate t where t.id = $6",
+                "select $1, li.item_id, li.product_id, li.product_price, li.quantity, li.tax_rate_id, t.name, t.rate, "
+                "   li.vouchers_redeemed "
+                "from unnest($2::bigint array, $3::bigint array, $4::numeric array, $5::bigint array, "
+                "   $6::bigint array, $7::bigint array) "
+                "   as li(item_id, product_id, product_price, quantity, tax_rate_id, vouchers_redeemed) "
+                "join tax_rate t on t.id = li.tax_rate_id",
                 order_id,
-                i,
-                line_item.product_id,
-                line_item.product_price,
-                line_item.quantity,
-                line_item.tax_rate_id,
-                line_item.vouchers_redeemed,
+                list(range(len(line_items))),
+                [line_item.product_id for line_item in line_items],
+                [line_item.product_price for line_item in line_items],
+                [line_item.quantity for line_item in line_items],
+                [line_item.tax_rate_id for line_item in line_items],
+                [line_item.vouchers_redeemed for line_item in line_items],
             )
-        await book_prepared_bookings(conn=conn, order_id=order_id, bookings=bookings)
+        # sharded system account balances are split by till to avoid lock contention between tills
+        await book_prepared_bookings(conn=conn, order_id=order_id, bookings=bookings, balance_shard_key=till_id)
     return OrderInfo(id=order_id, uuid=uuid, booked_at=booked_at)
 
 
@@ -175,13 +186,12 @@ async def book_imbalance_order(
         )
     ]
 
-    cash_imbalance_acc = await get_system_account_for_node(
-        conn=conn, node=node, account_type=AccountType.cash_imbalance
-    )
+    system_account_ids = await get_system_account_ids(conn=conn, node=node)
+    cash_imbalance_acc_id = system_account_ids[AccountType.cash_imbalance]
 
     bookings: dict[BookingIdentifier, float] = {
         BookingIdentifier(
-            source_account_id=cash_register_account_id, target_account_id=cash_imbalance_acc.id
+            source_account_id=cash_register_account_id, target_account_id=cash_imbalance_acc_id
         ): -imbalance,
     }
     virtual_till = await fetch_virtual_till(conn=conn, node=node)
@@ -266,9 +276,10 @@ async def book_money_transfer_cash_vault_order(
     cash_register_account_id = await get_cash_register_account_id(
         conn=conn, node=None, cash_register_id=cash_register_id
     )
-    cash_vault_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_vault)
+    system_account_ids = await get_system_account_ids(conn=conn, node=node)
+    cash_vault_acc_id = system_account_ids[AccountType.cash_vault]
     bookings: dict[BookingIdentifier, float] = {
-        BookingIdentifier(source_account_id=cash_register_account_id, target_account_id=cash_vault_acc.id): amount,
+        BookingIdentifier(source_account_id=cash_register_account_id, target_account_id=cash_vault_acc_id): amount,
     }
     virtual_till = await fetch_virtual_till(conn=conn, node=node)
     return await book_money_transfer(
@@ -0,0 +1,171 @@
+import asyncio
+import contextlib
+import json
+from typing import Iterator
+
+import asyncpg
+from pydantic import BaseModel
+from sftkit.database import Connection
+
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedCache
+
+ORDER_CHANNEL = "order"
+
+# notifications are collected for this long such that a burst of orders results in a single query
+LIVE_STATS_FLUSH_INTERVAL = 1.0
+LIVE_STATS_QUEUE_SIZE = 100
+
+
+class LiveProductStats(BaseModel):
+    product_id: int
+    quantity: int
+    revenue: float
+
+
+class LiveStatsDelta(BaseModel):
+    node_id: int
+    count: int
+    revenue: float
+    products: list[LiveProductStats]
+
+
+class LiveStatsSubscription:
+    """
+    Receives the stats deltas of all sales booked at the subscribed node and its children.
+
+    The subscription is closed once deltas had to be dropped, i.e. the subscriber did not keep up or the listener
+    connection was lost. `get` then returns None and the subscriber has to reload the full stats.
+    """
+
+    def __init__(self, node_id: int):
+        self.node_id = node_id
+        self.closed = False
+        self._queue: asyncio.Queue[LiveStatsDelta | None] = asyncio.Queue(maxsize=LIVE_STATS_QUEUE_SIZE)
+
+    def publish(self, delta: LiveStatsDelta) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(delta)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self) -> LiveStatsDelta | None:
+        return await self._queue.get()
+
+
+class LiveOrderStats(NotificationInvalidatedCache):
+    """
+    Process-wide fan out of live sales stats to dashboards.
+
+    A single listener on the order notification channel, see new_order_added in 0002-triggers.sql, collects the ids of
+    newly booked orders. They are aggregated in one query per flush interval into per node deltas for all subscribed
+    nodes, nothing is queried while there are no subscriptions. Subscriptions are closed whenever the listener is not
+    active as they would miss orders.
+    """
+
+    channels = (ORDER_CHANNEL,)
+
+    def __init__(self):
+        super().__init__()
+        self._subscriptions: dict[int, set[LiveStatsSubscription]] = {}
+        self._pending_order_ids: list[int] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def n_subscriptions(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def metrics(self) -> dict[str, float]:
+        return {"live_stats_subscriptions": self.n_subscriptions}
+
+    def invalidate(self) -> None:
+        self._pending_order_ids.clear()
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+        self._changed.set()
+
+    @contextlib.contextmanager
+    def subscribe(self, node_id: int) -> Iterator[LiveStatsSubscription]:
+        subscription = LiveStatsSubscription(node_id=node_id)
+        if not self.listening:
+            subscription.close()
+        self._subscriptions.setdefault(node_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions[node_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[node_id]
+
+    def _on_notification(self, connection, pid, channel, payload):
+        del connection, pid, channel
+        if not self._subscriptions:
+            return
+        self._pending_order_ids.append(json.loads(payload)["order_id"])
+        self._changed.set()
+
+    async def _listen(self, db_pool: asyncpg.Pool) -> None:
+        while True:
+            await self._changed.wait()
+            if not self.listening:
+                return
+            await asyncio.sleep(LIVE_STATS_FLUSH_INTERVAL)
+            self._changed.clear()
+            if not self.listening:
+                return
+            order_ids = self._pending_order_ids
+            self._pending_order_ids = []
+            if not order_ids or not self._subscriptions:
+                continue
+            async with db_pool.acquire() as conn:
+                deltas = await self._fetch_deltas(conn=conn, order_ids=order_ids, node_ids=list(self._subscriptions))
+            for delta in deltas:
+                for subscription in self._subscriptions.get(delta.node_id, ()):
+                    subscription.publish(delta)
+
+    @staticmethod
+    async def _fetch_deltas(*, conn: Connection, order_ids: list[int], node_ids: list[int]) -> list[LiveStatsDelta]:
+        # the sales stats cover the same order types, see get_hourly_sales_stats
+        rows = await conn.fetch(
+            "select "
+            "   c.ancestor_id as node_id, "
+            "   li.product_id, "
+            "   count(distinct o.id) as count, "
+            "   sum(li.quantity) as quantity, "
+            "   round(sum(li.total_price), 2) as revenue "
+            "from ordr o "
+            "join till t on o.till_id = t.id "
+            "join node_closure c on t.node_id = c.node_id "
+            "join line_item li on o.id = li.order_id "
+            "where o.id = any($1) and c.ancestor_id = any($2) and o.order_type in ('sale', 'cancel_sale') "
+            "group by grouping sets ((c.ancestor_id, li.product_id), (c.ancestor_id))",
+            order_ids,
+            node_ids,
+        )
+        deltas: dict[int, LiveStatsDelta] = {}
+        for row in rows:
+            delta = deltas.setdefault(
+                row["node_id"], LiveStatsDelta(node_id=row["node_id"], count=0, revenue=0, products=[])
+            )
+            if row["product_id"] is None:
+                delta.count = row["count"]
+                delta.revenue = float(row["revenue"])
+            else:
+                delta.products.append(
+                    LiveProductStats(product_id=row["product_id"], quantity=row["quantity"], revenue=row["revenue"])
+                )
+        return list(deltas.values())
+
+
+live_order_stats = LiveOrderStats()
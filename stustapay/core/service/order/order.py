@@ -1,5 +1,7 @@
 import logging
+import time
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Dict, Optional, Set
 from uuid import UUID
@@ -14,6 +16,7 @@ from stustapay.bon.bon import BonJson
 from stustapay.core.config import Config
 from stustapay.core.schema.account import (
     Account,
+    AccountCore,
     AccountType,
     is_balance_negative,
 )
@@ -60,14 +63,15 @@ from stustapay.core.schema.till import Till
 from stustapay.core.schema.tree import Node, RestrictedEventSettings
 from stustapay.core.schema.user import CurrentUser, NodePrivilege, User, format_user_tag_uid
 from stustapay.core.service.account import (
-    get_account_by_id,
-    get_system_account_for_node,
+    get_account_core_by_id,
+    get_system_account_ids,
 )
 from stustapay.core.service.auth import AuthService
 from stustapay.core.service.common.decorators import (
     requires_node,
     requires_terminal,
     requires_user,
+    with_retrying_db_transaction,
 )
 from stustapay.core.service.common.error import InvalidArgument, ServiceException
 from stustapay.core.service.order.pending_order import (
@@ -87,8 +91,9 @@ from stustapay.core.service.product import (
     fetch_product,
     fetch_top_up_product,
 )
+from stustapay.core.service.till.catalog import fetch_button_products, fetch_products_by_id, till_catalog_cache
 from stustapay.core.service.till.common import fetch_till, get_cash_register_account_id
-from stustapay.core.service.transaction import book_transaction
+from stustapay.core.service.transaction import book_transaction, book_transactions
 from stustapay.core.service.tree.common import fetch_restricted_event_settings_for_node
 
 from .booking import BookingIdentifier, NewLineItem, book_order
@@ -222,12 +227,89 @@ class InternalNewSale(BaseModel):
 
 class InternalPendingSale(PendingSaleBase):
     buttons: list[BookedButton]
+    # user tag variants of the customer the line items were computed for, see _recheck_sale
+    customer_user_tag_variant_ids: list[int] = []
 
 
 class InternalCompletedSale(CompletedSaleBase, PendingSaleBase):
     buttons: list[BookedButton]
 
 
+# seconds a checked sale can be booked without redoing the complete check
+PENDING_SALE_TTL = 60.0
+
+
+@dataclass
+class _CheckedSale:
+    new_sale: InternalNewSale
+    pending_sale: InternalPendingSale
+    till_profile_id: int
+    catalog_generation: int
+    expires_at: float
+
+
+class PendingSaleCache:
+    """
+    Short-lived, process local store of check_sale results, keyed by till and order uuid.
+
+    Terminals always check a sale before booking it with the same uuid. Product changes are detected via the till
+    catalog cache, results are therefore only stored while it is listening. When booking, a stored result is only used
+    if the sale is identical to the checked one, the till profile is unchanged and the till catalog cache was not
+    invalidated in between. Results are handed out once, a retried or repeated booking falls back to a full check.
+    """
+
+    def __init__(self, ttl: float = PENDING_SALE_TTL, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[tuple[int, UUID], _CheckedSale] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _evict(self, now: float) -> None:
+        # all entries share the same ttl, hence the insertion order is also the expiry order
+        while len(self._entries) > 0:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def put(self, till: Till, new_sale: InternalNewSale, pending_sale: InternalPendingSale) -> None:
+        if not till_catalog_cache.listening:
+            return
+        now = time.monotonic()
+        key = (till.id, new_sale.uuid)
+        self._entries.pop(key, None)
+        self._entries[key] = _CheckedSale(
+            new_sale=new_sale.model_copy(deep=True),
+            pending_sale=pending_sale.model_copy(deep=True),
+            till_profile_id=till.active_profile_id,
+            catalog_generation=till_catalog_cache.generation,
+            expires_at=now + self.ttl,
+        )
+        self._evict(now)
+
+    def pop(self, till: Till, new_sale: InternalNewSale) -> InternalPendingSale | None:
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.pop((till.id, new_sale.uuid), None)
+        if (
+            entry is None
+            or not till_catalog_cache.listening
+            or entry.new_sale != new_sale
+            or entry.till_profile_id != till.active_profile_id
+            or entry.catalog_generation != till_catalog_cache.generation
+        ):
+            return None
+        return entry.pending_sale
+
+
+pending_sale_cache = PendingSaleCache()
+
+
 async def fetch_order(*, conn: Connection, order_id: int) -> Optional[Order]:
     """
     get all info about an order.
@@ -257,23 +339,22 @@ class OrderService(Service[Config]):
         buttons: list[BookedButton],
     ) -> list[BookedProduct]:
         # TODO: check if the till making this sale has these buttons as part of its layout
+        button_ids = [button.id for button in buttons if not button.is_product]
+        product_ids = [button.id for button in buttons if button.is_product]
+        products_by_button = (
+            await fetch_button_products(conn=conn, till_profile_id=till_profile_id, button_ids=button_ids)
+            if len(button_ids) > 0
+            else {}
+        )
+        products_by_id = await fetch_products_by_id(conn=conn, product_ids=product_ids) if len(product_ids) > 0 else {}
+
         booked_products = []
         for button in buttons:
             if not button.is_product:
-                products = await conn.fetch_many(
-                    Product,
-                    "select p.* from till_button_product tbp "
-                    "join product_with_tax_and_restrictions p on tbp.product_id = p.id "
-                    "join till_layout_to_button tltp on tltp.button_id = tbp.button_id "
-                    "join till_profile tp on tp.layout_id = tltp.layout_id "
-                    "where tbp.button_id = $1 and tp.id = $2",
-                    button.id,
-                    till_profile_id,
-                )
+                products = products_by_button.get(button.id, [])
             else:
-                products = await conn.fetch_many(
-                    Product, "select p.* from product_with_tax_and_restrictions p where p.id = $1", button.id
-                )
+                product = products_by_id.get(button.id)
+                products = [product] if product is not None else []
             if len(products) == 0:
                 raise InvalidArgument("this till profile is not allowed to use these buttons")
 
@@ -355,11 +436,11 @@ class OrderService(Service[Config]):
         return line_items
 
     @staticmethod
-    async def _fetch_customer_by_user_tag(*, conn: Connection, node: Node, customer_tag_uid: int) -> Account:
+    async def _fetch_customer_by_user_tag(*, conn: Connection, node: Node, customer_tag_uid: int) -> AccountCore:
         customer = await conn.fetch_maybe_one(
-            Account,
+            AccountCore,
             "select a.* "
-            "from user_tag t join account_with_history a on t.id = a.user_tag_id "
+            "from user_tag t join account_core a on t.id = a.user_tag_id "
             "where t.uid = $1 and a.type = 'private' and a.node_id = any($2)",
             customer_tag_uid,
             node.ids_to_root,
@@ -463,7 +544,7 @@ class OrderService(Service[Config]):
             new_balance=new_balance,
         )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def book_topup(
         self,
@@ -619,10 +700,11 @@ class OrderService(Service[Config]):
         booked_products = await self._get_products_from_buttons(
             conn=conn, till_profile_id=till.active_profile_id, buttons=new_sale.buttons
         )
+        customer_user_tag_variant_ids = (
+            customer_account.user_tag_variant_ids if tag_payment and customer_account is not None else []
+        )
         line_items = await self._preprocess_order_positions(
-            customer_user_tag_variant_ids=(
-                customer_account.user_tag_variant_ids if tag_payment and customer_account is not None else []
-            ),
+            customer_user_tag_variant_ids=customer_user_tag_variant_ids,
             booked_products=booked_products,
         )
 
@@ -640,6 +722,7 @@ class OrderService(Service[Config]):
             line_items=line_items,
             customer_account_id=(customer_account.id if tag_payment and customer_account is not None else None),
             payment_method=new_sale.payment_method,
+            customer_user_tag_variant_ids=customer_user_tag_variant_ids,
         )
 
         if tag_payment:
@@ -660,23 +743,80 @@ class OrderService(Service[Config]):
             order.new_voucher_balance = customer_account.vouchers - voucher_usage.used_vouchers
             order.line_items.extend(voucher_usage.additional_line_items)
 
-            if is_balance_negative(customer_account.balance - order.total_price):
-                raise NotEnoughFundsException(needed_fund=order.total_price, available_fund=customer_account.balance)
-            order.new_balance = customer_account.balance - order.total_price
+            self._apply_customer_balance(
+                event_settings=event_settings, pending_sale=order, balance=customer_account.balance
+            )
 
-            max_limit = event_settings.max_account_balance
-            if order.new_balance > max_limit:
-                too_much = order.new_balance - max_limit
-                raise InvalidArgument(
-                    f"Max {max_limit:.02f}€ allowed on account! {order.new_balance:.02f}€ is {too_much:.02f}€ too much."
-                )
+        return order
 
-            if is_balance_negative(order.new_balance):
-                raise InvalidArgument(
-                    f"Account balance would be less than 0€. New balance would be {order.new_balance:.02f}€"
-                )
+    @staticmethod
+    def _apply_customer_balance(
+        *, event_settings: RestrictedEventSettings, pending_sale: InternalPendingSale, balance: float
+    ):
+        if is_balance_negative(balance - pending_sale.total_price):
+            raise NotEnoughFundsException(needed_fund=pending_sale.total_price, available_fund=balance)
+        pending_sale.old_balance = balance
+        pending_sale.new_balance = balance - pending_sale.total_price
 
-        return order
+        max_limit = event_settings.max_account_balance
+        if pending_sale.new_balance > max_limit:
+            too_much = pending_sale.new_balance - max_limit
+            raise InvalidArgument(
+                f"Max {max_limit:.02f}€ allowed on account! {pending_sale.new_balance:.02f}€ is {too_much:.02f}€ too much."
+            )
+
+        if is_balance_negative(pending_sale.new_balance):
+            raise InvalidArgument(
+                f"Account balance would be less than 0€. New balance would be {pending_sale.new_balance:.02f}€"
+            )
+
+    async def _recheck_sale(
+        self,
+        *,
+        conn: Connection,
+        event_settings: RestrictedEventSettings,
+        till: Till,
+        new_sale: InternalNewSale,
+    ) -> InternalPendingSale | None:
+        """
+        Reuse the result of a preceding check_sale for the same sale, only redoing the checks which depend on
+        state that may have changed since: the order uuid and the customer balance.
+        Returns None if no usable check result exists or the voucher balance or user tag variants of the customer
+        changed, in which case the sale has to be checked completely.
+        """
+        pending_sale = pending_sale_cache.pop(till=till, new_sale=new_sale)
+        if pending_sale is None:
+            return None
+
+        if pending_sale.customer_account_id is None:
+            uuid_exists = await conn.fetchval("select exists(select from ordr where uuid = $1)", new_sale.uuid)
+            if uuid_exists:
+                raise AlreadyProcessedException("Successfully booked order")
+            return pending_sale
+
+        # private accounts never have balance shards, their balance can be read from the account directly
+        row = await conn.fetchrow(
+            "select exists(select from ordr where uuid = $1) as uuid_exists, a.balance::float8 as balance, a.vouchers, "
+            "array(select uttv.variant_id from user_tag_to_variant uttv where uttv.user_tag_id = t.id "
+            "order by uttv.variant_id) as user_tag_variant_ids "
+            "from user_tag t join account a on t.id = a.user_tag_id "
+            "where t.uid = $2 and a.id = $3 and a.type = 'private'",
+            new_sale.uuid,
+            new_sale.customer_tag_uid,
+            pending_sale.customer_account_id,
+        )
+        if row is None:
+            return None
+        if row["uuid_exists"]:
+            raise AlreadyProcessedException("Successfully booked order")
+        if row["vouchers"] != pending_sale.old_voucher_balance:
+            return None
+        # the variants determine which product restrictions apply to the customer
+        if row["user_tag_variant_ids"] != sorted(pending_sale.customer_user_tag_variant_ids):
+            return None
+
+        self._apply_customer_balance(event_settings=event_settings, pending_sale=pending_sale, balance=row["balance"])
+        return pending_sale
 
     @with_db_transaction(read_only=True)
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
@@ -704,6 +844,7 @@ class OrderService(Service[Config]):
         pending_sale = await self._check_sale(
             conn=conn, event_settings=event_settings, node=node, till=current_till, new_sale=internal_new_sale
         )
+        pending_sale_cache.put(till=current_till, new_sale=internal_new_sale, pending_sale=pending_sale)
         return PendingSale(
             uuid=pending_sale.uuid,
             old_balance=pending_sale.old_balance,
@@ -749,6 +890,7 @@ class OrderService(Service[Config]):
         pending_sale = await self._check_sale(
             conn=conn, event_settings=event_settings, node=node, till=current_till, new_sale=internal_new_sale
         )
+        pending_sale_cache.put(till=current_till, new_sale=internal_new_sale, pending_sale=pending_sale)
         return PendingSaleProducts(
             uuid=pending_sale.uuid,
             old_balance=pending_sale.old_balance,
@@ -774,13 +916,15 @@ class OrderService(Service[Config]):
         """
         apply the order after all payment has been settled.
         """
-        pending_sale = await self._check_sale(
-            conn=conn,
-            node=node,
-            event_settings=event_settings,
-            till=till,
-            new_sale=new_sale,
-        )
+        pending_sale = await self._recheck_sale(conn=conn, event_settings=event_settings, till=till, new_sale=new_sale)
+        if pending_sale is None:
+            pending_sale = await self._check_sale(
+                conn=conn,
+                node=node,
+                event_settings=event_settings,
+                till=till,
+                new_sale=new_sale,
+            )
 
         line_items = [
             NewLineItem(
@@ -793,12 +937,11 @@ class OrderService(Service[Config]):
             for line_item in pending_sale.line_items
         ]
 
-        cash_entry_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_entry)
-        cash_topup_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.cash_topup_source
-        )
-        sumup_entry_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.sumup_entry)
-        sale_exit_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.sale_exit)
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        cash_entry_acc_id = system_account_ids[AccountType.cash_entry]
+        cash_topup_acc_id = system_account_ids[AccountType.cash_topup_source]
+        sumup_entry_acc_id = system_account_ids[AccountType.sumup_entry]
+        sale_exit_acc_id = system_account_ids[AccountType.sale_exit]
 
         # combine booking based on (source, target) -> amount
         bookings: Dict[BookingIdentifier, float] = defaultdict(lambda: 0.0)
@@ -810,7 +953,7 @@ class OrderService(Service[Config]):
             if pending_sale.payment_method == PaymentMethod.tag:
                 assert pending_sale.customer_account_id is not None
                 source_acc_id = get_source_account(OrderType.sale, pending_sale.customer_account_id)
-                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc.id)
+                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc_id)
             elif pending_sale.payment_method == PaymentMethod.cash:
                 if till.active_cash_register_id is None:
                     raise InvalidArgument("Cash payments require a cash register")
@@ -818,13 +961,13 @@ class OrderService(Service[Config]):
                     conn=conn, node=node, cash_register_id=till.active_cash_register_id
                 )
                 bookings[
-                    BookingIdentifier(source_account_id=cash_entry_acc.id, target_account_id=cash_register_account_id)
+                    BookingIdentifier(source_account_id=cash_entry_acc_id, target_account_id=cash_register_account_id)
                 ] += float(line_item.total_price)
-                source_acc_id = get_source_account(OrderType.sale, cash_topup_acc.id)
-                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc.id)
+                source_acc_id = get_source_account(OrderType.sale, cash_topup_acc_id)
+                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc_id)
             elif pending_sale.payment_method == PaymentMethod.sumup:
-                source_acc_id = get_source_account(OrderType.sale, sumup_entry_acc.id)
-                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc.id)
+                source_acc_id = get_source_account(OrderType.sale, sumup_entry_acc_id)
+                target_acc_id = get_target_account(OrderType.sale, product, sale_exit_acc_id)
 
             assert source_acc_id is not None
             assert target_acc_id is not None
@@ -852,8 +995,9 @@ class OrderService(Service[Config]):
                 conn=conn,
                 order_id=order_info.id,
                 source_account_id=pending_sale.customer_account_id,
-                target_account_id=sale_exit_acc.id,
+                target_account_id=sale_exit_acc_id,
                 voucher_amount=pending_sale.used_vouchers,
+                balance_shard_key=till.id,
             )
 
         completed_order = InternalCompletedSale(
@@ -874,7 +1018,7 @@ class OrderService(Service[Config]):
 
         if completed_order.payment_method == PaymentMethod.tag:
             assert completed_order.customer_account_id is not None
-            customer_account_after_booking = await get_account_by_id(
+            customer_account_after_booking = await get_account_core_by_id(
                 conn=conn, node=node, account_id=completed_order.customer_account_id
             )
             assert customer_account_after_booking is not None
@@ -885,7 +1029,7 @@ class OrderService(Service[Config]):
 
         return completed_order
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def book_sale(
         self,
@@ -995,7 +1139,7 @@ class OrderService(Service[Config]):
             products=new_sale.products,
         )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration, NodePrivilege.can_book_orders])
     async def edit_sale_products(
@@ -1078,29 +1222,23 @@ class OrderService(Service[Config]):
         )
 
         transactions = await conn.fetch("select * from transaction where order_id = $1", order.id)
-        for transaction in transactions:
-            await conn.fetchval(
-                "select * from book_transaction("
-                "   order_id => $1,"
-                "   description => $2,"
-                "   source_account_id => $3,"
-                "   target_account_id => $4,"
-                "   amount => $5,"
-                "   vouchers_amount => $6)",
-                order_info.id,
-                transaction["description"],
-                transaction["target_account"],
-                transaction["source_account"],
-                transaction["amount"],
-                transaction["vouchers"],
-            )
+        await book_transactions(
+            conn=conn,
+            order_id=order_info.id,
+            balance_shard_key=till_id,
+            source_account_ids=[transaction["target_account"] for transaction in transactions],
+            target_account_ids=[transaction["source_account"] for transaction in transactions],
+            amounts=[transaction["amount"] for transaction in transactions],
+            voucher_amounts=[transaction["vouchers"] for transaction in transactions],
+            descriptions=[transaction["description"] for transaction in transactions],
+        )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def cancel_sale(self, *, conn: Connection, current_till: Till, current_user: CurrentUser, order_id: int):
         await self._cancel_sale(conn=conn, till_id=current_till.id, current_user=current_user, order_id=order_id)
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration, NodePrivilege.can_book_orders])
     async def cancel_sale_admin(self, *, conn: Connection, node: Node, current_user: CurrentUser, order_id: int):
@@ -1156,7 +1294,7 @@ class OrderService(Service[Config]):
             new_balance=new_balance,
         )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def book_pay_out(
         self,
@@ -1188,20 +1326,19 @@ class OrderService(Service[Config]):
             )
         ]
 
-        cash_topup_acc = await get_system_account_for_node(
-            conn=conn, node=node, account_type=AccountType.cash_topup_source
-        )
-        cash_exit_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_exit)
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        cash_topup_acc_id = system_account_ids[AccountType.cash_topup_source]
+        cash_exit_acc_id = system_account_ids[AccountType.cash_exit]
 
         cash_register_account_id = await get_cash_register_account_id(
             conn=conn, node=node, cash_register_id=current_till.active_cash_register_id
         )
         prepared_bookings: Dict[BookingIdentifier, float] = {
             BookingIdentifier(
-                source_account_id=pending_pay_out.customer_account_id, target_account_id=cash_topup_acc.id
+                source_account_id=pending_pay_out.customer_account_id, target_account_id=cash_topup_acc_id
             ): -pending_pay_out.amount,
             BookingIdentifier(
-                source_account_id=cash_register_account_id, target_account_id=cash_exit_acc.id
+                source_account_id=cash_register_account_id, target_account_id=cash_exit_acc_id
             ): -pending_pay_out.amount,
         }
 
@@ -1449,7 +1586,7 @@ class OrderService(Service[Config]):
 
         return sale
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def book_ticket_sale(
         self,
@@ -1562,52 +1699,119 @@ class OrderService(Service[Config]):
     @with_db_transaction(read_only=True)
     @requires_terminal(node_privileges=[NodePrivilege.can_book_orders])
     async def list_orders_terminal(
-        self, *, conn: Connection, node: Node, current_user: User, current_terminal: CurrentTerminal
+        self,
+        *,
+        conn: Connection,
+        node: Node,
+        current_user: User,
+        current_terminal: CurrentTerminal,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
     ) -> list[Order]:
         assert current_terminal.till is not None
         return await conn.fetch_many(
             Order,
-            "select * from order_value_prefiltered((select array_agg(o.id) from ordr o where o.cashier_id = $1 and o.till_id = $2), $3)",
+            "select * from order_value_prefiltered(("
+            "   select array_agg(p.id) from ("
+            "       select o.id from ordr o "
+            "       where o.cashier_id = $1 and o.till_id = $2 and ($4::bigint is null or o.id > $4) "
+            "       order by o.id limit $5"
+            "   ) p"
+            "), $3) "
+            "order by id",
             current_user.id,
             current_terminal.till.id,
             node.event_node_id,
+            after_id,
+            limit,
         )
 
     @with_db_transaction(read_only=True)
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration])
-    async def list_orders(self, *, conn: Connection, node: Node, customer_account_id: int) -> list[Order]:
+    async def list_orders(
+        self,
+        *,
+        conn: Connection,
+        node: Node,
+        customer_account_id: int,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> list[Order]:
         return await conn.fetch_many(
             Order,
-            "select * from order_value_prefiltered((select array_agg(o.id) from ordr o where customer_account_id = $1), $2)",
+            "select * from order_value_prefiltered(("
+            "   select array_agg(p.id) from ("
+            "       select o.id from ordr o "
+            "       where o.customer_account_id = $1 and ($3::bigint is null or o.id > $3) "
+            "       order by o.id limit $4"
+            "   ) p"
+            "), $2) "
+            "order by id",
             customer_account_id,
             node.event_node_id,
+            after_id,
+            limit,
         )
 
     @with_db_transaction(read_only=True)
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration])
-    async def list_orders_by_till(self, *, conn: Connection, node: Node, till_id: int) -> list[Order]:
+    async def list_orders_by_till(
+        self,
+        *,
+        conn: Connection,
+        node: Node,
+        till_id: int,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> list[Order]:
         return await conn.fetch_many(
             Order,
-            "select * from order_value_prefiltered((select array_agg(o.id) from ordr o where till_id = $1), $2)",
+            "select * from order_value_prefiltered(("
+            "   select array_agg(p.id) from ("
+            "       select o.id from ordr o "
+            "       where o.till_id = $1 and ($3::bigint is null or o.id > $3) "
+            "       order by o.id limit $4"
+            "   ) p"
+            "), $2) "
+            "order by id",
             till_id,
             node.event_node_id,
+            after_id,
+            limit,
         )
 
     @with_db_transaction(read_only=True)
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def list_transactions_by_cash_register(
-        self, *, conn: Connection, node: Node, cash_register_id: int
+        self,
+        *,
+        conn: Connection,
+        node: Node,
+        cash_register_id: int,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
     ) -> list[Transaction]:
         cash_register_account_id = await get_cash_register_account_id(
             conn=conn, node=node, cash_register_id=cash_register_id
         )
+        # both sides are paginated separately such that each can use its (account, id) index
         return await conn.fetch_many(
             Transaction,
-            "select * from transaction_with_order t where source_account = $1 or target_account = $1",
+            "select * from transaction_with_order t "
+            "where t.id in ( "
+            "   (select id from transaction "
+            "   where source_account = $1 and ($2::bigint is null or id > $2) order by id limit $3) "
+            "   union "
+            "   (select id from transaction "
+            "   where target_account = $1 and ($2::bigint is null or id > $2) order by id limit $3) "
+            ") "
+            "order by t.id limit $3",
             cash_register_account_id,
+            after_id,
+            limit,
         )
 
     @with_db_transaction(read_only=True)
@@ -20,7 +20,7 @@ from stustapay.core.schema.order import (
 from stustapay.core.schema.product import ProductType
 from stustapay.core.schema.till import Till
 from stustapay.core.schema.tree import Node
-from stustapay.core.service.account import get_system_account_for_node
+from stustapay.core.service.account import get_system_account_ids
 from stustapay.core.service.order.age_checks import find_oldest_customer
 from stustapay.core.service.order.booking import (
     BookingIdentifier,
@@ -182,10 +182,11 @@ async def make_ticket_sale_bookings(
         if line_item.product.type != ProductType.topup:
             total_ticket_price += line_item.total_price
 
-    cash_entry_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_entry)
-    cash_topup_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_topup_source)
-    sumup_entry_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.sumup_entry)
-    sale_exit_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.sale_exit)
+    system_account_ids = await get_system_account_ids(conn=conn, node=node)
+    cash_entry_acc_id = system_account_ids[AccountType.cash_entry]
+    cash_topup_acc_id = system_account_ids[AccountType.cash_topup_source]
+    sumup_entry_acc_id = system_account_ids[AccountType.sumup_entry]
+    sale_exit_acc_id = system_account_ids[AccountType.sale_exit]
 
     prepared_bookings: dict[BookingIdentifier, float] = {}
 
@@ -201,29 +202,29 @@ async def make_ticket_sale_bookings(
                 conn=conn, node=node, cash_register_id=current_till.active_cash_register_id
             )
             prepared_bookings[
-                BookingIdentifier(source_account_id=cash_entry_acc.id, target_account_id=cash_register_account_id)
+                BookingIdentifier(source_account_id=cash_entry_acc_id, target_account_id=cash_register_account_id)
             ] = ticket_sale.total_price
             prepared_bookings[
-                BookingIdentifier(source_account_id=cash_topup_acc.id, target_account_id=sale_exit_acc.id)
+                BookingIdentifier(source_account_id=cash_topup_acc_id, target_account_id=sale_exit_acc_id)
             ] = total_ticket_price
 
             for customer in customers:
                 topup_amount = customer.top_up_amount + customer.ticket_included_top_up
                 if topup_amount > 0:
                     prepared_bookings[
-                        BookingIdentifier(source_account_id=cash_topup_acc.id, target_account_id=customer.account_id)
+                        BookingIdentifier(source_account_id=cash_topup_acc_id, target_account_id=customer.account_id)
                     ] = topup_amount
 
     elif ticket_sale.payment_method == PaymentMethod.sumup:
         prepared_bookings[
-            BookingIdentifier(source_account_id=sumup_entry_acc.id, target_account_id=sale_exit_acc.id)
+            BookingIdentifier(source_account_id=sumup_entry_acc_id, target_account_id=sale_exit_acc_id)
         ] = total_ticket_price
 
         for customer in customers:
             topup_amount = customer.top_up_amount + customer.ticket_included_top_up
             if topup_amount > 0:
                 prepared_bookings[
-                    BookingIdentifier(source_account_id=sumup_entry_acc.id, target_account_id=customer.account_id)
+                    BookingIdentifier(source_account_id=sumup_entry_acc_id, target_account_id=customer.account_id)
                 ] = topup_amount
 
     else:
@@ -294,8 +295,9 @@ async def make_topup_bookings(
         )
     ]
 
-    cash_entry_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_entry)
-    cash_topup_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_topup_source)
+    system_account_ids = await get_system_account_ids(conn=conn, node=node)
+    cash_entry_acc_id = system_account_ids[AccountType.cash_entry]
+    cash_topup_acc_id = system_account_ids[AccountType.cash_topup_source]
 
     if top_up.payment_method == PaymentMethod.cash:
         if current_till.active_cash_register_id is None:
@@ -305,26 +307,22 @@ async def make_topup_bookings(
         )
         bookings = {
             BookingIdentifier(
-                source_account_id=cash_topup_acc.id,
+                source_account_id=cash_topup_acc_id,
                 target_account_id=top_up.customer_account_id,
             ): top_up.amount,
             BookingIdentifier(
-                source_account_id=cash_entry_acc.id,
+                source_account_id=cash_entry_acc_id,
                 target_account_id=cash_register_account_id,
             ): top_up.amount,
         }
     elif top_up.payment_method == PaymentMethod.sumup or top_up.payment_method == PaymentMethod.sumup_online:
         if top_up.payment_method == PaymentMethod.sumup:
-            sumup_entry_acc = await get_system_account_for_node(
-                conn=conn, node=node, account_type=AccountType.sumup_entry
-            )
+            sumup_entry_acc_id = system_account_ids[AccountType.sumup_entry]
         else:
-            sumup_entry_acc = await get_system_account_for_node(
-                conn=conn, node=node, account_type=AccountType.sumup_online_entry
-            )
+            sumup_entry_acc_id = system_account_ids[AccountType.sumup_online_entry]
         bookings = {
             BookingIdentifier(
-                source_account_id=sumup_entry_acc.id,
+                source_account_id=sumup_entry_acc_id,
                 target_account_id=top_up.customer_account_id,
             ): top_up.amount
         }
@@ -18,6 +18,7 @@ from stustapay.core.service.common.decorators import (
     requires_user,
 )
 from stustapay.core.service.common.error import InvalidArgument
+from stustapay.core.service.order.stats_cache import order_stats_cache
 from stustapay.core.service.product import fetch_pay_out_product, fetch_top_up_product
 from stustapay.core.service.tree.common import fetch_event_for_node
 
@@ -72,6 +73,12 @@ class TimeseriesStats(BaseModel):
 
 
 class TimeseriesStatsQuery(BaseModel):
+    """
+    Time range of the requested stats. Stats read from the hourly order rollup have a granularity of one hour, they
+    include every hour overlapping [from_time, to_time): the hour containing from_time is counted completely, an hour
+    starting exactly at to_time is not.
+    """
+
     from_time: Optional[datetime]
     to_time: Optional[datetime]
 
@@ -112,6 +119,18 @@ class RevenueStats(BaseModel):
     hourly_intervals: list[StatInterval]
 
 
+class StatsOverview(BaseModel):
+    from_time: datetime
+    to_time: datetime
+    product_stats: ProductStats
+    entry_stats: TimeseriesStats
+    top_up_stats: TimeseriesStats
+    pay_out_stats: TimeseriesStats
+    payment_method_stats: list[PaymentMethodStats]
+    voucher_stats: VoucherStats
+    free_ticket_stats: FreeTicketStats
+
+
 def get_event_time_bounds(query: TimeseriesStatsQuery, event: PublicEventSettings) -> tuple[datetime, datetime]:
     if query.from_time is not None and query.to_time is not None and query.from_time > query.to_time:
         raise InvalidArgument("Stats start time must be before end time")
@@ -121,20 +140,21 @@ def get_event_time_bounds(query: TimeseriesStatsQuery, event: PublicEventSetting
     return from_t, to_t
 
 
+# the hourly statistics are read from the order_stats_hourly rollup, time bounds are therefore applied per hour,
+# see TimeseriesStatsQuery
 async def get_hourly_entry_stats(*, conn: Connection, node: Node, from_time: datetime, to_time: datetime) -> Timeseries:
     stats = await conn.fetch_many(
         StatInterval,
         "select "
-        "   date_trunc('hour', o.booked_at) as from_time, "
-        "   date_trunc('hour', o.booked_at) + interval '1 hour' as to_time, "
-        "   sum(li.quantity) as count,"
-        "   round(sum(li.total_price), 2) as revenue "
-        "from orders_at_node_and_children($3) o "
-        "join line_item li on o.id = li.order_id "
-        "join product p on li.product_id = p.id "
-        "where p.ticket_metadata_id is not null and o.booked_at >= $1 and o.booked_at <= $2 "
-        "group by from_time, to_time "
-        "order by from_time",
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   sum(s.quantity) as count,"
+        "   round(sum(s.total_price), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "join product p on s.product_id = p.id "
+        "where p.ticket_metadata_id is not null and s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "group by s.hour "
+        "order by s.hour",
         from_time,
         to_time,
         node.id,
@@ -151,16 +171,14 @@ async def get_hourly_top_up_stats(
     stats = await conn.fetch_many(
         StatInterval,
         "select "
-        "   date_trunc('hour', o.booked_at) as from_time, "
-        "   date_trunc('hour', o.booked_at) + interval '1 hour' as to_time, "
-        "   sum(li.quantity) as count,"
-        "   round(sum(li.total_price), 2) as revenue "
-        "from orders_at_node_and_children($3) o "
-        "join line_item li on o.id = li.order_id "
-        "join product p on li.product_id = p.id "
-        "where p.id = $4 and o.booked_at >= $1 and o.booked_at <= $2 "
-        "group by from_time, to_time "
-        "order by from_time",
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   sum(s.quantity) as count,"
+        "   round(sum(s.total_price), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "where s.product_id = $4 and s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "group by s.hour "
+        "order by s.hour",
         from_time,
         to_time,
         node.id,
@@ -178,16 +196,14 @@ async def get_hourly_pay_out_stats(
     stats = await conn.fetch_many(
         StatInterval,
         "select "
-        "   date_trunc('hour', o.booked_at) as from_time, "
-        "   date_trunc('hour', o.booked_at) + interval '1 hour' as to_time, "
-        "   sum(li.quantity) as count,"
-        "   round(sum(li.total_price), 2) as revenue "
-        "from orders_at_node_and_children($3) o "
-        "join line_item li on o.id = li.order_id "
-        "join product p on li.product_id = p.id "
-        "where p.id = $4 and o.booked_at >= $1 and o.booked_at <= $2 "
-        "group by from_time, to_time "
-        "order by from_time",
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   sum(s.quantity) as count,"
+        "   round(sum(s.total_price), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "where s.product_id = $4 and s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "group by s.hour "
+        "order by s.hour",
         from_time,
         to_time,
         node.id,
@@ -210,15 +226,15 @@ async def get_hourly_sales_stats(*, conn: Connection, node: Node, from_time: dat
     stats = await conn.fetch_many(
         StatInterval,
         "select "
-        "   date_trunc('hour', o.booked_at) as from_time, "
-        "   date_trunc('hour', o.booked_at) + interval '1 hour' as to_time, "
-        "   sum(li.quantity) as count,"
-        "   round(sum(li.total_price), 2) as revenue "
-        "from orders_at_node_and_children($3) o "
-        "join line_item li on o.id = li.order_id "
-        "where o.booked_at >= $1 and o.booked_at <= $2 and (o.order_type = 'sale' or o.order_type = 'cancel_sale')"
-        "group by from_time, to_time "
-        "order by from_time",
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   sum(s.quantity) as count,"
+        "   round(sum(s.total_price), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "where s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "   and (s.order_type = 'sale' or s.order_type = 'cancel_sale') "
+        "group by s.hour "
+        "order by s.hour",
         from_time,
         to_time,
         node.id,
@@ -234,21 +250,17 @@ async def get_hourly_product_stats(
         "select s.*, prod.name as product_name, nod.id as node_id, nod.name as node_name "
         "from (select "
         "   p.id as product_id, "
-        "   date_trunc('hour', o.booked_at) as from_time, "
-        "   date_trunc('hour', o.booked_at) + interval '1 hour' as to_time, "
-        "   sum(li.quantity) as count,"
-        "   round(sum(li.total_price), 2) as revenue "
-        "from order_value o "
-        "join till t on o.till_id = t.id "
-        "join line_item li on o.id = li.order_id "
-        "join product p on li.product_id = p.id "
-        "join node n on t.node_id = n.id "
-        "where o.booked_at >= $1 and o.booked_at <= $2 "
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   sum(s.quantity) as count,"
+        "   round(sum(s.total_price), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "join product p on s.product_id = p.id "
+        "where s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
         "   and p.type = 'user_defined' "
-        "   and ($3 = any(n.parent_ids) or n.id = $3) "
         "   and p.is_returnable = $4 "
-        "group by p.id, from_time, to_time "
-        "order by from_time) s "
+        "group by p.id, s.hour "
+        "order by s.hour) s "
         "join product prod on s.product_id = prod.id "
         "join node nod on prod.node_id = nod.id",
         from_time,
@@ -256,10 +268,14 @@ async def get_hourly_product_stats(
         node.id,
         returnable,
     )
+    return _product_timeseries(result)
+
+
+def _product_timeseries(rows: list[asyncpg.Record]) -> list[ProductTimeseries]:
     product_timeseries_map: dict[int, list[StatInterval]] = {}
     product_names: dict[int, str] = {}
     product_nodes: dict[int, tuple[int, str]] = {}
-    for row in result:
+    for row in rows:
         product_timeseries_map.setdefault(row["product_id"], []).append(
             StatInterval(from_time=row["from_time"], to_time=row["to_time"], count=row["count"], revenue=row["revenue"])
         )
@@ -283,14 +299,13 @@ async def fetch_payment_method_stats(
     return await conn.fetch_many(
         PaymentMethodStats,
         "select "
-        "   o.payment_method as payment_method, "
-        "   count(distinct o.id) as count, "
-        "   round(coalesce(sum(li.total_price), 0), 2) as revenue "
-        "from orders_at_node_and_children($3) o "
-        "join line_item li on o.id = li.order_id "
-        "where o.booked_at >= $1 and o.booked_at <= $2 "
-        "   and o.order_type in ('sale', 'cancel_sale', 'top_up', 'pay_out', 'ticket') "
-        "group by o.payment_method "
+        "   s.payment_method as payment_method, "
+        "   sum(s.n_orders) as count, "
+        "   round(coalesce(sum(s.total_price), 0), 2) as revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "where s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "   and s.order_type in ('sale', 'cancel_sale', 'top_up', 'pay_out', 'ticket') "
+        "group by s.payment_method "
         "order by revenue desc",
         from_time,
         to_time,
@@ -298,6 +313,35 @@ async def fetch_payment_method_stats(
     )
 
 
+async def fetch_voucher_stats(*, conn: Connection, node: Node, from_time: datetime, to_time: datetime) -> VoucherStats:
+    return await conn.fetch_one(
+        VoucherStats,
+        "select "
+        "   coalesce(sum(case when sa.type = 'voucher_create' then t.vouchers else 0 end), 0) as vouchers_issued, "
+        "   coalesce(sum(case when sa.type != 'voucher_create' then t.vouchers else 0 end), 0) as vouchers_spent "
+        "from transaction t "
+        "join account sa on t.source_account = sa.id "
+        "join account ta on t.target_account = ta.id "
+        "where t.booked_at >= $1 and t.booked_at <= $2"
+        "   and sa.node_id = $3",
+        from_time,
+        to_time,
+        node.event_node_id,
+    )
+
+
+async def fetch_free_ticket_stats(
+    *, conn: Connection, node: Node, from_time: datetime, to_time: datetime
+) -> FreeTicketStats:
+    free_tickets_issued = await conn.fetchval(
+        "select count(*) from free_ticket_grant where event_node_id = $1 and granted_at >= $2 and granted_at <= $3",
+        node.event_node_id,
+        from_time,
+        to_time,
+    )
+    return FreeTicketStats(free_tickets_issued=free_tickets_issued or 0)
+
+
 async def get_daily_stats(*, hourly_stats: Timeseries, event: PublicEventSettings) -> Timeseries:
     if event.daily_end_time is None:
         raise InvalidArgument("daily end time must be set for this event to accurately compute the daily statistics")
@@ -338,17 +382,13 @@ async def get_product_vouchers_redeemed(
     *, conn: Connection, node: Node, from_time: datetime, to_time: datetime
 ) -> dict[int, int]:
     rows = await conn.fetch(
-        "select li.product_id, coalesce(sum(li.vouchers_redeemed), 0) as vouchers_redeemed "
-        "from line_item li "
-        "join ordr o on li.order_id = o.id "
-        "join till til on o.till_id = til.id "
-        "join node n on til.node_id = n.id "
-        "join product p on li.product_id = p.id "
-        "where o.booked_at >= $1 and o.booked_at <= $2 "
-        "   and ($3 = any(n.parent_ids) or n.id = $3) "
-        "   and o.order_type in ('sale', 'cancel_sale') "
+        "select s.product_id, coalesce(sum(s.vouchers_redeemed), 0) as vouchers_redeemed "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "join product p on s.product_id = p.id "
+        "where s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "   and s.order_type in ('sale', 'cancel_sale') "
         "   and p.type = 'user_defined' "
-        "group by li.product_id",
+        "group by s.product_id",
         from_time,
         to_time,
         node.id,
@@ -356,6 +396,218 @@ async def get_product_vouchers_redeemed(
     return {row["product_id"]: row["vouchers_redeemed"] for row in rows}
 
 
+async def compute_product_stats(
+    *, conn: Connection, node: Node, event: PublicEventSettings, from_time: datetime, to_time: datetime
+) -> ProductStats:
+    hourly_stats = await get_hourly_sales_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
+    daily_stats = await get_daily_stats(hourly_stats=hourly_stats, event=event)
+
+    hourly_product_stats = await get_hourly_product_stats(
+        conn=conn, node=node, from_time=from_time, to_time=to_time, returnable=False
+    )
+    hourly_deposit_stats = await get_hourly_product_stats(
+        conn=conn, node=node, from_time=from_time, to_time=to_time, returnable=True
+    )
+
+    vouchers_by_product = await get_product_vouchers_redeemed(
+        conn=conn, node=node, from_time=from_time, to_time=to_time
+    )
+    return _assemble_product_stats(
+        hourly_stats=hourly_stats,
+        daily_stats=daily_stats,
+        hourly_product_stats=hourly_product_stats,
+        hourly_deposit_stats=hourly_deposit_stats,
+        vouchers_by_product=vouchers_by_product,
+    )
+
+
+def _overall_product_stats(
+    hourly_product_stats: list[ProductTimeseries], vouchers_by_product: dict[int, int]
+) -> list[ProductOverallStats]:
+    overall_stats = []
+    for hourly_product in hourly_product_stats:
+        s = ProductOverallStats(
+            product_id=hourly_product.product_id,
+            count=0,
+            revenue=0,
+            product_name=hourly_product.product_name,
+            node_id=hourly_product.node_id,
+            node_name=hourly_product.node_name,
+            vouchers_redeemed=vouchers_by_product.get(hourly_product.product_id, 0),
+        )
+        for interval in hourly_product.intervals:
+            s.count += interval.count  # pylint: disable=no-member
+            s.revenue += interval.revenue  # pylint: disable=no-member
+        overall_stats.append(s)
+    return overall_stats
+
+
+def _assemble_product_stats(
+    *,
+    hourly_stats: Timeseries,
+    daily_stats: Timeseries,
+    hourly_product_stats: list[ProductTimeseries],
+    hourly_deposit_stats: list[ProductTimeseries],
+    vouchers_by_product: dict[int, int],
+) -> ProductStats:
+    return ProductStats(
+        from_time=hourly_stats.from_time,
+        to_time=hourly_stats.to_time,
+        hourly_intervals=hourly_stats.intervals,
+        daily_intervals=daily_stats.intervals,
+        product_hourly_intervals=hourly_product_stats,
+        product_overall_stats=_overall_product_stats(hourly_product_stats, vouchers_by_product),
+        deposit_hourly_intervals=hourly_deposit_stats,
+        deposit_overall_stats=_overall_product_stats(hourly_deposit_stats, {}),
+    )
+
+
+async def compute_revenue_stats(
+    *, conn: Connection, node: Node, event: PublicEventSettings, from_time: datetime, to_time: datetime
+) -> RevenueStats:
+    hourly_stats = await get_hourly_sales_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
+    daily_stats = await get_daily_stats(hourly_stats=hourly_stats, event=event)
+
+    return RevenueStats(
+        from_time=hourly_stats.from_time,
+        to_time=hourly_stats.to_time,
+        hourly_intervals=hourly_stats.intervals,
+        daily_intervals=daily_stats.intervals,
+    )
+
+
+async def compute_stats_overview(
+    *, conn: Connection, node: Node, event: PublicEventSettings, from_time: datetime, to_time: datetime
+) -> StatsOverview:
+    """
+    Computes the series of the individual stats endpoints with a single query over the hourly order rollup.
+
+    The grouping sets return one row per hour and product for the product stats, one row per hour for the sales,
+    entry, top up and pay out series and one row per payment method. Each series only aggregates the rollup rows
+    matching the filter of its endpoint.
+    """
+    top_up_product = await fetch_top_up_product(conn=conn, node=node)
+    pay_out_product = await fetch_pay_out_product(conn=conn, node=node)
+
+    rows = await conn.fetch(
+        "select "
+        "   grouping(s.hour) = 0 and grouping(p.id) = 0 as is_product_row, "
+        "   grouping(s.hour) = 0 and grouping(p.id) = 1 as is_hour_row, "
+        "   s.hour as from_time, "
+        "   s.hour + interval '1 hour' as to_time, "
+        "   s.payment_method, "
+        "   p.id as product_id, "
+        "   p.name as product_name, "
+        "   p.type = 'user_defined' and not p.is_returnable as is_sold_product, "
+        "   p.type = 'user_defined' and p.is_returnable as is_deposit, "
+        "   nod.id as node_id, "
+        "   nod.name as node_name, "
+        "   sum(s.quantity) as count, "
+        "   round(sum(s.total_price), 2) as revenue, "
+        "   coalesce(sum(s.vouchers_redeemed) filter (where s.order_type in ('sale', 'cancel_sale')), 0) "
+        "       as vouchers_redeemed, "
+        "   sum(s.quantity) filter (where s.order_type in ('sale', 'cancel_sale')) as sale_count, "
+        "   round(sum(s.total_price) filter (where s.order_type in ('sale', 'cancel_sale')), 2) as sale_revenue, "
+        "   sum(s.quantity) filter (where p.ticket_metadata_id is not null) as entry_count, "
+        "   round(sum(s.total_price) filter (where p.ticket_metadata_id is not null), 2) as entry_revenue, "
+        "   sum(s.quantity) filter (where p.id = $4) as top_up_count, "
+        "   round(sum(s.total_price) filter (where p.id = $4), 2) as top_up_revenue, "
+        "   sum(s.quantity) filter (where p.id = $5) as pay_out_count, "
+        "   round(sum(s.total_price) filter (where p.id = $5), 2) as pay_out_revenue, "
+        "   sum(s.n_orders) filter (where s.order_type in ('sale', 'cancel_sale', 'top_up', 'pay_out', 'ticket')) "
+        "       as payment_method_count, "
+        "   round(sum(s.total_price) "
+        "       filter (where s.order_type in ('sale', 'cancel_sale', 'top_up', 'pay_out', 'ticket')), 2) "
+        "       as payment_method_revenue "
+        "from order_stats_hourly_at_node_and_children($3) s "
+        "join product p on s.product_id = p.id "
+        "join node nod on p.node_id = nod.id "
+        "where s.hour >= date_trunc('hour', $1::timestamptz) and s.hour < $2 "
+        "group by grouping sets ("
+        "   (s.hour, p.id, p.name, p.type, p.is_returnable, nod.id, nod.name), "
+        "   (s.hour), "
+        "   (s.payment_method)"
+        ") "
+        "order by s.hour",
+        from_time,
+        to_time,
+        node.id,
+        top_up_product.id,
+        pay_out_product.id,
+    )
+
+    def hourly_series(series: str) -> Timeseries:
+        return Timeseries(
+            from_time=from_time,
+            to_time=to_time,
+            intervals=[
+                StatInterval(
+                    from_time=row["from_time"],
+                    to_time=row["to_time"],
+                    count=row[f"{series}_count"],
+                    revenue=row[f"{series}_revenue"],
+                )
+                for row in rows
+                if row["is_hour_row"] and row[f"{series}_count"] is not None
+            ],
+        )
+
+    async def timeseries_stats(series: str) -> TimeseriesStats:
+        hourly_stats = hourly_series(series)
+        daily_stats = await get_daily_stats(hourly_stats=hourly_stats, event=event)
+        return TimeseriesStats(
+            from_time=from_time,
+            to_time=to_time,
+            hourly_intervals=hourly_stats.intervals,
+            daily_intervals=daily_stats.intervals,
+        )
+
+    product_rows = [row for row in rows if row["is_product_row"]]
+    vouchers_by_product: dict[int, int] = {}
+    for row in product_rows:
+        if row["is_sold_product"]:
+            vouchers_by_product[row["product_id"]] = (
+                vouchers_by_product.get(row["product_id"], 0) + row["vouchers_redeemed"]
+            )
+
+    sales_stats = hourly_series("sale")
+    product_stats = _assemble_product_stats(
+        hourly_stats=sales_stats,
+        daily_stats=await get_daily_stats(hourly_stats=sales_stats, event=event),
+        hourly_product_stats=_product_timeseries([row for row in product_rows if row["is_sold_product"]]),
+        hourly_deposit_stats=_product_timeseries([row for row in product_rows if row["is_deposit"]]),
+        vouchers_by_product=vouchers_by_product,
+    )
+
+    payment_method_stats = [
+        PaymentMethodStats(
+            payment_method=row["payment_method"],
+            count=row["payment_method_count"],
+            revenue=row["payment_method_revenue"],
+        )
+        for row in rows
+        if row["payment_method"] is not None and row["payment_method_count"] is not None
+    ]
+    payment_method_stats.sort(key=lambda stat: stat.revenue, reverse=True)
+
+    return StatsOverview(
+        from_time=from_time,
+        to_time=to_time,
+        product_stats=product_stats,
+        entry_stats=await timeseries_stats("entry"),
+        top_up_stats=await timeseries_stats("top_up"),
+        pay_out_stats=await timeseries_stats("pay_out"),
+        payment_method_stats=payment_method_stats,
+        voucher_stats=await fetch_voucher_stats(conn=conn, node=node, from_time=from_time, to_time=to_time),
+        free_ticket_stats=await fetch_free_ticket_stats(conn=conn, node=node, from_time=from_time, to_time=to_time),
+    )
+
+
+def _stats_cache_key(stats: str, node: Node, event: PublicEventSettings, from_time: datetime, to_time: datetime):
+    # the daily intervals depend on the event settings
+    return stats, node.id, from_time, to_time, event.start_date, event.end_date, event.daily_end_time
+
+
 class OrderStatsService(Service[Config]):
     def __init__(self, db_pool: asyncpg.Pool, config: Config, auth_service: AuthService):
         super().__init__(db_pool, config)
@@ -428,22 +680,7 @@ class OrderStatsService(Service[Config]):
         event = await fetch_event_for_node(conn=conn, node=node)
         from_time, to_time = get_event_time_bounds(query, event)
 
-        stats = await conn.fetch_one(
-            VoucherStats,
-            "select "
-            "   coalesce(sum(case when sa.type = 'voucher_create' then t.vouchers else 0 end), 0) as vouchers_issued, "
-            "   coalesce(sum(case when sa.type != 'voucher_create' then t.vouchers else 0 end), 0) as vouchers_spent "
-            "from transaction t "
-            "join account sa on t.source_account = sa.id "
-            "join account ta on t.target_account = ta.id "
-            "where t.booked_at >= $1 and t.booked_at <= $2"
-            "   and sa.node_id = $3",
-            from_time,
-            to_time,
-            node.event_node_id,
-        )
-
-        return stats
+        return await fetch_voucher_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
 
     @with_db_transaction(read_only=True)
     @requires_node()
@@ -451,63 +688,12 @@ class OrderStatsService(Service[Config]):
     async def get_product_stats(self, *, conn: Connection, node: Node, query: TimeseriesStatsQuery) -> ProductStats:
         event = await fetch_event_for_node(conn=conn, node=node)
         from_time, to_time = get_event_time_bounds(query, event)
-        hourly_stats = await get_hourly_sales_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
-        daily_stats = await get_daily_stats(hourly_stats=hourly_stats, event=event)
-
-        hourly_product_stats = await get_hourly_product_stats(
-            conn=conn, node=node, from_time=from_time, to_time=to_time, returnable=False
-        )
-        hourly_deposit_stats = await get_hourly_product_stats(
-            conn=conn, node=node, from_time=from_time, to_time=to_time, returnable=True
-        )
-
-        product_overall_stats = []
-        for hourly_product in hourly_product_stats:
-            s = ProductOverallStats(
-                product_id=hourly_product.product_id,
-                count=0,
-                revenue=0,
-                product_name=hourly_product.product_name,
-                node_id=hourly_product.node_id,
-                node_name=hourly_product.node_name,
-                vouchers_redeemed=0,
-            )
-            for interval in hourly_product.intervals:
-                s.count += interval.count  # pylint: disable=no-member
-                s.revenue += interval.revenue  # pylint: disable=no-member
-            product_overall_stats.append(s)
-
-        vouchers_by_product = await get_product_vouchers_redeemed(
-            conn=conn, node=node, from_time=from_time, to_time=to_time
-        )
-        for product_stat in product_overall_stats:
-            product_stat.vouchers_redeemed = vouchers_by_product.get(product_stat.product_id, 0)
-
-        deposit_overall_stats = []
-        for hourly_deposit in hourly_deposit_stats:
-            s = ProductOverallStats(
-                product_id=hourly_deposit.product_id,
-                count=0,
-                revenue=0,
-                product_name=hourly_deposit.product_name,
-                node_id=hourly_deposit.node_id,
-                node_name=hourly_deposit.node_name,
-                vouchers_redeemed=0,
-            )
-            for interval in hourly_deposit.intervals:
-                s.count += interval.count  # pylint: disable=no-member
-                s.revenue += interval.revenue  # pylint: disable=no-member
-            deposit_overall_stats.append(s)
-
-        return ProductStats(
-            from_time=hourly_stats.from_time,
-            to_time=hourly_stats.to_time,
-            hourly_intervals=hourly_stats.intervals,
-            daily_intervals=daily_stats.intervals,
-            product_hourly_intervals=hourly_product_stats,
-            product_overall_stats=product_overall_stats,
-            deposit_hourly_intervals=hourly_deposit_stats,
-            deposit_overall_stats=deposit_overall_stats,
+        return await order_stats_cache.get_or_compute(
+            _stats_cache_key("products", node, event, from_time, to_time),
+            lambda stats_conn: compute_product_stats(
+                conn=stats_conn, node=node, event=event, from_time=from_time, to_time=to_time
+            ),
+            conn=conn,
         )
 
     @with_db_transaction(read_only=True)
@@ -535,25 +721,43 @@ class OrderStatsService(Service[Config]):
 
         event = await fetch_event_for_node(conn=conn, node=node)
         from_time, to_time = get_event_time_bounds(query, event)
-        free_tickets_issued = await conn.fetchval(
-            "select count(*) from free_ticket_grant where event_node_id = $1 and granted_at >= $2 and granted_at <= $3",
-            node.event_node_id,
-            from_time,
-            to_time,
+        return await fetch_free_ticket_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
+
+    @with_db_transaction(read_only=True)
+    @requires_node(event_only=True)
+    @requires_user(node_privileges=[NodePrivilege.node_administration, NodePrivilege.view_node_stats])
+    async def get_stats_overview(self, *, conn: Connection, node: Node, query: TimeseriesStatsQuery) -> StatsOverview:
+        if node.event is None:
+            raise InvalidArgument("Stats overview can only be computed for event nodes")
+
+        event = await fetch_event_for_node(conn=conn, node=node)
+        from_time, to_time = get_event_time_bounds(query, event)
+        return await order_stats_cache.get_or_compute(
+            _stats_cache_key("overview", node, event, from_time, to_time),
+            lambda stats_conn: compute_stats_overview(
+                conn=stats_conn, node=node, event=event, from_time=from_time, to_time=to_time
+            ),
+            conn=conn,
         )
-        return FreeTicketStats(free_tickets_issued=free_tickets_issued or 0)
+
+    @with_db_transaction(read_only=True)
+    @requires_node()
+    @requires_user(node_privileges=[NodePrivilege.node_administration, NodePrivilege.view_node_stats])
+    async def check_live_stats_access(self, *, node: Node) -> int:
+        """
+        Live stats are streamed from live_order_stats, only the access to the node is checked here.
+        """
+        return node.id
 
     @with_db_transaction(read_only=True)
     @requires_terminal(node_privileges=[NodePrivilege.view_node_stats])
     async def get_revenue_stats(self, *, conn: Connection, node: Node, query: TimeseriesStatsQuery) -> RevenueStats:
         event = await fetch_event_for_node(conn=conn, node=node)
         from_time, to_time = get_event_time_bounds(query, event)
-        hourly_stats = await get_hourly_sales_stats(conn=conn, node=node, from_time=from_time, to_time=to_time)
-        daily_stats = await get_daily_stats(hourly_stats=hourly_stats, event=event)
-
-        return RevenueStats(
-            from_time=hourly_stats.from_time,
-            to_time=hourly_stats.to_time,
-            hourly_intervals=hourly_stats.intervals,
-            daily_intervals=daily_stats.intervals,
+        return await order_stats_cache.get_or_compute(
+            _stats_cache_key("revenue", node, event, from_time, to_time),
+            lambda stats_conn: compute_revenue_stats(
+                conn=stats_conn, node=node, event=event, from_time=from_time, to_time=to_time
+            ),
+            conn=conn,
         )
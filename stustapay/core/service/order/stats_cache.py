@@ -0,0 +1,109 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from sftkit.database import Connection
+
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedCache
+from stustapay.core.service.order.live_stats import ORDER_CHANNEL
+from stustapay.core.service.till.catalog import TILL_CATALOG_CHANGED_CHANNEL
+from stustapay.core.service.tree.cache import TREE_CHANGED_CHANNEL
+
+T = TypeVar("T")
+
+STATS_CACHE_SIZE = 256
+
+
+class OrderStatsCache(NotificationInvalidatedCache):
+    """
+    Process-wide cache of computed order statistics, keyed by the stats type, node and query bounds.
+
+    Every booked order, see new_order_added in 0002-triggers.sql, starts a new generation of the cache, as do changes
+    to the products or the node tree which are part of the results. Concurrent requests for the same stats wait for
+    the first one instead of computing them again. At most STATS_CACHE_SIZE results are kept, least recently used
+    first out.
+
+    Cached stats are shared between callers and must not be modified.
+    """
+
+    channels = (ORDER_CHANNEL, TILL_CATALOG_CHANGED_CHANNEL, TREE_CHANGED_CHANNEL)
+
+    def __init__(self, max_entries: int = STATS_CACHE_SIZE):
+        super().__init__()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._entries: OrderedDict[tuple, Any] = OrderedDict()
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "order_stats_cache_hits": self.hits,
+            "order_stats_cache_misses": self.misses,
+            "order_stats_cache_entries": len(self._entries),
+        }
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    async def get_or_compute(
+        self, key: tuple[Hashable, ...], compute: Callable[[Connection], Awaitable[T]], *, conn: Connection
+    ) -> T:
+        """
+        Returns the cached result for key or computes it with compute.
+
+        Results to be cached are computed on a separate pool connection in a read only repeatable read transaction
+        started after the cache generation was taken, never on conn: the snapshot of the request transaction may
+        predate the last invalidation. If no pool connection is available, the result is computed on conn without
+        caching it.
+        """
+        if not self.listening:
+            return await compute(conn)
+
+        generation = self._generation
+        key = (generation, *key)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.hits += 1
+            await asyncio.wait([in_flight])
+            if not in_flight.cancelled():
+                return in_flight.result()
+            # the computation we waited for failed or was not cacheable, the error is reported to its own caller
+            return await compute(conn)
+
+        self.misses += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            async with self.fill_connection() as fill_conn:
+                if fill_conn is None:
+                    future.cancel()
+                    return await compute(conn)
+                async with fill_conn.transaction(isolation="repeatable_read", readonly=True):
+                    result = await compute(fill_conn)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._in_flight[key]
+
+        future.set_result(result)
+        if self.listening and generation == self._generation:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+order_stats_cache = OrderStatsCache()
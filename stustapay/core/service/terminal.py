@@ -537,10 +537,10 @@ class TerminalService(Service[Config]):
                 "select urwp.* "
                 "from user_role_with_privileges urwp "
                 "join user_to_role urt on urwp.id = urt.role_id "
-                "join node n on urt.node_id = n.id "
+                "join node_closure c on urt.node_id = c.node_id "
                 "where urt.user_id = $1 "
                 "   and ($2 = any(urwp.event_privileges) or $3 = any(urwp.event_privileges)) "
-                "   and ($4 = any(n.parent_ids) or $4 = n.id)",
+                "   and c.ancestor_id = $4",
                 new_user_id,
                 EventPrivilege.terminal_login.name,
                 EventPrivilege.supervised_terminal_login.name,
@@ -0,0 +1,133 @@
+from sftkit.database import Connection
+
+from stustapay.core.schema.product import Product
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedCache
+
+TILL_CATALOG_CHANGED_CHANNEL = "till_catalog_changed"
+
+# till button id -> products booked by this button
+ButtonCatalog = dict[int, list[Product]]
+
+
+class TillCatalogCache(NotificationInvalidatedCache):
+    """
+    Process-wide cache of the bookable products per till profile, keyed by till button, and of products by id.
+
+    Invalidated via the till_catalog_changed notification channel, see notify_till_catalog_changed in
+    0002-triggers.sql. The cache is filled from a fresh pool connection, results which were loaded while an
+    invalidation happened are not stored. It holds all products of a till profile, not only locked ones, as every
+    product or layout change invalidates it.
+
+    Cached products are shared between callers and must not be modified.
+    """
+
+    channels = (TILL_CATALOG_CHANGED_CHANNEL,)
+
+    def __init__(self):
+        super().__init__()
+        self._button_catalogs: dict[int, ButtonCatalog] = {}
+        self._products: dict[int, Product] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._button_catalogs.clear()
+        self._products.clear()
+
+    def get_button_catalog(self, till_profile_id: int) -> ButtonCatalog | None:
+        return self._button_catalogs.get(till_profile_id)
+
+    def put_button_catalog(self, till_profile_id: int, catalog: ButtonCatalog, generation: int) -> None:
+        if self.listening and generation == self._generation:
+            self._button_catalogs[till_profile_id] = catalog
+
+    def get_product(self, product_id: int) -> Product | None:
+        return self._products.get(product_id)
+
+    def put_products(self, products: list[Product], generation: int) -> None:
+        if self.listening and generation == self._generation:
+            for product in products:
+                self._products[product.id] = product
+
+
+till_catalog_cache = TillCatalogCache()
+
+
+async def _fetch_button_catalog(
+    *, conn: Connection, till_profile_id: int, button_ids: list[int] | None
+) -> ButtonCatalog:
+    rows = await conn.fetch(
+        "select tbp.button_id, p.* from till_button_product tbp "
+        "join product_with_tax_and_restrictions p on tbp.product_id = p.id "
+        "join till_layout_to_button tltp on tltp.button_id = tbp.button_id "
+        "join till_profile tp on tp.layout_id = tltp.layout_id "
+        "where tp.id = $1 and ($2::bigint array is null or tbp.button_id = any($2))",
+        till_profile_id,
+        button_ids,
+    )
+    catalog: ButtonCatalog = {}
+    for row in rows:
+        catalog.setdefault(row["button_id"], []).append(Product.model_validate(dict(row)))
+    return catalog
+
+
+async def fetch_button_products(*, conn: Connection, till_profile_id: int, button_ids: list[int]) -> ButtonCatalog:
+    """
+    Products of the given till buttons, buttons which are not part of the layout of the till profile are missing
+    in the result.
+    While the till catalog cache is active the complete catalog of the till profile is loaded and cached instead.
+    """
+    catalog = till_catalog_cache.get_button_catalog(till_profile_id)
+    if catalog is None:
+        generation = till_catalog_cache.generation
+        async with till_catalog_cache.fill_connection() as fill_conn:
+            if fill_conn is not None:
+                catalog = await _fetch_button_catalog(conn=fill_conn, till_profile_id=till_profile_id, button_ids=None)
+                till_catalog_cache.put_button_catalog(till_profile_id, catalog, generation=generation)
+    if catalog is None:
+        return await _fetch_button_catalog(conn=conn, till_profile_id=till_profile_id, button_ids=button_ids)
+
+    missing_button_ids = [button_id for button_id in button_ids if button_id not in catalog]
+    if len(missing_button_ids) == 0:
+        return catalog
+    # the buttons may have been added by the requesting transaction or are not part of the layout
+    return {
+        **{button_id: catalog[button_id] for button_id in button_ids if button_id in catalog},
+        **await _fetch_button_catalog(conn=conn, till_profile_id=till_profile_id, button_ids=missing_button_ids),
+    }
+
+
+async def _fetch_products(*, conn: Connection, product_ids: list[int]) -> list[Product]:
+    return await conn.fetch_many(
+        Product, "select p.* from product_with_tax_and_restrictions p where p.id = any($1)", product_ids
+    )
+
+
+async def fetch_products_by_id(*, conn: Connection, product_ids: list[int]) -> dict[int, Product]:
+    products = {}
+    missing_ids = []
+    for product_id in product_ids:
+        product = till_catalog_cache.get_product(product_id)
+        if product is None:
+            missing_ids.append(product_id)
+        else:
+            products[product_id] = product
+
+    if len(missing_ids) > 0:
+        generation = till_catalog_cache.generation
+        async with till_catalog_cache.fill_connection() as fill_conn:
+            if fill_conn is not None:
+                fetched = await _fetch_products(conn=fill_conn, product_ids=missing_ids)
+                till_catalog_cache.put_products(fetched, generation=generation)
+                for product in fetched:
+                    products[product.id] = product
+        missing_ids = [product_id for product_id in missing_ids if product_id not in products]
+
+    if len(missing_ids) > 0:
+        for product in await _fetch_products(conn=conn, product_ids=missing_ids):
+            products[product.id] = product
+    return products
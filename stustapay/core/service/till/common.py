@@ -31,8 +31,9 @@ async def create_till(*, conn: Connection, node_id: int, till: NewTill) -> Till:
 async def fetch_till(*, conn: Connection, node: Node, till_id: int) -> Optional[Till]:
     return await conn.fetch_maybe_one(
         Till,
-        "select t.* from till_with_cash_register t join node n on t.node_id = n.id "
-        "where t.id = $1 and (n.id = any($2) or $3 = any(n.parent_ids))",
+        "select t.* from till_with_cash_register t "
+        "where t.id = $1 and (t.node_id = any($2) or exists(select from node_closure c "
+        "   where c.node_id = t.node_id and c.ancestor_id = $3))",
         till_id,
         node.ids_to_event_node,
         node.id,
@@ -19,7 +19,7 @@ from stustapay.core.schema.tree import Node, ObjectType
 from stustapay.core.schema.user import CurrentUser, EventPrivilege, NodePrivilege
 from stustapay.core.service.account import (
     get_account_by_id,
-    get_system_account_for_node,
+    get_system_account_ids,
     get_transport_account_by_tag_uid,
 )
 from stustapay.core.service.auth import AuthService
@@ -28,6 +28,7 @@ from stustapay.core.service.common.decorators import (
     requires_node,
     requires_terminal,
     requires_user,
+    with_retrying_db_transaction,
 )
 from stustapay.core.service.common.error import InvalidArgument, NotFound
 from stustapay.core.service.order.booking import (
@@ -114,7 +115,7 @@ class TillRegisterService(Service[Config]):
         assert node is not None
         return await _list_cash_register_stockings(conn=conn, node=node)
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def create_cash_register_stockings(
@@ -155,7 +156,7 @@ class TillRegisterService(Service[Config]):
         )
         return updated
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def update_cash_register_stockings(
@@ -204,7 +205,7 @@ class TillRegisterService(Service[Config]):
         )
         return updated
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def delete_cash_register_stockings(
@@ -246,7 +247,7 @@ class TillRegisterService(Service[Config]):
     async def get_cash_register_admin(self, *, conn: Connection, node: Node, register_id: int) -> CashRegister:
         return await get_cash_register(conn=conn, node=node, register_id=register_id)
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def create_cash_register(
@@ -262,7 +263,7 @@ class TillRegisterService(Service[Config]):
         )
         return register
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def update_cash_register(
@@ -286,7 +287,7 @@ class TillRegisterService(Service[Config]):
         )
         return r
 
-    @with_db_transaction
+    @with_retrying_db_transaction
     @requires_node(object_types=[ObjectType.till])
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def delete_cash_register(self, *, conn: Connection, node: Node, current_user: CurrentUser, register_id: int):
@@ -301,7 +302,7 @@ class TillRegisterService(Service[Config]):
         )
         return result != "DELETE 0"
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(event_privileges=[EventPrivilege.cash_transport])
     async def stock_up_cash_register(
         self,
@@ -349,7 +350,8 @@ class TillRegisterService(Service[Config]):
 
         node = await fetch_node(conn=conn, node_id=current_till.node_id)
         assert node is not None
-        cash_vault_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_vault)
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        cash_vault_acc_id = system_account_ids[AccountType.cash_vault]
 
         stock_up_amount = 0.0
         if stocking_id is not None:
@@ -360,7 +362,7 @@ class TillRegisterService(Service[Config]):
             await book_transaction(
                 conn=conn,
                 description=f"cash register stock up using template: {register_stocking.name}",
-                source_account_id=cash_vault_acc.id,
+                source_account_id=cash_vault_acc_id,
                 target_account_id=cash_register_account_id,
                 amount=register_stocking.total,
                 conducting_user_id=current_user.id,
@@ -378,7 +380,7 @@ class TillRegisterService(Service[Config]):
         )
         return True
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(event_privileges=[EventPrivilege.cash_transport])
     async def modify_cashier_account_balance(
         self,
@@ -451,7 +453,7 @@ class TillRegisterService(Service[Config]):
             node_id=node.id,
         )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal(event_privileges=[EventPrivilege.cash_transport])
     async def modify_transport_account_balance(
         self,
@@ -471,12 +473,13 @@ class TillRegisterService(Service[Config]):
                 f"Insufficient balance on transport account. Current balance is {transport_account.balance}."
             )
 
-        cash_vault_acc = await get_system_account_for_node(conn=conn, node=node, account_type=AccountType.cash_vault)
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        cash_vault_acc_id = system_account_ids[AccountType.cash_vault]
 
         await book_transaction(
             conn=conn,
             description="transport account balance modification",
-            source_account_id=cash_vault_acc.id,
+            source_account_id=cash_vault_acc_id,
             target_account_id=transport_account.id,
             amount=amount,
             conducting_user_id=current_user.id,
@@ -560,7 +563,7 @@ class TillRegisterService(Service[Config]):
         )
         return reg
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration])
     async def transfer_cash_register_admin(
@@ -574,7 +577,7 @@ class TillRegisterService(Service[Config]):
             originating_user_id=current_user.id,
         )
 
-    @with_db_transaction(read_only=False)
+    @with_retrying_db_transaction
     @requires_terminal()
     async def transfer_cash_register_terminal(
         self,
@@ -103,8 +103,9 @@ class TillService(Service[Config]):
     async def list_tills(self, *, node: Node, conn: Connection) -> list[Till]:
         return await conn.fetch_many(
             Till,
-            "select t.* from till_with_cash_register t join node n on t.node_id = n.id "
-            "where (t.node_id = any($1) or $2 = any(n.parent_ids)) and not t.is_virtual "
+            "select t.* from till_with_cash_register t "
+            "where (t.node_id = any($1) or exists(select from node_closure c "
+            "   where c.node_id = t.node_id and c.ancestor_id = $2)) and not t.is_virtual "
             "order by t.name",
             node.ids_to_event_node,
             node.id,
@@ -224,7 +225,7 @@ class TillService(Service[Config]):
     @requires_terminal(requires_till=False)
     async def get_customer_orders(self, *, conn: Connection, node: Node, customer_tag_uid: int) -> list[DetailedOrder]:
         customer_id = await conn.fetchval(
-            "select id from account_with_history a where a.user_tag_uid = $1 and node_id = any($2)",
+            "select id from account_core a where a.user_tag_uid = $1 and node_id = any($2)",
             customer_tag_uid,
             node.ids_to_event_node,
         )
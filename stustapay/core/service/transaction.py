@@ -13,7 +13,11 @@ async def book_transaction(
     voucher_amount: int = 0,
     description: str = "",
     order_id: Optional[int] = None,
+    balance_shard_key: Optional[int] = None,
 ) -> int:
+    """
+    balance_shard_key selects the balance shard of accounts with multiple balance shards, usually the till id.
+    """
     return await conn.fetchval(
         "select * from book_transaction("
         "   order_id => $1,"
@@ -22,7 +26,8 @@ async def book_transaction(
         "   target_account_id => $4,"
         "   amount => $5,"
         "   vouchers_amount => $6,"
-        "   conducting_user_id => $7)",
+        "   conducting_user_id => $7,"
+        "   balance_shard_key => $8)",
         order_id,
         description,
         source_account_id,
@@ -30,4 +35,44 @@ async def book_transaction(
         amount,
         voucher_amount,
         conducting_user_id,
+        balance_shard_key,
     )
+
+
+async def book_transactions(
+    *,
+    conn: Connection,
+    source_account_ids: list[int],
+    target_account_ids: list[int],
+    amounts: list[float],
+    voucher_amounts: Optional[list[int]] = None,
+    descriptions: Optional[list[str]] = None,
+    conducting_user_id: Optional[int] = None,
+    order_id: Optional[int] = None,
+    balance_shard_key: Optional[int] = None,
+) -> list[int]:
+    """
+    Book multiple transactions with a single database round trip, returns the transaction ids in booking order.
+    """
+    if len(amounts) == 0:
+        return []
+    rows = await conn.fetch(
+        "select * from book_transactions("
+        "   order_id => $1,"
+        "   source_account_ids => $2,"
+        "   target_account_ids => $3,"
+        "   amounts => $4,"
+        "   vouchers_amounts => $5,"
+        "   descriptions => $6,"
+        "   conducting_user_id => $7,"
+        "   balance_shard_key => $8)",
+        order_id,
+        source_account_ids,
+        target_account_ids,
+        amounts,
+        voucher_amounts,
+        descriptions,
+        conducting_user_id,
+        balance_shard_key,
+    )
+    return [row[0] for row in rows]
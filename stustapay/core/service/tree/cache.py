@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+
+from sftkit.database import Connection
+
+from stustapay.core.schema.tree import Language, Node, RestrictedEventSettings
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedSnapshot
+
+TREE_CHANGED_CHANNEL = "tree_changed"
+EVENT_SETTINGS_CHANGED_CHANNEL = "event_settings_changed"
+
+
+async def _fetch_all_translation_texts(conn: Connection) -> dict[int, dict[Language, dict[str, str]]]:
+    translation_texts: dict[int, dict[Language, dict[str, str]]] = {}
+    for row in await conn.fetch("select event_id, lang_code, type, content from translation_text"):
+        event_texts = translation_texts.setdefault(row["event_id"], {})
+        event_texts.setdefault(Language(row["lang_code"]), {})[row["type"]] = row["content"]
+    return translation_texts
+
+
+@dataclass(frozen=True)
+class _NodeTreeSnapshot:
+    nodes: dict[int, Node]
+    # node id -> ids of the direct children, ordered by path
+    children: dict[int, list[int]]
+
+
+class NodeTreeCache(NotificationInvalidatedSnapshot[_NodeTreeSnapshot]):
+    """
+    Process-wide cache of the complete node tree, including the public event settings and translations of all event
+    nodes. Invalidated via the tree_changed notification channel, see notify_tree_changed in 0002-triggers.sql.
+
+    Cached nodes are shared between callers and must not be modified.
+    """
+
+    channels = (TREE_CHANGED_CHANNEL,)
+
+    def get_node(self, node_id: int) -> Node | None:
+        """
+        Returns the cached node without its children, None if the cache is inactive or the node is not known
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return snapshot.nodes.get(node_id)
+
+    def get_node_with_children(self, node_id: int) -> Node | None:
+        snapshot = self._snapshot
+        if snapshot is None or node_id not in snapshot.nodes:
+            return None
+        return self._build_subtree(snapshot, node_id)
+
+    def _build_subtree(self, snapshot: _NodeTreeSnapshot, node_id: int) -> Node:
+        node = snapshot.nodes[node_id].model_copy(update={"children": []})
+        for child_id in snapshot.children.get(node_id, []):
+            node.children.append(self._build_subtree(snapshot, child_id))
+        return node
+
+    async def _load_snapshot(self, conn: Connection) -> _NodeTreeSnapshot:
+        nodes = await conn.fetch_many(
+            Node, "select n.*, '{}'::json array as children from node_with_allowed_objects n order by n.path asc"
+        )
+        translation_texts = await _fetch_all_translation_texts(conn=conn)
+
+        node_map: dict[int, Node] = {}
+        children: dict[int, list[int]] = {}
+        for node in nodes:
+            if node.event is not None:
+                node.event.translation_texts = translation_texts.get(node.event.id, {})
+            node_map[node.id] = node
+            if node.parent != node.id:
+                children.setdefault(node.parent, []).append(node.id)
+        return _NodeTreeSnapshot(nodes=node_map, children=children)
+
+
+node_tree_cache = NodeTreeCache()
+
+
+class EventSettingsCache(NotificationInvalidatedSnapshot[dict[int, RestrictedEventSettings]]):
+    """
+    Process-wide cache of the restricted settings of all events, keyed by event node id. Invalidated via the
+    event_settings_changed notification channel, see notify_event_settings_changed in 0002-triggers.sql.
+
+    Cached settings are shared between callers and must not be modified.
+    """
+
+    channels = (EVENT_SETTINGS_CHANGED_CHANNEL,)
+
+    def __init__(self):
+        super().__init__()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "event_settings_cache_hits": self.hits,
+            "event_settings_cache_misses": self.misses,
+            "event_settings_cache_hit_rate": self.hit_rate,
+        }
+
+    def get(self, event_node_id: int) -> RestrictedEventSettings | None:
+        snapshot = self._snapshot
+        settings = snapshot.get(event_node_id) if snapshot is not None else None
+        if settings is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return settings
+
+    async def _load_snapshot(self, conn: Connection) -> dict[int, RestrictedEventSettings]:
+        rows = await conn.fetch(
+            "select n.id as node_id, row_to_json(e) as settings "
+            "from event_with_translations e join node n on n.event_id = e.id"
+        )
+        translation_texts = await _fetch_all_translation_texts(conn=conn)
+        event_settings: dict[int, RestrictedEventSettings] = {}
+        for row in rows:
+            settings = RestrictedEventSettings.model_validate(row["settings"])
+            settings.translation_texts = translation_texts.get(settings.id, {})
+            event_settings[row["node_id"]] = settings
+        return event_settings
+
+
+event_settings_cache = EventSettingsCache()
@@ -12,6 +12,7 @@ from stustapay.core.schema.tree import (
 from stustapay.core.schema.user import CurrentUser
 from stustapay.core.service.common.error import NotFound
 from stustapay.core.service.media import fetch_blob
+from stustapay.core.service.tree.cache import event_settings_cache, node_tree_cache
 
 
 class TranslationText(BaseModel):
@@ -32,7 +33,18 @@ async def _fetch_translation_textx(conn: Connection, event_id: int) -> dict[Lang
     return result
 
 
-async def fetch_node(conn: Connection, node_id: int) -> Node | None:
+async def fetch_node(conn: Connection, node_id: int, cached: bool = True) -> Node | None:
+    """
+    Fetch a single node without its subtree, children will always be empty. Use fetch_node_with_children if the
+    subtree is needed.
+    Uses the process-wide node tree cache if active, the returned node is then shared and must not be modified. Code
+    which modifies the tree and reads it back within the same transaction needs to pass cached=False.
+    """
+    if cached:
+        cached_node = node_tree_cache.get_node(node_id)
+        if cached_node is not None:
+            return cached_node
+
     node = await conn.fetch_maybe_one(
         Node, "select n.*, '{}'::json array as children from node_with_allowed_objects n where n.id = $1", node_id
     )
@@ -40,6 +52,21 @@ async def fetch_node(conn: Connection, node_id: int) -> Node | None:
         return None
     if node.event is not None:
         node.event.translation_texts = await _fetch_translation_textx(conn=conn, event_id=node.event.id)
+    return node
+
+
+async def fetch_node_with_children(conn: Connection, node_id: int, cached: bool = True) -> Node | None:
+    """
+    Fetch a node including its whole subtree, see fetch_node for caching.
+    """
+    if cached:
+        cached_node = node_tree_cache.get_node_with_children(node_id)
+        if cached_node is not None:
+            return cached_node
+
+    node = await fetch_node(conn=conn, node_id=node_id, cached=False)
+    if node is None:
+        return None
     node_map: dict[int, Node] = {node.id: node}
 
     children = await conn.fetch_many(
@@ -114,17 +141,31 @@ async def fetch_event_for_node(conn: Connection, node: Node) -> PublicEventSetti
     )
 
 
-async def fetch_event_node_for_node(conn: Connection, node_id: int) -> Node | None:
-    event_node_id = await conn.fetchval("select event_node_id from node where id = $1", node_id)
+async def _fetch_event_node_id(conn: Connection, node_id: int) -> int:
+    cached_node = node_tree_cache.get_node(node_id)
+    if cached_node is not None:
+        event_node_id = cached_node.event_node_id
+    else:
+        event_node_id = await conn.fetchval("select event_node_id from node where id = $1", node_id)
     if event_node_id is None:
         raise NotFound(element_type="node", element_id=node_id)
+    return event_node_id
+
+
+async def fetch_event_node_for_node(conn: Connection, node_id: int) -> Node | None:
+    event_node_id = await _fetch_event_node_id(conn=conn, node_id=node_id)
     return await fetch_node(conn=conn, node_id=event_node_id)
 
 
 async def fetch_restricted_event_settings_for_node(conn: Connection, node_id: int) -> RestrictedEventSettings:
-    event_node_id = await conn.fetchval("select event_node_id from node where id = $1", node_id)
-    if event_node_id is None:
-        raise NotFound(element_type="node", element_id=node_id)
+    """
+    Uses the process-wide event settings cache if active, the returned settings are then shared and must not be
+    modified.
+    """
+    event_node_id = await _fetch_event_node_id(conn=conn, node_id=node_id)
+    cached_settings = event_settings_cache.get(event_node_id)
+    if cached_settings is not None:
+        return cached_settings
     settings = await conn.fetch_one(
         RestrictedEventSettings,
         "select e.* from event_with_translations e join node n on n.event_id = e.id where n.id = $1",
@@ -27,6 +27,7 @@ from stustapay.core.service.tree.common import (
     fetch_event_design,
     fetch_event_logo,
     fetch_node,
+    fetch_node_with_children,
     fetch_restricted_event_settings_for_node,
     get_tree_for_current_user,
 )
@@ -39,7 +40,10 @@ from stustapay.ticket_shop import pretix
 
 async def _check_if_object_exists(conn: Connection, node: Node, object_type: ObjectType, in_subtree: bool):
     if in_subtree:
-        query_string = "select exists(select from {} t join node n on t.node_id = n.id where $1 = any(n.parent_ids))"
+        query_string = (
+            "select exists(select from {} t join node_closure c on t.node_id = c.node_id "
+            "where c.ancestor_id = $1 and c.node_id != $1)"
+        )
     else:
         query_string = "select exists(select from {} t where t.node_id = $1)"
 
@@ -123,13 +127,13 @@ async def create_node(conn: Connection, parent_id: int, new_node: NewNode, event
         new_node.description,
         event_id,
     )
-    result = await fetch_node(conn=conn, node_id=new_node_id)
+    result = await fetch_node(conn=conn, node_id=new_node_id, cached=False)
     assert result is not None
     await _update_forbidden_objects_at_node(conn=conn, node=result, forbidden=set(new_node.forbidden_objects_at_node))
     await _update_forbidden_objects_in_subtree(
         conn=conn, node=result, forbidden=set(new_node.forbidden_objects_in_subtree)
     )
-    result = await fetch_node(conn=conn, node_id=new_node_id)
+    result = await fetch_node_with_children(conn=conn, node_id=new_node_id, cached=False)
     assert result is not None
     return result
 
@@ -354,7 +358,7 @@ async def update_event(conn: Connection, node: Node, event: NewEvent) -> Node:
     )
     await conn.execute("delete from translation_text where event_id = $1", event_id)
     await _sync_optional_event_metadata(conn, event_id, event)
-    updated_node = await fetch_node(conn=conn, node_id=node.id)
+    updated_node = await fetch_node_with_children(conn=conn, node_id=node.id, cached=False)
     assert updated_node is not None
     return updated_node
 
@@ -397,7 +401,7 @@ class TreeService(Service[Config]):
         await _update_forbidden_objects_in_subtree(
             conn=conn, node=node, forbidden=set(updated_node.forbidden_objects_in_subtree)
         )
-        result = await fetch_node(conn=conn, node_id=node.id)
+        result = await fetch_node_with_children(conn=conn, node_id=node.id, cached=False)
         assert result is not None
         await create_audit_log(
             conn=conn,
@@ -546,11 +550,15 @@ class TreeService(Service[Config]):
                 conn=conn, current_user=current_user, node=terminal_node, terminal_id=terminal_id
             )
 
-        await conn.execute("update node set read_only = true where id = $1 or $1 = any(parent_ids)", node.id)
+        await conn.execute(
+            "update node set read_only = true where id in (select node_id from node_closure where ancestor_id = $1)",
+            node.id,
+        )
         await conn.execute(
             "update event set customer_portal_url = '' "
             "where id in ("
-            "   select e.id from event as e join node as n on n.event_id = e.id where n.id = $1 or $1 = any(n.parent_ids)"
+            "   select e.id from event as e join node as n on n.event_id = e.id "
+            "   join node_closure as c on n.id = c.node_id where c.ancestor_id = $1"
             ")",
             node.id,
         )
@@ -574,7 +582,8 @@ class TreeService(Service[Config]):
             log_type=AuditType.node_deleted,
             content={"id": node.id},
             user_id=current_user.id,
-            node_id=node.id,
+            # the deleted node can no longer be referenced, the deletion is logged at its parent
+            node_id=node.parent,
         )
 
     @with_db_transaction
@@ -596,8 +605,10 @@ class TreeService(Service[Config]):
     @with_db_transaction(read_only=True)
     @requires_node()
     @requires_user(node_privileges=[NodePrivilege.node_administration])
-    async def list_audit_logs(self, *, conn: Connection, node: Node) -> list[AuditLog]:
-        return await fetch_audit_logs(conn=conn, node=node)
+    async def list_audit_logs(
+        self, *, conn: Connection, node: Node, after_id: int | None = None, limit: int | None = None
+    ) -> list[AuditLog]:
+        return await fetch_audit_logs(conn=conn, node=node, after_id=after_id, limit=limit)
 
     @with_db_transaction(read_only=True)
     @requires_node()
@@ -176,9 +176,13 @@ async def list_assignable_roles_for_user_at_node(
 async def list_assignable_roles_by_node_for_user(
     *, conn: Connection, event_node: Node, user_id: int, active_role_id: int
 ) -> list[AssignableUserRolesAtNode]:
-    rows = await conn.fetch(
-        "select n.id as node_id, n.name as node_name "
+    # the assignable roles at a node are the roles defined at the node or one of its parents which the active role
+    # may assign, see list_assignable_roles_for_assigner_roles
+    return await conn.fetch_many(
+        AssignableUserRolesAtNode,
+        "select n.id as node_id, n.name as node_name, json_agg(r order by r.name) as roles "
         "from node n "
+        "join user_role_with_privileges r on r.node_id = any(n.parent_ids || array[n.id]) "
         "where n.event_node_id = $2 "
         "  and exists ("
         "      select 1 "
@@ -192,37 +196,19 @@ async def list_assignable_roles_by_node_for_user(
         "          select 1 from user_role ur "
         "          where ur.id = $3 and ur.can_assign_all_roles"
         "      ) "
-        "      or exists ("
-        "          select 1 "
+        "      or r.id in ("
+        "          select urtar.assignable_role_id "
         "          from user_role_to_assignable_role urtar "
-        "          join user_role target on target.id = urtar.assignable_role_id "
-        "          where urtar.assigner_role_id = $3 "
-        "            and target.node_id = any(n.parent_ids || array[n.id])"
+        "          where urtar.assigner_role_id = $3"
         "      )"
         "  ) "
+        "group by n.id, n.name, n.path "
         "order by n.path",
         user_id,
         event_node.id,
         active_role_id,
     )
 
-    result: list[AssignableUserRolesAtNode] = []
-    for row in rows:
-        node = await fetch_node(conn=conn, node_id=row["node_id"])
-        assert node is not None
-        roles = await list_assignable_roles_for_user_at_node(
-            conn=conn, node=node, user_id=user_id, active_role_id=active_role_id
-        )
-        if len(roles) > 0:
-            result.append(
-                AssignableUserRolesAtNode(
-                    node_id=row["node_id"],
-                    node_name=row["node_name"],
-                    roles=roles,
-                )
-            )
-    return result
-
 
 async def _get_user_role(*, conn: Connection, role_id: int) -> Optional[UserRole]:
     return await conn.fetch_maybe_one(UserRole, "select * from user_role_with_privileges where id = $1", role_id)
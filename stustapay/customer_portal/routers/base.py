@@ -14,6 +14,7 @@ from stustapay.core.http.context import (
     ContextMediaService,
     ContextOrderService,
 )
+from stustapay.core.http.normalize_data import AfterId, PageLimit
 from stustapay.core.schema.customer import (
     Customer,
     OrderWithBon,
@@ -48,8 +49,11 @@ async def get_customer(
 async def get_orders(
     token: CurrentAuthToken,
     customer_service: ContextCustomerService,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
 ):
-    return await customer_service.get_orders_with_bon(token=token)
+    """Newest orders first, the next page starts after the last order of the previous one."""
+    return await customer_service.get_orders_with_bon(token=token, after_id=after_id, limit=limit)
 
 
 @router.post("/customer_info", summary="set iban, account name and email", status_code=status.HTTP_204_NO_CONTENT)
@@ -10,11 +10,13 @@ from stustapay.core.config import Config
 from stustapay.core.database import get_database
 from stustapay.core.healthcheck import run_healthcheck
 from stustapay.core.http.context import Context
+from stustapay.core.service.common.notification_cache import NotificationListener
 from stustapay.core.service.config import ConfigService
 from stustapay.core.service.customer.customer import CustomerService
 from stustapay.core.service.mail import MailService
 from stustapay.core.service.media import MediaService
 from stustapay.core.service.order import OrderService
+from stustapay.core.service.tree.cache import event_settings_cache, node_tree_cache
 from stustapay.core.service.user import AuthService
 
 from .routers import auth, base, sumup
@@ -70,7 +72,13 @@ class Api:
         )
 
         try:
-            self.server.add_task(asyncio.create_task(run_healthcheck(db, service_name="customer_portal")))
+            self.server.add_task(
+                asyncio.create_task(
+                    run_healthcheck(db, service_name="customer_portal", metrics=[event_settings_cache.metrics])
+                )
+            )
+            notification_listener = NotificationListener([node_tree_cache, event_settings_cache])
+            self.server.add_task(asyncio.create_task(notification_listener.run(self.cfg.database, db_pool)))
             await self.server.run(context)
         finally:
             await db_pool.close()
@@ -71,8 +71,8 @@ class AO146Aexporter:
             "select distinct o.till_id "
             "from ordr o "
             "   join till t on o.till_id = t.id "
-            "   join node n on t.node_id = n.id "
-            "where n.id = $1 or $1 = any(n.parent_ids) "
+            "   join node_closure c on t.node_id = c.node_id "
+            "where c.ancestor_id = $1 "
             "order by o.till_id",
             node.id,
         ):
@@ -110,8 +110,8 @@ class Generator:
             "select distinct o.till_id "
             "from ordr o "
             "   join till t on o.till_id = t.id "
-            "   join node n on t.node_id = n.id "
-            "where n.id = $1 or $1 = any(n.parent_ids) "
+            "   join node_closure c on t.node_id = c.node_id "
+            "where c.ancestor_id = $1 "
             "order by o.till_id",
             node.id,
         ):
@@ -248,7 +248,9 @@ class Generator:
             # leider müssen wir da wieder eine db abfrage machen....
             if row["item_count"] != 0:
                 for line in await conn.fetch(
-                    "select tax_name, total_price, total_tax, total_no_tax from order_tax_rates where id = $1",
+                    "select tax_name, tax_rate_total_price as total_price, tax_rate_total_tax as total_tax, "
+                    "   tax_rate_total_no_tax as total_no_tax "
+                    "from order_tax_rates where id = $1",
                     row["id"],
                 ):
                     c = Bonkopf_USt()
@@ -406,8 +408,7 @@ class Generator:
         Z_SE_ZAHLUNGEN = Decimal()
         Z_SE_BARZAHLUNGEN = Decimal()
         for row in await conn.fetch(
-            "select total_price, payment_method from line_item join ordr on line_item.order_id = ordr.id "
-            "where ordr.till_id = $1 and ordr.z_nr = $2",
+            "select total_price, payment_method from ordr where till_id = $1 and z_nr = $2",
             Z_KASSE_ID,
             Z_NR,
         ):
@@ -621,8 +622,7 @@ class Generator:
             summe_je_zahlart[str(method["payment_method"])] = Decimal(0)
 
         for row in await conn.fetch(
-            "select total_price, payment_method from line_item join ordr on line_item.order_id = ordr.id "
-            "where ordr.till_id = $1 and ordr.z_nr = $2",
+            "select total_price, payment_method from ordr where till_id = $1 and z_nr = $2",
             Z_KASSE_ID,
             Z_NR,
         ):
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+
+from sftkit.database import Connection
+
+from stustapay.core.config import Config
+from stustapay.core.database import get_database
+from stustapay.core.schema.account import AccountType
+from stustapay.core.schema.tree import Node
+from stustapay.core.service.account import (
+    HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES,
+    get_system_account_ids,
+    set_system_account_balance_shards,
+)
+from stustapay.core.service.transaction import book_transaction
+from stustapay.core.service.tree.common import fetch_node
+
+
+class BookingBenchmark:
+    """
+    Measures booking throughput against the system accounts of an event with an increasing number of concurrent
+    tills, once with unsharded and once with sharded system account balances.
+
+    Every till books a cash top up (cash_entry -> customer) and a sale (customer -> sale_exit) per transaction, keeps
+    the transaction open for hold_time to emulate the remaining work of a booking request and rolls it back. The
+    bookings therefore leave no traces, the balance shard configuration of the event is changed while the benchmark
+    runs and restored afterwards.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        node_id: int,
+        till_counts: list[int],
+        n_shards: int,
+        duration: float = 5.0,
+        hold_time: float = 0.005,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.node_id = node_id
+        self.till_counts = till_counts
+        self.n_shards = n_shards
+        self.duration = duration
+        self.hold_time = hold_time
+
+    async def _till_worker(self, conn: Connection, node: Node, user_id: int, till_key: int, deadline: float) -> int:
+        system_account_ids = await get_system_account_ids(conn=conn, node=node)
+        n_bookings = 0
+        while time.monotonic() < deadline:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                customer_account_id = await conn.fetchval(
+                    "insert into account (node_id, type) values ($1, 'private') returning id", node.event_node_id
+                )
+                await book_transaction(
+                    conn=conn,
+                    conducting_user_id=user_id,
+                    source_account_id=system_account_ids[AccountType.cash_entry],
+                    target_account_id=customer_account_id,
+                    amount=10,
+                    balance_shard_key=till_key,
+                )
+                await book_transaction(
+                    conn=conn,
+                    conducting_user_id=user_id,
+                    source_account_id=customer_account_id,
+                    target_account_id=system_account_ids[AccountType.sale_exit],
+                    amount=10,
+                    balance_shard_key=till_key,
+                )
+                await conn.execute("select pg_sleep($1)", self.hold_time)
+            finally:
+                await transaction.rollback()
+            n_bookings += 1
+        return n_bookings
+
+    async def _measure(self, db_pool, node: Node, user_id: int, n_tills: int) -> float:
+        connections = [await db_pool.acquire() for _ in range(n_tills)]
+        try:
+            start = time.monotonic()
+            deadline = start + self.duration
+            results = await asyncio.gather(
+                *[
+                    self._till_worker(conn=conn, node=node, user_id=user_id, till_key=till_key, deadline=deadline)
+                    for till_key, conn in enumerate(connections)
+                ]
+            )
+            return sum(results) / (time.monotonic() - start)
+        finally:
+            for conn in connections:
+                await db_pool.release(conn)
+
+    async def run(self):
+        db = get_database(self.config.database)
+        db_pool = await db.create_pool(n_connections=max(self.till_counts) + 1)
+        try:
+            async with db_pool.acquire() as conn:
+                node = await fetch_node(conn=conn, node_id=self.node_id)
+                assert node is not None
+                user_id = await conn.fetchval(
+                    "select id from usr where node_id = any($1) order by id limit 1", node.ids_to_event_node
+                )
+                assert user_id is not None, "the benchmark books transactions on behalf of an existing user"
+                system_account_ids = await get_system_account_ids(conn=conn, node=node)
+                original_shards = {
+                    account_type: await conn.fetchval(
+                        "select balance_shards from account where id = $1", system_account_ids[account_type]
+                    )
+                    for account_type in HIGH_TRAFFIC_SYSTEM_ACCOUNT_TYPES
+                }
+
+            results: dict[int, dict[int, float]] = {}
+            try:
+                for n_shards in sorted({1, self.n_shards}):
+                    async with db_pool.acquire() as conn:
+                        await set_system_account_balance_shards(conn=conn, node=node, n_shards=n_shards)
+                    results[n_shards] = {}
+                    for n_tills in self.till_counts:
+                        throughput = await self._measure(db_pool=db_pool, node=node, user_id=user_id, n_tills=n_tills)
+                        self.logger.info(f"{n_shards = }, {n_tills = }: {throughput:.1f} bookings/s")
+                        results[n_shards][n_tills] = throughput
+            finally:
+                async with db_pool.acquire() as conn:
+                    for account_type, n_shards in original_shards.items():
+                        await set_system_account_balance_shards(
+                            conn=conn, node=node, n_shards=n_shards, account_types=[account_type]
+                        )
+
+            header = "tills".ljust(8) + "".join(f"{f'{n_shards} shard(s)':>16}" for n_shards in results)
+            print(header)
+            for n_tills in self.till_counts:
+                print(
+                    str(n_tills).ljust(8)
+                    + "".join(f"{f'{results[n_shards][n_tills]:.1f}/s':>16}" for n_shards in results)
+                )
+        finally:
+            await db_pool.close()
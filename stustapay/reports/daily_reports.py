@@ -85,14 +85,16 @@ async def prep_all_data(
     orders = await conn.fetch_many(
         OrderDaily,
         "select o.id as order_id, o.booked_at, o.payment_method, o.order_type, o.cancels_order, o.quantity, "
-        "o.total_price, o.tax_rate, o.tax_rate_id, o.total_tax, p.price_in_vouchers, o.product_price, "
+        "o.item_total_price as total_price, o.tax_rate, o.tax_rate_id, o.item_total_tax as total_tax, "
+        "p.price_in_vouchers, o.product_price, "
         "n.name as node_name, p.name as product_name, p.type as product_type, (oo.id is not null) as is_cancelled "
         "from order_items o "
         "left join till t on o.till_id = t.id "
         "left join product p on o.product_id = p.id "
         "join node n on t.node_id = n.id "
+        "join node_closure c on n.id = c.node_id "
         "left join order_items oo on (o.id = oo.cancels_order) and (o.product_id = oo.product_id) "
-        "where ($1=any(n.parents_until_event_node) or n.id=$1) and o.order_type!='cancel_sale'",
+        "where c.ancestor_id = $1 and o.order_type!='cancel_sale'",
         relevant_node_id,
     )
 
@@ -6,7 +6,7 @@ from sftkit.database import Connection
 from stustapay.bon.bon import BonConfig, gen_dummy_order
 from stustapay.core.currency import get_currency_symbol
 from stustapay.core.schema.media import Blob
-from stustapay.core.schema.order import Order
+from stustapay.core.schema.order import OrderSummary
 from stustapay.core.schema.tree import Node, RestrictedEventSettings
 from stustapay.core.service.media import fetch_blob
 from stustapay.core.service.order.stats import (
@@ -27,7 +27,7 @@ class DailyRevenue(BaseModel):
     revenue_minus_fees: float
 
 
-class OrderWithFees(Order):
+class OrderWithFees(OrderSummary):
     fees: float
     total_price_minus_fees: float
 
@@ -10,6 +10,7 @@ from pydantic import BaseModel
 
 from stustapay.core.http.auth_till import CurrentAuthToken
 from stustapay.core.http.context import ContextOrderService
+from stustapay.core.http.normalize_data import AfterId, PageLimit
 from stustapay.core.schema.order import (
     CompletedPayOut,
     CompletedSale,
@@ -37,11 +38,13 @@ router = APIRouter(prefix="/order", tags=["order"])
 async def list_orders(
     token: CurrentAuthToken,
     order_service: ContextOrderService,
+    after_id: AfterId = None,
+    limit: PageLimit = None,
 ):
     """
     List all the order of the currently logged in Cashier
     """
-    return await order_service.list_orders_terminal(token=token)
+    return await order_service.list_orders_terminal(token=token, after_id=after_id, limit=limit)
 
 
 @router.post("/check-sale", summary="check if a sale is valid", response_model=PendingSale)
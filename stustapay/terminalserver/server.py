@@ -14,11 +14,17 @@ from stustapay.core.config import Config
 from stustapay.core.database import get_database
 from stustapay.core.healthcheck import run_healthcheck
 from stustapay.core.http.context import Context
-from stustapay.core.service.account import AccountService
+from stustapay.core.service.account import AccountService, system_account_id_cache
 from stustapay.core.service.auth import AuthService
+from stustapay.core.service.common.decorators import transaction_retry_counters
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.common.privileges import user_privilege_cache
 from stustapay.core.service.order import OrderService
+from stustapay.core.service.order.stats_cache import order_stats_cache
 from stustapay.core.service.terminal import TerminalService
+from stustapay.core.service.till.catalog import till_catalog_cache
 from stustapay.core.service.till.till import TillService
+from stustapay.core.service.tree.cache import event_settings_cache, node_tree_cache
 from stustapay.core.service.user import UserService
 from stustapay.terminalserver.router import (
     auth,
@@ -85,7 +91,31 @@ class Api:
             terminal_service=TerminalService(db_pool=db_pool, config=self.cfg, auth_service=auth_service),
         )
         try:
-            self.server.add_task(asyncio.create_task(run_healthcheck(db, service_name="terminalserver")))
+            self.server.add_task(
+                asyncio.create_task(
+                    run_healthcheck(
+                        db,
+                        service_name="terminalserver",
+                        metrics=[
+                            event_settings_cache.metrics,
+                            transaction_retry_counters.metrics,
+                            order_stats_cache.metrics,
+                        ],
+                    )
+                )
+            )
+            notification_listener = NotificationListener(
+                [
+                    node_tree_cache,
+                    event_settings_cache,
+                    user_privilege_cache,
+                    till_catalog_cache,
+                    order_stats_cache,
+                    system_account_id_cache,
+                ]
+            )
+            self.server.add_task(asyncio.create_task(notification_listener.run(self.cfg.database, db_pool)))
+            self.server.add_task(asyncio.create_task(auth_service.run_terminal_heartbeat_flush()))
             await self.server.run(context)
         finally:
             await db_pool.close()
@@ -1,7 +1,51 @@
-from typing import TypeVar
+import asyncio
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from asyncpg.connection import LoggedQuery
+from sftkit.database import Connection
 
 T = TypeVar("T")
 
 
 def list_equals(l1: list[T], l2: list[T]) -> bool:
     return all(e1 in l2 for e1 in l1) and all(e2 in l1 for e2 in l2)
+
+
+class QueryCounter:
+    """
+    Records all queries sent over a database connection, used to guard the number of database round trips
+    on hot code paths against regressions.
+
+    The type introspection asyncpg runs once per connection for types it has not seen yet is not recorded, as it
+    depends on which queries happened to run on the pooled connection before.
+    """
+
+    _asyncpg_internal_query_markers = ("typeinfo_tree", "current_setting('jit')")
+
+    def __init__(self):
+        self.queries: list[str] = []
+
+    def __call__(self, record: LoggedQuery):
+        if any(marker in record.query for marker in self._asyncpg_internal_query_markers):
+            return
+        self.queries.append(record.query)
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+
+@contextmanager
+def count_queries(conn: Connection) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    conn.add_query_logger(counter)
+    try:
+        yield counter
+    finally:
+        conn.remove_query_logger(counter)
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 5):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
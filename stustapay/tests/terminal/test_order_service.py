@@ -1,24 +1,34 @@
 # pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa,redefined-outer-name
+import logging
+import time
 import uuid
 
 import pytest
 from sftkit.database import Connection
 
 from stustapay.bon.bon import generate_dummy_bon_json
+from stustapay.core.http.normalize_data import normalize_list
+from stustapay.core.schema.account import AccountType
 from stustapay.core.schema.order import Button, NewSale, OrderType, PaymentMethod
 from stustapay.core.schema.product import NewProduct, Product
 from stustapay.core.schema.tax_rate import TaxRate
-from stustapay.core.schema.till import NewTillButton, NewTillLayout, TillButton, TillLayout
+from stustapay.core.schema.till import NewTillButton, NewTillLayout, Till, TillButton, TillLayout
 from stustapay.core.schema.tree import Node
+from stustapay.core.service.account import get_system_account_ids
 from stustapay.core.service.common.error import NotFound
 from stustapay.core.service.order import OrderService
+from stustapay.core.service.order.booking import BookingIdentifier, NewLineItem, book_order
+from stustapay.core.service.order.order import fetch_order
 from stustapay.core.service.product import ProductService
 from stustapay.core.service.till.till import TillService
 from stustapay.core.service.tree.common import fetch_restricted_event_settings_for_node
 
+from ..common import count_queries
 from ..conftest import Cashier
 from .conftest import Customer, LoginSupervisedUser
 
+logger = logging.getLogger(__name__)
+
 
 @pytest.fixture
 async def sale_setup(
@@ -167,6 +177,60 @@ async def test_list_orders(
     assert orders[0].order_type == OrderType.sale
 
 
+async def test_list_orders_pagination(
+    order_service: OrderService,
+    sale_setup: tuple[Product, TillButton],
+    customer: Customer,
+    till: Till,
+    terminal_token: str,
+    event_admin_token: str,
+    event_node: Node,
+    login_supervised_user: LoginSupervisedUser,
+    cashier: Cashier,
+):
+    _, button = sale_setup
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    order_ids = []
+    for _ in range(5):
+        completed_sale = await order_service.book_sale(
+            token=terminal_token,
+            new_sale=NewSale(
+                uuid=uuid.uuid4(),
+                customer_tag_uid=customer.tag.uid,
+                buttons=[Button(till_button_id=button.id, quantity=1)],
+                payment_method=PaymentMethod.tag,
+            ),
+        )
+        order_ids.append(completed_sale.id)
+
+    pages = []
+    after_id = None
+    while True:
+        orders = await order_service.list_orders(
+            token=event_admin_token,
+            node_id=event_node.id,
+            customer_account_id=customer.account_id,
+            after_id=after_id,
+            limit=2,
+        )
+        pages.append([order.id for order in orders])
+        if len(orders) < 2:
+            break
+        after_id = orders[-1].id
+    assert pages == [order_ids[0:2], order_ids[2:4], order_ids[4:]]
+
+    orders = await order_service.list_orders_by_till(
+        token=event_admin_token, node_id=event_node.id, till_id=till.id, after_id=order_ids[1], limit=2
+    )
+    assert [order.id for order in orders] == order_ids[2:4]
+
+    orders = await order_service.list_orders_terminal(token=terminal_token, after_id=order_ids[2])
+    assert [order.id for order in orders] == order_ids[3:]
+
+    assert normalize_list(orders, limit=2).next_after_id == order_ids[4]
+    assert normalize_list(orders, limit=3).next_after_id is None
+
+
 async def test_cancel_sale_admin(
     order_service: OrderService,
     sale_setup: tuple[Product, TillButton],
@@ -199,6 +263,51 @@ async def test_cancel_sale_admin(
     assert cancel_orders[0].cancels_order == completed_sale.id
 
 
+async def test_order_totals_are_stored(
+    db_connection: Connection,
+    order_service: OrderService,
+    sale_setup: tuple[Product, TillButton],
+    customer: Customer,
+    terminal_token: str,
+    event_admin_token: str,
+    event_node: Node,
+    login_supervised_user: LoginSupervisedUser,
+    cashier: Cashier,
+):
+    product, button = sale_setup
+    assert product.price is not None
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    completed_sale = await order_service.book_sale(
+        token=terminal_token,
+        new_sale=NewSale(
+            uuid=uuid.uuid4(),
+            customer_tag_uid=customer.tag.uid,
+            buttons=[Button(till_button_id=button.id, quantity=3)],
+            payment_method=PaymentMethod.tag,
+        ),
+    )
+    await order_service.cancel_sale_admin(token=event_admin_token, node_id=event_node.id, order_id=completed_sale.id)
+    cancel_order_id = await db_connection.fetchval("select id from ordr where cancels_order = $1", completed_sale.id)
+
+    for order_id, expected_price in [(completed_sale.id, 3 * product.price), (cancel_order_id, -3 * product.price)]:
+        stored = await db_connection.fetchrow(
+            "select total_price, total_tax, total_no_tax from ordr where id = $1", order_id
+        )
+        aggregated = await db_connection.fetchrow(
+            "select sum(total_price) as total_price, sum(total_tax) as total_tax, "
+            "   sum(total_price - total_tax) as total_no_tax "
+            "from line_item where order_id = $1",
+            order_id,
+        )
+        assert dict(stored) == dict(aggregated)
+        assert stored["total_price"] == pytest.approx(expected_price)
+
+        order = await fetch_order(conn=db_connection, order_id=order_id)
+        assert order is not None
+        assert order.total_price == pytest.approx(expected_price)
+        assert order.total_no_tax == pytest.approx(float(stored["total_no_tax"]))
+
+
 async def test_show_order(
     order_service: OrderService,
     sale_setup: tuple[Product, TillButton],
@@ -223,3 +332,54 @@ async def test_show_order(
 
     assert order is not None
     assert order.id == completed_sale.id
+
+
+async def test_book_order_round_trips_do_not_depend_on_order_size(
+    db_connection: Connection,
+    event_node: Node,
+    till: Till,
+    customer: Customer,
+    cashier: Cashier,
+    sale_setup: tuple[Product, TillButton],
+):
+    """Microbenchmark booking orders with 1 to 50 line items, logs the booking durations."""
+    product, _ = sale_setup
+    system_account_ids = await get_system_account_ids(conn=db_connection, node=event_node)
+    sale_exit_acc_id = system_account_ids[AccountType.sale_exit]
+
+    query_counts = {}
+    for n_line_items in (1, 2, 5, 10, 25, 50):
+        line_items = [
+            NewLineItem(
+                quantity=1,
+                product_id=product.id,
+                product_price=product.price,
+                tax_rate_id=product.tax_rate_id,
+                vouchers_redeemed=0,
+            )
+            for _ in range(n_line_items)
+        ]
+        bookings = {
+            BookingIdentifier(source_account_id=customer.account_id, target_account_id=sale_exit_acc_id): 0.01
+            * n_line_items
+        }
+        async with db_connection.transaction():
+            with count_queries(db_connection) as queries:
+                start = time.perf_counter()
+                order_info = await book_order(
+                    conn=db_connection,
+                    order_type=OrderType.sale,
+                    payment_method=PaymentMethod.tag,
+                    cashier_id=cashier.id,
+                    till_id=till.id,
+                    customer_account_id=customer.account_id,
+                    line_items=line_items,
+                    bookings=bookings,
+                )
+                duration = time.perf_counter() - start
+        logger.info(f"booked an order with {n_line_items} line items in {duration * 1000:.2f}ms")
+        query_counts[n_line_items] = len(queries)
+        n_booked = await db_connection.fetchval("select count(*) from line_item where order_id = $1", order_info.id)
+        assert n_booked == n_line_items
+
+    assert len(set(query_counts.values())) == 1, query_counts
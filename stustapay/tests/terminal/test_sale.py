@@ -1,10 +1,13 @@
 # pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa,redefined-outer-name
+import asyncio
 import uuid
 from dataclasses import dataclass
 
+import asyncpg
 import pytest
 from sftkit.database import Connection
 
+from stustapay.core.config import Config
 from stustapay.core.schema.account import AccountType
 from stustapay.core.schema.order import (
     BookedProduct,
@@ -34,14 +37,22 @@ from stustapay.core.service.cashier import (
     InvalidCloseOutException,
 )
 from stustapay.core.service.common.error import InvalidArgument
-from stustapay.core.service.order import NotEnoughVouchersException, OrderService
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.order import (
+    AgeRestrictionException,
+    NotEnoughFundsException,
+    NotEnoughVouchersException,
+    OrderService,
+)
 from stustapay.core.service.order.order import InvalidSaleException
 from stustapay.core.service.product import ProductService
+from stustapay.core.service.till.catalog import till_catalog_cache
 from stustapay.core.service.till.common import fetch_till
 from stustapay.core.service.till.till import TillService
 
 from ...core.service.terminal import TerminalService
-from ..conftest import Cashier
+from ..common import count_queries, wait_for
+from ..conftest import Cashier, StandardUserTagVariants
 from .conftest import (
     START_BALANCE,
     AssertAccountBalance,
@@ -223,6 +234,194 @@ async def test_basic_sale_flow(
     assert z_nr_start + 1 == z_nr
 
 
+async def test_sale_query_count(
+    db_connection: Connection,
+    order_service: OrderService,
+    customer: Customer,
+    terminal_token: str,
+    sale_products: SaleProducts,
+    cashier: Cashier,
+    login_supervised_user: LoginSupervisedUser,
+):
+    # the terminal auth context (terminal, till, nodes, user and privileges) is resolved in a single query,
+    # before that a sale check took 20 queries and booking a sale 32
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    new_sale = NewSale(
+        uuid=uuid.uuid4(),
+        buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=2)],
+        customer_tag_uid=customer.tag.uid,
+        payment_method=PaymentMethod.tag,
+    )
+    # checking a sale does not write anything, terminal heartbeats are buffered in memory
+    async with db_connection.transaction(readonly=True):
+        with count_queries(db_connection) as queries:
+            await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+    assert len(queries) <= 8
+
+    async with db_connection.transaction():
+        with count_queries(db_connection) as queries:
+            completed_sale = await order_service.book_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+    assert completed_sale is not None
+    assert len(queries) <= 15
+
+
+async def test_sale_button_products_are_fetched_in_one_query(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    order_service: OrderService,
+    product_service: ProductService,
+    customer: Customer,
+    event_node: Node,
+    terminal_token: str,
+    event_admin_token: str,
+    sale_products: SaleProducts,
+    cashier: Cashier,
+    login_supervised_user: LoginSupervisedUser,
+):
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    new_sale = NewSale(
+        uuid=uuid.uuid4(),
+        buttons=[
+            Button(till_button_id=sale_products.beer_button.id, quantity=2),
+            Button(till_button_id=sale_products.beer_button_full.id, quantity=1),
+            Button(till_button_id=sale_products.deposit_button.id, quantity=-1),
+        ],
+        customer_tag_uid=customer.tag.uid,
+        payment_method=PaymentMethod.tag,
+    )
+
+    def button_product_queries(queries: list[str]) -> list[str]:
+        return [query for query in queries if "till_button_product" in query]
+
+    with count_queries(db_connection) as queries:
+        await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+    assert len(button_product_queries(queries.queries)) == 1
+
+    cache_task = asyncio.create_task(
+        NotificationListener([till_catalog_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: till_catalog_cache.listening)
+        await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        with count_queries(db_connection) as queries:
+            await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        assert len(button_product_queries(queries.queries)) == 0
+
+        generation = till_catalog_cache.generation
+        beer_product = sale_products.beer_product
+        beer_product.is_locked = False
+        await product_service.update_product(
+            token=event_admin_token,
+            node_id=event_node.id,
+            product_id=beer_product.id,
+            product=beer_product,
+        )
+        await wait_for(lambda: till_catalog_cache.generation > generation)
+        with pytest.raises(InvalidArgument):
+            await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+
+        # the catalog is not filled from the snapshot of the requesting transaction, which may predate a change
+        async with db_connection.transaction(isolation="repeatable_read"):
+            await db_connection.fetchval("select count(*) from product")
+            generation = till_catalog_cache.generation
+            beer_product.is_locked = True
+            beer_product.price = 4
+            await product_service.update_product(
+                token=event_admin_token,
+                node_id=event_node.id,
+                product_id=beer_product.id,
+                product=beer_product,
+            )
+            await wait_for(lambda: till_catalog_cache.generation > generation)
+            await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        pending_sale = await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        beer_line_item = next(item for item in pending_sale.line_items if item.product.id == beer_product.id)
+        assert beer_line_item.product_price == 4
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+
+async def test_book_sale_reuses_checked_sale(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    order_service: OrderService,
+    customer: Customer,
+    terminal_token: str,
+    sale_products: SaleProducts,
+    cashier: Cashier,
+    login_supervised_user: LoginSupervisedUser,
+    standard_user_tag_variants: StandardUserTagVariants,
+):
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    await db_connection.execute(
+        "insert into product_user_tag_variant (id, user_tag_variant_id) values ($1, $2)",
+        sale_products.beer_product.id,
+        standard_user_tag_variants.under_18_id,
+    )
+
+    def make_sale() -> NewSale:
+        return NewSale(
+            uuid=uuid.uuid4(),
+            buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=2)],
+            customer_tag_uid=customer.tag.uid,
+            payment_method=PaymentMethod.tag,
+        )
+
+    cache_task = asyncio.create_task(
+        NotificationListener([till_catalog_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: till_catalog_cache.listening)
+
+        # booking a checked sale only rechecks the order uuid and the customer balance
+        new_sale = make_sale()
+        pending_sale = await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        async with db_connection.transaction():
+            with count_queries(db_connection) as queries:
+                completed_sale = await order_service.book_sale(
+                    conn=db_connection, token=terminal_token, new_sale=new_sale
+                )
+        assert len(queries) <= 12
+        assert completed_sale.new_balance == pending_sale.new_balance
+
+        # the balance changed between checking and booking
+        new_sale = make_sale()
+        pending_sale = await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        await db_connection.execute("update account set balance = 1 where id = $1", customer.account_id)
+        with pytest.raises(NotEnoughFundsException):
+            await order_service.book_sale(token=terminal_token, new_sale=new_sale)
+
+        # changed vouchers require the complete check, the vouchers are used for the sale
+        await db_connection.execute("update account set balance = 100 where id = $1", customer.account_id)
+        new_sale = make_sale()
+        pending_sale = await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        assert pending_sale.used_vouchers == 0
+        await db_connection.execute("update account set vouchers = 2 where id = $1", customer.account_id)
+        completed_sale = await order_service.book_sale(token=terminal_token, new_sale=new_sale)
+        assert completed_sale.used_vouchers == 2
+        assert completed_sale.new_voucher_balance == 0
+
+        # the customer tag became age restricted between checking and booking
+        new_sale = make_sale()
+        await order_service.check_sale(conn=db_connection, token=terminal_token, new_sale=new_sale)
+        await db_connection.execute(
+            "insert into user_tag_to_variant (user_tag_id, variant_id) "
+            "select user_tag_id, $2 from account where id = $1",
+            customer.account_id,
+            standard_user_tag_variants.under_18_id,
+        )
+        with pytest.raises(AgeRestrictionException):
+            await order_service.book_sale(token=terminal_token, new_sale=new_sale)
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+
 async def test_admin_order_edit_and_cancel(
     db_connection: Connection,
     order_service: OrderService,
@@ -1,10 +1,14 @@
 # pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa,redefined-outer-name
+import asyncio
 import uuid
 from dataclasses import dataclass
+from datetime import timedelta
 
+import asyncpg
 import pytest
 from sftkit.database import Connection
 
+from stustapay.core.config import Config
 from stustapay.core.schema.order import Button, NewFreeTicketGrant, NewPayOut, NewSale, NewTopUp, PaymentMethod
 from stustapay.core.schema.product import NewProduct, Product
 from stustapay.core.schema.tax_rate import TaxRate
@@ -12,11 +16,19 @@ from stustapay.core.schema.till import NewTillButton, NewTillLayout, TillButton,
 from stustapay.core.schema.tree import Node
 from stustapay.core.schema.user import EventPrivilege, NewUserRole, NewUserToRoles, NodePrivilege
 from stustapay.core.service.account import AccountService
+from stustapay.core.service.common.notification_cache import NotificationListener
 from stustapay.core.service.order import OrderService
-from stustapay.core.service.order.stats import TimeseriesStatsQuery
+from stustapay.core.service.order.live_stats import live_order_stats
+from stustapay.core.service.order.stats import (
+    TimeseriesStatsQuery,
+    fetch_payment_method_stats,
+    get_hourly_sales_stats,
+)
+from stustapay.core.service.order.stats_cache import order_stats_cache
 from stustapay.core.service.product import ProductService
 from stustapay.core.service.till.till import TillService
 from stustapay.core.service.user import UserService
+from stustapay.tests.common import wait_for
 from stustapay.tests.conftest import Cashier, CreateRandomUserTag
 
 from .conftest import AssignCashRegister, Customer, LoginSupervisedUser
@@ -424,3 +436,304 @@ async def test_revenue_stats(
     )
 
     assert sum(interval.revenue for interval in stats.hourly_intervals) > 0
+
+
+async def test_order_stats_hourly_matches_orders(
+    order_service: OrderService,
+    sale_products: SaleProducts,
+    customer: Customer,
+    terminal_token: str,
+    event_node: Node,
+    db_connection: Connection,
+    login_supervised_user: LoginSupervisedUser,
+    assign_cash_register: AssignCashRegister,
+    cashier: Cashier,
+):
+    await assign_cash_register(cashier=cashier)
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    sale = await order_service.book_sale(
+        token=terminal_token,
+        new_sale=NewSale(
+            uuid=uuid.uuid4(),
+            buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=2)],
+            customer_tag_uid=customer.tag.uid,
+            payment_method=PaymentMethod.tag,
+        ),
+    )
+    await order_service.book_sale(
+        token=terminal_token,
+        new_sale=NewSale(
+            uuid=uuid.uuid4(),
+            buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=1)],
+            payment_method=PaymentMethod.cash,
+        ),
+    )
+    await order_service.cancel_sale(token=terminal_token, order_id=sale.id)
+    await order_service.book_topup(
+        token=terminal_token,
+        new_topup=NewTopUp(
+            uuid=uuid.uuid4(), amount=15, payment_method=PaymentMethod.cash, customer_tag_uid=customer.tag.uid
+        ),
+    )
+
+    rollup = await db_connection.fetch(
+        "select till_id, hour, product_id, payment_method, order_type, n_orders, quantity, total_price, "
+        "   vouchers_redeemed "
+        "from order_stats_hourly order by till_id, hour, product_id, payment_method, order_type"
+    )
+    expected = await db_connection.fetch(
+        "select o.till_id, date_trunc('hour', o.booked_at) as hour, li.product_id, o.payment_method, o.order_type, "
+        "   count(distinct o.id) filter (where li.item_id = 0) as n_orders, sum(li.quantity) as quantity, "
+        "   sum(li.total_price) as total_price, sum(li.vouchers_redeemed) as vouchers_redeemed "
+        "from ordr o join line_item li on o.id = li.order_id "
+        "group by o.till_id, hour, li.product_id, o.payment_method, o.order_type "
+        "order by o.till_id, hour, li.product_id, o.payment_method, o.order_type"
+    )
+    assert [dict(row) for row in rollup] == [dict(row) for row in expected]
+
+    # the rollup covers every hour overlapping [from_time, to_time)
+    booked_hour = await db_connection.fetchval("select date_trunc('hour', booked_at) from ordr where id = $1", sale.id)
+    bounds = [
+        (booked_hour - timedelta(days=1), booked_hour + timedelta(days=1)),
+        # from_time within the booked hour, to_time exactly on the following hour
+        (booked_hour + timedelta(minutes=59, seconds=59), booked_hour + timedelta(hours=1)),
+        # neither bound on the hour
+        (booked_hour - timedelta(minutes=17), booked_hour + timedelta(hours=2, minutes=5)),
+        # to_time exactly at the start of the booked hour excludes it
+        (booked_hour - timedelta(hours=3, minutes=30), booked_hour),
+    ]
+    for from_time, to_time in bounds:
+        sales = await get_hourly_sales_stats(conn=db_connection, node=event_node, from_time=from_time, to_time=to_time)
+        expected_sales = await db_connection.fetch(
+            "select date_trunc('hour', o.booked_at) as from_time, sum(li.quantity) as count, "
+            "   round(sum(li.total_price), 2) as revenue "
+            "from orders_at_node_and_children($3) o join line_item li on o.id = li.order_id "
+            "where o.booked_at >= date_trunc('hour', $1::timestamptz) and o.booked_at < $2 "
+            "   and o.order_type in ('sale', 'cancel_sale') "
+            "group by 1 order by 1",
+            from_time,
+            to_time,
+            event_node.id,
+        )
+        assert [(i.from_time, i.count, i.revenue) for i in sales.intervals] == [
+            (row["from_time"], row["count"], float(row["revenue"])) for row in expected_sales
+        ]
+
+        payment_methods = await fetch_payment_method_stats(
+            conn=db_connection, node=event_node, from_time=from_time, to_time=to_time
+        )
+        expected_payment_methods = await db_connection.fetch(
+            "select o.payment_method, count(distinct o.id) as count, round(sum(li.total_price), 2) as revenue "
+            "from orders_at_node_and_children($3) o join line_item li on o.id = li.order_id "
+            "where o.booked_at >= date_trunc('hour', $1::timestamptz) and o.booked_at < $2 "
+            "   and o.order_type in ('sale', 'cancel_sale', 'top_up', 'pay_out', 'ticket') "
+            "group by o.payment_method",
+            from_time,
+            to_time,
+            event_node.id,
+        )
+        assert {(s.payment_method.value, s.count, s.revenue) for s in payment_methods} == {
+            (row["payment_method"], row["count"], float(row["revenue"])) for row in expected_payment_methods
+        }
+
+    sales = await get_hourly_sales_stats(
+        conn=db_connection, node=event_node, from_time=booked_hour - timedelta(hours=1), to_time=booked_hour
+    )
+    assert sales.intervals == []
+    sales = await get_hourly_sales_stats(
+        conn=db_connection,
+        node=event_node,
+        from_time=booked_hour + timedelta(minutes=59),
+        to_time=booked_hour + timedelta(hours=1),
+    )
+    assert [i.from_time for i in sales.intervals] == [booked_hour]
+
+
+async def test_live_stats(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    order_service: OrderService,
+    sale_products: SaleProducts,
+    customer: Customer,
+    terminal_token: str,
+    event_node: Node,
+    login_supervised_user: LoginSupervisedUser,
+    cashier: Cashier,
+):
+    listener_task = asyncio.create_task(
+        NotificationListener([live_order_stats]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: live_order_stats.listening)
+        with live_order_stats.subscribe(event_node.id) as subscription:
+            await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+            await order_service.book_sale(
+                token=terminal_token,
+                new_sale=NewSale(
+                    uuid=uuid.uuid4(),
+                    buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=2)],
+                    customer_tag_uid=customer.tag.uid,
+                    payment_method=PaymentMethod.tag,
+                ),
+            )
+            delta = await asyncio.wait_for(subscription.get(), timeout=5)
+            assert delta is not None
+            assert delta.node_id == event_node.id
+            assert delta.count == 1
+            assert delta.revenue == 10
+            beer_stats = next(p for p in delta.products if p.product_id == sale_products.beer_product.id)
+            assert beer_stats.quantity == 2
+            assert beer_stats.revenue == 6
+        assert live_order_stats.n_subscriptions == 0
+    finally:
+        listener_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener_task
+
+    # subscriptions are closed right away while nobody listens for new orders
+    with live_order_stats.subscribe(event_node.id) as subscription:
+        assert await subscription.get() is None
+
+
+async def test_order_stats_cache(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    order_service: OrderService,
+    sale_products: SaleProducts,
+    customer: Customer,
+    terminal_token: str,
+    event_admin_token: str,
+    event_node: Node,
+    db_connection: Connection,
+    login_supervised_user: LoginSupervisedUser,
+    cashier: Cashier,
+):
+    await _set_event_stats_window(db_connection, event_node)
+    cache_task = asyncio.create_task(NotificationListener([order_stats_cache]).run(config.database, setup_test_db_pool))
+    try:
+        await wait_for(lambda: order_stats_cache.listening)
+        query = TimeseriesStatsQuery(from_time=None, to_time=None)
+        stats = await order_service.stats.get_product_stats(token=event_admin_token, node_id=event_node.id, query=query)
+        hits = order_stats_cache.hits
+        cached = await order_service.stats.get_product_stats(
+            token=event_admin_token, node_id=event_node.id, query=query
+        )
+        assert cached is stats
+        assert order_stats_cache.hits == hits + 1
+
+        generation = order_stats_cache.generation
+        await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+        await order_service.book_sale(
+            token=terminal_token,
+            new_sale=NewSale(
+                uuid=uuid.uuid4(),
+                buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=1)],
+                customer_tag_uid=customer.tag.uid,
+                payment_method=PaymentMethod.tag,
+            ),
+        )
+        await wait_for(lambda: order_stats_cache.generation > generation)
+        stats = await order_service.stats.get_product_stats(token=event_admin_token, node_id=event_node.id, query=query)
+        beer_stats = next(row for row in stats.product_overall_stats if row.product_id == sale_products.beer_product.id)
+        assert beer_stats.count == 1
+
+        # concurrent requests for the same stats are only computed once, on a connection of the cache
+        n_computations = 0
+
+        async def compute(conn: Connection):
+            nonlocal n_computations
+            assert conn is not db_connection
+            n_computations += 1
+            await asyncio.sleep(0.1)
+            return n_computations
+
+        results = await asyncio.gather(
+            *[order_stats_cache.get_or_compute(("test",), compute, conn=db_connection) for _ in range(5)]
+        )
+        assert results == [1] * 5
+        assert n_computations == 1
+
+        # stats requested within a transaction whose snapshot predates an order are not computed from that snapshot
+        async with db_connection.transaction(isolation="repeatable_read"):
+            await db_connection.fetchval("select count(*) from ordr")
+            generation = order_stats_cache.generation
+            await order_service.book_sale(
+                token=terminal_token,
+                new_sale=NewSale(
+                    uuid=uuid.uuid4(),
+                    buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=1)],
+                    customer_tag_uid=customer.tag.uid,
+                    payment_method=PaymentMethod.tag,
+                ),
+            )
+            await wait_for(lambda: order_stats_cache.generation > generation)
+            await order_service.stats.get_product_stats(
+                token=event_admin_token, node_id=event_node.id, query=query, conn=db_connection
+            )
+        stats = await order_service.stats.get_product_stats(token=event_admin_token, node_id=event_node.id, query=query)
+        beer_stats = next(row for row in stats.product_overall_stats if row.product_id == sale_products.beer_product.id)
+        assert beer_stats.count == 2
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+
+async def test_stats_overview_matches_individual_stats(
+    order_service: OrderService,
+    sale_products: SaleProducts,
+    customer: Customer,
+    terminal_token: str,
+    event_admin_token: str,
+    event_node: Node,
+    db_connection: Connection,
+    login_supervised_user: LoginSupervisedUser,
+    assign_cash_register: AssignCashRegister,
+    cashier: Cashier,
+):
+    await _set_event_stats_window(db_connection, event_node)
+    await assign_cash_register(cashier=cashier)
+    await login_supervised_user(user_tag_uid=cashier.user_tag_uid, user_role_id=cashier.cashier_role.id)
+    await order_service.book_sale(
+        token=terminal_token,
+        new_sale=NewSale(
+            uuid=uuid.uuid4(),
+            buttons=[Button(till_button_id=sale_products.beer_button.id, quantity=2)],
+            customer_tag_uid=customer.tag.uid,
+            payment_method=PaymentMethod.tag,
+        ),
+    )
+    await order_service.book_topup(
+        token=terminal_token,
+        new_topup=NewTopUp(
+            uuid=uuid.uuid4(), amount=15, payment_method=PaymentMethod.cash, customer_tag_uid=customer.tag.uid
+        ),
+    )
+    pay_out = NewPayOut(uuid=uuid.uuid4(), customer_tag_uid=customer.tag.uid, amount=-10)
+    await order_service.check_pay_out(token=terminal_token, new_pay_out=pay_out)
+    await order_service.book_pay_out(token=terminal_token, new_pay_out=pay_out)
+
+    query = TimeseriesStatsQuery(from_time=None, to_time=None)
+    overview = await order_service.stats.get_stats_overview(token=event_admin_token, node_id=event_node.id, query=query)
+    assert overview.product_stats == await order_service.stats.get_product_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    assert overview.entry_stats == await order_service.stats.get_entry_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    assert overview.top_up_stats == await order_service.stats.get_top_up_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    assert overview.pay_out_stats == await order_service.stats.get_pay_out_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    payment_method_stats = await order_service.stats.get_payment_method_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    assert overview.payment_method_stats == payment_method_stats.stats
+    assert overview.voucher_stats == await order_service.stats.get_voucher_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
+    assert overview.free_ticket_stats == await order_service.stats.get_free_ticket_stats(
+        token=event_admin_token, node_id=event_node.id, query=query
+    )
@@ -1,7 +1,16 @@
 # pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa
 
-from stustapay.core.schema.tree import Node
+from sftkit.database import Connection
+
+from stustapay.core.schema.terminal import Terminal
+from stustapay.core.schema.tree import NewNode, Node
+from stustapay.core.service.auth import AuthService
 from stustapay.core.service.terminal import TerminalService
+from stustapay.core.service.till.till import TillService
+from stustapay.core.service.tree.service import create_node
+
+from ..common import count_queries
+from .conftest import Customer
 
 
 async def test_terminal_registration_flow(
@@ -21,3 +30,54 @@ async def test_terminal_registration_flow(
         token=event_admin_token, node_id=event_node.id, terminal_id=terminal_config.id
     )
     assert logged_out
+
+
+async def test_terminal_heartbeats_are_written_behind(
+    db_connection: Connection,
+    auth_service: AuthService,
+    terminal_service: TerminalService,
+    terminal: Terminal,
+    terminal_token: str,
+):
+    last_seen = await db_connection.fetchval("select last_seen from terminal where id = $1", terminal.id)
+
+    async with db_connection.transaction(readonly=True):
+        terminal_config = await terminal_service.get_terminal_config(conn=db_connection, token=terminal_token)
+    assert terminal_config is not None
+    assert last_seen == await db_connection.fetchval("select last_seen from terminal where id = $1", terminal.id)
+
+    n_flushed = await auth_service.terminal_heartbeats.flush(conn=db_connection)
+    assert n_flushed >= 1
+    assert len(auth_service.terminal_heartbeats) == 0
+    assert last_seen < await db_connection.fetchval("select last_seen from terminal where id = $1", terminal.id)
+
+
+async def test_terminal_requests_do_not_load_node_subtree(
+    db_connection: Connection,
+    terminal_service: TerminalService,
+    till_service: TillService,
+    event_node: Node,
+    customer: Customer,
+    terminal_token: str,
+):
+    # terminal requests only need the shallow nodes, the size of the event subtree must not matter
+    for i in range(10):
+        await create_node(
+            conn=db_connection, parent_id=event_node.id, new_node=NewNode(name=f"sub-node-{i}", description="")
+        )
+
+    async with db_connection.transaction(readonly=True):
+        with count_queries(db_connection) as queries:
+            terminal_config = await terminal_service.get_terminal_config(conn=db_connection, token=terminal_token)
+    assert terminal_config is not None
+    assert not any("path like" in query for query in queries.queries)
+    assert len(queries) <= 14
+
+    async with db_connection.transaction(readonly=True):
+        with count_queries(db_connection) as queries:
+            account = await till_service.get_customer(
+                conn=db_connection, token=terminal_token, customer_tag_uid=customer.tag.uid
+            )
+    assert account.id == customer.account_id
+    assert not any("path like" in query for query in queries.queries)
+    assert len(queries) <= 4
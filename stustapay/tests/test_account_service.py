@@ -1,12 +1,30 @@
-# pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa
+# pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa,protected-access
+import asyncio
 
+import asyncpg
 import pytest
 from sftkit.database import Connection
 
-from stustapay.core.schema.tree import Node
-from stustapay.core.service.account import AccountService
+from stustapay.core.config import Config
+from stustapay.core.schema.account import AccountCore, AccountType
+from stustapay.core.schema.tree import NewNode, Node
+from stustapay.core.schema.user import User
+from stustapay.core.service.account import (
+    SYSTEM_ACCOUNT_TYPES,
+    AccountService,
+    get_account_by_id,
+    get_account_core_by_id,
+    get_system_account_for_node,
+    get_system_account_ids,
+    set_system_account_balance_shards,
+    system_account_id_cache,
+)
 from stustapay.core.service.common.error import InvalidArgument, NotFound
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.transaction import book_transaction
+from stustapay.core.service.tree.service import _create_system_accounts, create_node
 
+from .common import count_queries, wait_for
 from .conftest import CreateRandomUserTag
 
 
@@ -295,3 +313,176 @@ async def test_update_account_vouchers(
     assert updated is True
     account = await account_service.get_account(token=event_admin_token, node_id=event_node.id, account_id=account_id)
     assert account.vouchers == 4
+
+
+async def test_get_system_account_ids(db_connection: Connection, event_node: Node):
+    system_account_ids = await get_system_account_ids(conn=db_connection, node=event_node)
+    assert set(system_account_ids.keys()) == SYSTEM_ACCOUNT_TYPES
+    for account_type in SYSTEM_ACCOUNT_TYPES:
+        account = await get_system_account_for_node(conn=db_connection, node=event_node, account_type=account_type)
+        assert system_account_ids[account_type] == account.id
+
+    # without a listener nothing is cached
+    assert len(system_account_id_cache) == 0
+
+
+class _Rollback(Exception):
+    pass
+
+
+async def test_system_account_id_cache(
+    setup_test_db_pool: asyncpg.Pool, config: Config, db_connection: Connection, event_node: Node
+):
+    cache_task = asyncio.create_task(
+        NotificationListener([system_account_id_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: system_account_id_cache.listening)
+
+        # the ids are resolved once per event on a fresh connection
+        system_account_ids = await get_system_account_ids(conn=db_connection, node=event_node)
+        assert set(system_account_ids.keys()) == SYSTEM_ACCOUNT_TYPES
+        assert system_account_id_cache.get(event_node.id) == system_account_ids
+        with count_queries(db_connection) as queries:
+            assert await get_system_account_ids(conn=db_connection, node=event_node) == system_account_ids
+        # the query logger is called asynchronously, the counter is complete after a subsequent query
+        await db_connection.fetchval("select 1")
+        assert len(queries) == 0
+
+        # deleting a node, e.g. an event node, clears the cache
+        generation = system_account_id_cache.generation
+        sub_node = await create_node(
+            conn=db_connection,
+            parent_id=event_node.id,
+            new_node=NewNode(
+                name="sub node", description="", forbidden_objects_at_node=[], forbidden_objects_in_subtree=[]
+            ),
+        )
+        await db_connection.execute("delete from node where id = $1", sub_node.id)
+        await wait_for(lambda: system_account_id_cache.generation > generation)
+        assert system_account_id_cache.get(event_node.id) is None
+
+        # system accounts of an event which is not committed yet are not cached
+        with pytest.raises(_Rollback):
+            async with db_connection.transaction():
+                new_node = await create_node(
+                    conn=db_connection,
+                    parent_id=event_node.id,
+                    new_node=NewNode(
+                        name="uncommitted node",
+                        description="",
+                        forbidden_objects_at_node=[],
+                        forbidden_objects_in_subtree=[],
+                    ),
+                )
+                await _create_system_accounts(conn=db_connection, node_id=new_node.id)
+                new_event_node = new_node.model_copy(update={"event_node_id": new_node.id})
+                uncommitted_ids = await get_system_account_ids(conn=db_connection, node=new_event_node)
+                assert set(uncommitted_ids.keys()) == SYSTEM_ACCOUNT_TYPES
+                assert system_account_id_cache.get(new_node.id) is None
+                raise _Rollback()
+        assert system_account_id_cache.get(new_node.id) is None
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+    assert not system_account_id_cache.listening
+    assert len(system_account_id_cache) == 0
+
+
+async def test_system_account_balance_shards(
+    db_connection: Connection, event_node: Node, global_admin_user: tuple[User, str]
+):
+    user, _ = global_admin_user
+    system_account_ids = await get_system_account_ids(conn=db_connection, node=event_node)
+    cash_entry_acc_id = system_account_ids[AccountType.cash_entry]
+    sale_exit_acc_id = system_account_ids[AccountType.sale_exit]
+
+    async def book(till_id: int, amount: float):
+        await book_transaction(
+            conn=db_connection,
+            conducting_user_id=user.id,
+            source_account_id=cash_entry_acc_id,
+            target_account_id=sale_exit_acc_id,
+            amount=amount,
+            balance_shard_key=till_id,
+        )
+
+    async def assert_sale_exit_balance(expected_balance: float):
+        account = await get_system_account_for_node(
+            conn=db_connection, node=event_node, account_type=AccountType.sale_exit
+        )
+        assert account.balance == pytest.approx(expected_balance)
+
+    await book(till_id=1, amount=5)
+    await set_system_account_balance_shards(conn=db_connection, node=event_node, n_shards=4)
+    for till_id in range(8):
+        await book(till_id=till_id, amount=1)
+
+    # bookings of different tills only update the balance shards of their till, the account row is left untouched
+    n_shards = await db_connection.fetchval(
+        "select count(*) from account_balance_shard where account_id = $1", sale_exit_acc_id
+    )
+    assert n_shards == 4
+    assert await db_connection.fetchval("select balance from account where id = $1", sale_exit_acc_id) == 5
+    await assert_sale_exit_balance(13)
+
+    # disabling sharding folds the shard balances back into the account
+    await set_system_account_balance_shards(conn=db_connection, node=event_node, n_shards=1)
+    assert await db_connection.fetchval("select balance from account where id = $1", sale_exit_acc_id) == 13
+    await assert_sale_exit_balance(13)
+
+    with pytest.raises(InvalidArgument):
+        await set_system_account_balance_shards(
+            conn=db_connection, node=event_node, n_shards=2, account_types=[AccountType.private]
+        )
+
+
+async def test_account_core_matches_account_with_history(
+    db_connection: Connection,
+    event_node: Node,
+    global_admin_user: tuple[User, str],
+    create_random_user_tag: CreateRandomUserTag,
+):
+    user, _ = global_admin_user
+    variant_ids = []
+    for priority, variant_name in enumerate(["variant-b", "variant-a"]):
+        variant_ids.append(
+            await db_connection.fetchval(
+                "insert into user_tag_variant (node_id, variant_name, priority) values ($1, $2, $3) returning id",
+                event_node.id,
+                variant_name,
+                priority,
+            )
+        )
+    user_tag = await create_random_user_tag(variant_ids=list(reversed(variant_ids)))
+    account_id = await db_connection.fetchval(
+        "insert into account(node_id, user_tag_id, type, balance, vouchers) "
+        "values ($1, $2, 'private', 42, 3) returning id",
+        event_node.id,
+        user_tag.id,
+    )
+    await set_system_account_balance_shards(conn=db_connection, node=event_node, n_shards=2)
+    system_account_ids = await get_system_account_ids(conn=db_connection, node=event_node)
+    await book_transaction(
+        conn=db_connection,
+        source_account_id=account_id,
+        target_account_id=system_account_ids[AccountType.sale_exit],
+        conducting_user_id=user.id,
+        amount=2,
+        voucher_amount=1,
+        balance_shard_key=1,
+    )
+
+    for acc_id in [account_id, system_account_ids[AccountType.sale_exit]]:
+        account = await get_account_by_id(conn=db_connection, node=event_node, account_id=acc_id)
+        account_core = await get_account_core_by_id(conn=db_connection, node=event_node, account_id=acc_id)
+        assert account is not None and account_core is not None
+        assert account_core.model_dump() == account.model_dump(include=set(AccountCore.model_fields))
+
+    customer = await get_account_core_by_id(conn=db_connection, node=event_node, account_id=account_id)
+    assert customer is not None
+    assert customer.balance == 40
+    assert customer.vouchers == 2
+    assert customer.user_tag_variant_ids == variant_ids
@@ -1,12 +1,20 @@
 # pylint: disable=redefined-outer-name
+import asyncio
 import secrets
 
+import asyncpg
+import pytest
 from sftkit.database import Connection
 
+from stustapay.core.config import Config
 from stustapay.core.schema.tree import NewNode
 from stustapay.core.schema.user import EventPrivilege, NewUser, NewUserRole, NodePrivilege
+from stustapay.core.service.common import privileges
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.common.privileges import fetch_user_privileges_at_node_for_role, user_privilege_cache
 from stustapay.core.service.tree.service import create_node
 from stustapay.core.service.user import UserService, associate_user_to_role
+from stustapay.tests.common import count_queries, wait_for
 
 
 async def test_event_privileges_visible_below_event_node(
@@ -154,3 +162,152 @@ async def test_node_administration_privileges_only_visible_at_assigned_subnode(
 
     assert node_admin_at_event is False
     assert node_admin_at_subnode is True
+
+
+async def test_privilege_cache_is_invalidated_on_role_assignment(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    user_service: UserService,
+    event_admin_token: str,
+    event_node,
+    create_random_user_tag,
+):
+    user_tag = await create_random_user_tag()
+    test_user = await user_service.create_user_no_auth(
+        node_id=event_node.id,
+        new_user=NewUser(
+            login=f"test-user-{secrets.token_hex(16)}",
+            display_name="test-user",
+            user_tag_uid=user_tag.uid,
+            user_tag_pin=user_tag.pin,
+        ),
+    )
+    role = await user_service.create_user_role(
+        token=event_admin_token,
+        node_id=event_node.id,
+        new_role=NewUserRole(
+            name="cached-booking-role",
+            event_privileges=[],
+            node_privileges=[NodePrivilege.can_book_orders],
+        ),
+    )
+
+    cache_task = asyncio.create_task(
+        NotificationListener([user_privilege_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: user_privilege_cache.listening)
+
+        async def fetch_privileges():
+            return await fetch_user_privileges_at_node_for_role(
+                conn=db_connection,
+                user_id=test_user.id,
+                role_id=role.id,
+                event_node_id=event_node.id,
+                node_id=event_node.id,
+            )
+
+        assert await fetch_privileges() == (set(), set())
+        with count_queries(db_connection) as queries:
+            assert await fetch_privileges() == (set(), set())
+        assert len(queries) == 0
+
+        generation = user_privilege_cache.generation
+        await associate_user_to_role(
+            conn=db_connection,
+            node=event_node,
+            current_user_id=None,
+            user_id=test_user.id,
+            role_id=role.id,
+        )
+        await wait_for(lambda: user_privilege_cache.generation > generation)
+
+        assert await fetch_privileges() == (set(), {NodePrivilege.can_book_orders})
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+    assert not user_privilege_cache.listening
+    assert len(user_privilege_cache) == 0
+
+
+async def test_privilege_cache_ignores_lookups_racing_a_revocation(
+    monkeypatch: pytest.MonkeyPatch,
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    user_service: UserService,
+    event_admin_token: str,
+    event_node,
+    create_random_user_tag,
+):
+    user_tag = await create_random_user_tag()
+    test_user = await user_service.create_user_no_auth(
+        node_id=event_node.id,
+        new_user=NewUser(
+            login=f"test-user-{secrets.token_hex(16)}",
+            display_name="test-user",
+            user_tag_uid=user_tag.uid,
+            user_tag_pin=user_tag.pin,
+        ),
+    )
+    role = await user_service.create_user_role(
+        token=event_admin_token,
+        node_id=event_node.id,
+        new_role=NewUserRole(
+            name="revoked-booking-role",
+            event_privileges=[],
+            node_privileges=[NodePrivilege.can_book_orders],
+        ),
+    )
+    await associate_user_to_role(
+        conn=db_connection, node=event_node, current_user_id=None, user_id=test_user.id, role_id=role.id
+    )
+
+    async def fetch_privileges(conn: Connection):
+        return await fetch_user_privileges_at_node_for_role(
+            conn=conn, user_id=test_user.id, role_id=role.id, event_node_id=event_node.id, node_id=event_node.id
+        )
+
+    resolve_privileges = privileges._resolve_privileges
+
+    async def resolve_privileges_then_revoke(*args, **kwargs):
+        # the role is revoked after the privileges were read but before they are stored in the cache
+        result = await resolve_privileges(*args, **kwargs)
+        generation = user_privilege_cache.generation
+        await db_connection.execute(
+            "delete from user_to_role where user_id = $1 and role_id = $2", test_user.id, role.id
+        )
+        await wait_for(lambda: user_privilege_cache.generation > generation)
+        return result
+
+    cache_task = asyncio.create_task(
+        NotificationListener([user_privilege_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: user_privilege_cache.listening)
+
+        with monkeypatch.context() as patch:
+            patch.setattr(privileges, "_resolve_privileges", resolve_privileges_then_revoke)
+            assert await fetch_privileges(db_connection) == (set(), {NodePrivilege.can_book_orders})
+        assert len(user_privilege_cache) == 0
+        assert await fetch_privileges(db_connection) == (set(), set())
+
+        # privileges resolved within a transaction which is rolled back are not cached
+        async with setup_test_db_pool.acquire() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            await associate_user_to_role(
+                conn=conn, node=event_node, current_user_id=None, user_id=test_user.id, role_id=role.id
+            )
+            # drop the cached result such that the privileges are resolved again while the transaction is open
+            user_privilege_cache.invalidate()
+            assert await fetch_privileges(conn) == (set(), set())
+            await transaction.rollback()
+        assert await fetch_privileges(db_connection) == (set(), set())
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
@@ -0,0 +1,71 @@
+# pylint: disable=unexpected-keyword-arg,missing-kwoa
+import asyncpg
+import pytest
+from sftkit.database import Connection
+from sftkit.service import Service
+
+from stustapay.core.config import Config
+from stustapay.core.service.common.decorators import (
+    transaction_retry_counters,
+    with_retrying_db_transaction,
+)
+
+
+class ConflictingService(Service[Config]):
+    def __init__(self, db_pool: asyncpg.Pool, config: Config, n_conflicts: int):
+        super().__init__(db_pool, config)
+        self.n_conflicts = n_conflicts
+        self.n_calls = 0
+
+    async def _book(self, conn: Connection) -> int:
+        self.n_calls += 1
+        if self.n_calls <= self.n_conflicts:
+            raise asyncpg.exceptions.SerializationError("could not serialize access due to concurrent update")
+        return await conn.fetchval("select 42")
+
+    @with_retrying_db_transaction(max_attempts=3, base_delay=0.001)
+    async def book(self, *, conn: Connection) -> int:
+        return await self._book(conn)
+
+    @with_retrying_db_transaction(base_delay=0.001, max_delay=0.001)
+    async def book_with_default_attempts(self, *, conn: Connection) -> int:
+        return await self._book(conn)
+
+
+async def test_serialization_failures_are_retried(setup_test_db_pool: asyncpg.Pool, config: Config):
+    method = ConflictingService.book.__qualname__
+    retries = transaction_retry_counters.retries[method]
+    failures = transaction_retry_counters.failures[method]
+
+    service = ConflictingService(db_pool=setup_test_db_pool, config=config, n_conflicts=2)
+    assert await service.book() == 42
+    assert service.n_calls == 3
+    assert transaction_retry_counters.retries[method] == retries + 2
+    assert transaction_retry_counters.failures[method] == failures
+
+    service = ConflictingService(db_pool=setup_test_db_pool, config=config, n_conflicts=3)
+    with pytest.raises(asyncpg.exceptions.SerializationError):
+        await service.book()
+    assert service.n_calls == 3
+    assert transaction_retry_counters.retries[method] == retries + 4
+    assert transaction_retry_counters.failures[method] == failures + 1
+    assert transaction_retry_counters.metrics()[f"transaction_retry_failures.{method}"] == failures + 1
+
+    # callers which pass their own connection are responsible for retrying their transaction
+    service = ConflictingService(db_pool=setup_test_db_pool, config=config, n_conflicts=1)
+    async with setup_test_db_pool.acquire() as conn:
+        with pytest.raises(asyncpg.exceptions.SerializationError):
+            await service.book(conn=conn)
+    assert service.n_calls == 1
+
+
+async def test_default_retry_budget_matches_service(setup_test_db_pool: asyncpg.Pool, config: Config):
+    service = ConflictingService(db_pool=setup_test_db_pool, config=config, n_conflicts=9)
+    assert service.default_transaction_retries == 10
+    assert await service.book_with_default_attempts() == 42
+    assert service.n_calls == 10
+
+    service = ConflictingService(db_pool=setup_test_db_pool, config=config, n_conflicts=10)
+    with pytest.raises(asyncpg.exceptions.SerializationError):
+        await service.book_with_default_attempts()
+    assert service.n_calls == 10
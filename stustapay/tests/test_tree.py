@@ -1,16 +1,26 @@
 # pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa,no-value-for-parameter
+import asyncio
+
+import asyncpg
 import pytest
 from asyncpg import RaiseError
 from sftkit.database import Connection
 
+from stustapay.core.config import Config
 from stustapay.core.schema.terminal import Terminal
 from stustapay.core.schema.till import Till
 from stustapay.core.schema.tree import ROOT_NODE_ID, NewEvent, NewNode, Node, ObjectType
+from stustapay.core.service.common.notification_cache import NotificationListener
 from stustapay.core.service.terminal import TerminalService
 from stustapay.core.service.till.till import TillService
-from stustapay.core.service.tree.common import fetch_node
+from stustapay.core.service.tree.cache import event_settings_cache, node_tree_cache
+from stustapay.core.service.tree.common import (
+    fetch_node,
+    fetch_node_with_children,
+    fetch_restricted_event_settings_for_node,
+)
 from stustapay.core.service.tree.service import TreeService
-from stustapay.tests.common import list_equals
+from stustapay.tests.common import list_equals, wait_for
 
 dummy_event = NewEvent(
     name="Test event",
@@ -66,7 +76,7 @@ async def test_node_creation(db_connection: Connection, tree_service: TreeServic
     assert list_equals([ROOT_NODE_ID], node.parent_ids)
     assert ROOT_NODE_ID == node.parent
 
-    root_node = await fetch_node(conn=db_connection, node_id=ROOT_NODE_ID)
+    root_node = await fetch_node_with_children(conn=db_connection, node_id=ROOT_NODE_ID)
     assert root_node is not None
 
     # the newly created child should appear as a child of the root node
@@ -84,6 +94,36 @@ async def test_node_creation(db_connection: Connection, tree_service: TreeServic
         )
 
 
+async def test_node_closure(db_connection: Connection, tree_service: TreeService, global_admin_token: str):
+    node: Node = await tree_service.create_node(
+        token=global_admin_token,
+        node_id=ROOT_NODE_ID,
+        new_node=NewNode(name="Closure node", description=""),
+    )
+    child: Node = await tree_service.create_node(
+        token=global_admin_token,
+        node_id=node.id,
+        new_node=NewNode(name="Closure child", description=""),
+    )
+
+    ancestor_ids = await db_connection.fetchval(
+        "select array_agg(ancestor_id order by ancestor_id) from node_closure where node_id = $1", child.id
+    )
+    assert ancestor_ids == [ROOT_NODE_ID, node.id, child.id]
+    subtree_ids = await db_connection.fetchval(
+        "select array_agg(node_id order by node_id) from node_closure where ancestor_id = $1", node.id
+    )
+    assert subtree_ids == [node.id, child.id]
+    n_mismatches = await db_connection.fetchval(
+        "select count(*) from node n join node_closure c on c.node_id = n.id "
+        "where not (c.ancestor_id = any(n.parent_ids) or c.ancestor_id = n.id)"
+    )
+    assert n_mismatches == 0
+
+    await tree_service.delete_node(token=global_admin_token, node_id=child.id)
+    assert not await db_connection.fetchval("select exists(select from node_closure where node_id = $1)", child.id)
+
+
 async def test_event_creation(tree_service: TreeService, global_admin_token: str):
     event_node: Node = await tree_service.create_event(
         token=global_admin_token,
@@ -331,3 +371,133 @@ async def test_list_audit_logs_after_node_update(tree_service: TreeService, glob
     logs = await tree_service.list_audit_logs(token=global_admin_token, node_id=node.id)
 
     assert len(logs) >= 1
+
+
+async def test_node_tree_cache_is_invalidated_on_update(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    tree_service: TreeService,
+    global_admin_token: str,
+):
+    node = await tree_service.create_node(
+        token=global_admin_token,
+        node_id=ROOT_NODE_ID,
+        new_node=NewNode(name="cached-node", description="before"),
+    )
+
+    cache_task = asyncio.create_task(NotificationListener([node_tree_cache]).run(config.database, setup_test_db_pool))
+    try:
+        await wait_for(lambda: node_tree_cache.get_node(node.id) is not None)
+        version = node_tree_cache.version
+
+        cached = await fetch_node(conn=db_connection, node_id=node.id)
+        assert cached is not None
+        assert cached.description == "before"
+
+        await tree_service.update_node(
+            token=global_admin_token,
+            node_id=node.id,
+            updated_node=NewNode(name="cached-node", description="after"),
+        )
+        await wait_for(lambda: node_tree_cache.version > version and node_tree_cache.active)
+
+        cached = await fetch_node(conn=db_connection, node_id=node.id)
+        assert cached is not None
+        assert cached.description == "after"
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+    assert not node_tree_cache.active
+
+
+async def test_event_settings_cache_is_invalidated_on_event_update(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    tree_service: TreeService,
+    global_admin_token: str,
+    event_node: Node,
+):
+    cache_task = asyncio.create_task(
+        NotificationListener([event_settings_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: event_settings_cache.active)
+        version = event_settings_cache.version
+
+        hits = event_settings_cache.hits
+        settings = await fetch_restricted_event_settings_for_node(conn=db_connection, node_id=event_node.id)
+        assert event_node.event is not None
+        assert settings.id == event_node.event.id
+        assert event_settings_cache.hits == hits + 1
+
+        await tree_service.update_event(
+            token=global_admin_token,
+            node_id=event_node.id,
+            event=dummy_event.model_copy(update={"bon_title": "updated bon title"}),
+        )
+        await wait_for(lambda: event_settings_cache.version > version and event_settings_cache.active)
+
+        settings = await fetch_restricted_event_settings_for_node(conn=db_connection, node_id=event_node.id)
+        assert settings.bon_title == "updated bon title"
+        assert event_settings_cache.hit_rate > 0
+    finally:
+        cache_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cache_task
+
+    assert not event_settings_cache.active
+
+
+async def test_notification_listener_uses_one_dedicated_connection(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    tree_service: TreeService,
+    global_admin_token: str,
+    event_node: Node,
+):
+    idle_connections = setup_test_db_pool.get_idle_size()
+    listener_task = asyncio.create_task(
+        NotificationListener([node_tree_cache, event_settings_cache]).run(config.database, setup_test_db_pool)
+    )
+    try:
+        await wait_for(lambda: node_tree_cache.active and event_settings_cache.active)
+        # the listener connection is not taken from the pool, snapshots are loaded with short-lived pool connections
+        assert setup_test_db_pool.get_idle_size() == idle_connections
+        listener_pids = await db_connection.fetch(
+            "select pid from pg_stat_activity "
+            "where datname = current_database() and pid <> pg_backend_pid() and query like 'LISTEN %'"
+        )
+        assert len(listener_pids) == 1
+
+        # every notification is forwarded to the caches listening on its channel
+        tree_version = node_tree_cache.version
+        event_settings_version = event_settings_cache.version
+        await tree_service.update_event(
+            token=global_admin_token,
+            node_id=event_node.id,
+            event=dummy_event.model_copy(update={"bon_title": "listener bon title"}),
+        )
+        await wait_for(lambda: event_settings_cache.version > event_settings_version and event_settings_cache.active)
+        await tree_service.create_node(
+            token=global_admin_token,
+            node_id=event_node.id,
+            new_node=NewNode(name="listener-node", description=""),
+        )
+        await wait_for(lambda: node_tree_cache.version > tree_version and node_tree_cache.active)
+
+        # all caches are deactivated when the listener connection is lost and reactivated after reconnecting
+        await db_connection.execute("select pg_terminate_backend($1)", listener_pids[0]["pid"])
+        await wait_for(lambda: not node_tree_cache.active and not event_settings_cache.active)
+        await wait_for(lambda: node_tree_cache.active and event_settings_cache.active)
+    finally:
+        listener_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener_task
+
+    assert not node_tree_cache.active
+    assert not event_settings_cache.active
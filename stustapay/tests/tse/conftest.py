@@ -0,0 +1,111 @@
+# pylint: disable=redefined-outer-name
+import asyncio
+import secrets
+import socket
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+import pytest
+from sftkit.database import Connection
+
+from stustapay.core.schema.till import Till
+from stustapay.core.schema.tree import Node
+from stustapay.tse.diebold_nixdorf_usb.config import DieboldNixdorfUSBTSEConfig
+from stustapay.tse.diebold_nixdorf_usb.handler import DieboldNixdorfUSBTSE
+from stustapay.tse.simulator import Simulator
+
+from ..conftest import Cashier
+
+
+@dataclass
+class TseWithTills:
+    tse_id: int
+    till_ids: list[int]
+
+
+@pytest.fixture
+async def tse_with_tills(db_connection: Connection, event_node: Node, till: Till) -> TseWithTills:
+    tse_id = await db_connection.fetchval(
+        "insert into tse (name, serial, status, node_id) values ($1, $2, 'active', $3) returning id",
+        f"test-tse-{secrets.token_hex(8)}",
+        secrets.token_hex(16),
+        event_node.id,
+    )
+    till_ids = [
+        await db_connection.fetchval(
+            "insert into till (name, node_id, active_profile_id, tse_id) values ($1, $2, $3, $4) returning id",
+            f"test-tse-till-{i}",
+            event_node.id,
+            till.active_profile_id,
+            tse_id,
+        )
+        for i in range(3)
+    ]
+    return TseWithTills(tse_id=tse_id, till_ids=till_ids)
+
+
+@dataclass
+class TseSimulator:
+    ws_url: str
+    serial_number: str
+    password: str
+
+    def handler(self, name: str) -> DieboldNixdorfUSBTSE:
+        return DieboldNixdorfUSBTSE(
+            name,
+            DieboldNixdorfUSBTSEConfig(serial_number=self.serial_number, password=self.password, ws_url=self.ws_url),
+        )
+
+
+@pytest.fixture
+async def tse_simulator() -> AsyncGenerator[TseSimulator, None]:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+    simulator = Simulator(host="localhost", port=port, fast=True)
+    simulator_task = asyncio.create_task(simulator.run())
+    async with asyncio.timeout(5):
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("localhost", port)
+            except OSError:
+                await asyncio.sleep(0.05)
+                continue
+            writer.close()
+            await writer.wait_closed()
+            break
+    yield TseSimulator(
+        ws_url=f"ws://localhost:{port}",
+        serial_number=simulator.tse.serial,
+        password=simulator.tse.password_admin,
+    )
+    simulator.stop()
+    await simulator_task
+
+
+async def book_order(conn: Connection, cashier: Cashier, till_id: int) -> int:
+    # the tse_signature row of the order is created by the order insert trigger
+    return await conn.fetchval(
+        "insert into ordr (payment_method, z_nr, order_type, cashier_id, till_id) "
+        "values ('cash', 1, 'sale', $1, $2) returning id",
+        cashier.id,
+        till_id,
+    )
+
+
+async def reset_requests(conn: Connection, order_ids: list[int]):
+    await conn.execute(
+        "update tse_signature set signature_status = 'new', tse_id = null where id = any($1)",
+        order_ids,
+    )
+
+
+async def finish_request(conn: Connection, order_id: int):
+    await conn.execute(
+        "update tse_signature set signature_status = 'failure', result_message = 'test' where id = $1",
+        order_id,
+    )
+
+
+async def signature_status(conn: Connection, order_id: int) -> str:
+    return await conn.fetchval("select signature_status from tse_signature where id = $1", order_id)
@@ -0,0 +1,124 @@
+# pylint: disable=protected-access
+import asyncio
+import socket
+
+import aiohttp
+import asyncpg
+import pytest
+from sftkit.database import Connection
+
+from stustapay.core.config import Config
+from stustapay.tse.metrics import Histogram, TseMetrics, run_metrics_server
+from stustapay.tse.signature_processor import SignatureProcessor
+from stustapay.tse.wrapper import TSEWrapper, claim_signature_requests
+
+from ..common import wait_for
+from ..conftest import Cashier
+from .conftest import TseWithTills, book_order
+
+
+def test_histogram_counts_values_in_all_buckets_up_to_their_upper_bound():
+    histogram = Histogram(buckets=(0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 20):
+        histogram.observe(value)
+
+    assert histogram.bucket_counts == [2, 3, 3]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(20.65)
+    assert histogram.metrics("duration") == {
+        "duration_bucket_le_0.1": 2,
+        "duration_bucket_le_1": 3,
+        "duration_bucket_le_10": 3,
+        "duration_bucket_le_inf": 4,
+        "duration_sum": pytest.approx(20.65),
+        "duration_count": 4,
+    }
+
+
+def test_tse_metrics():
+    metrics = TseMetrics()
+    metrics.signature_duration.observe(0.2)
+    metrics.claim_to_sign_delay.observe(0.01)
+    metrics.signatures = 3
+    metrics.failures = 1
+    metrics.reconnects = 2
+
+    rendered = metrics.metrics("tse_1")
+    assert rendered["tse_1_signature_duration_seconds_bucket_le_0.1"] == 0
+    assert rendered["tse_1_signature_duration_seconds_bucket_le_0.25"] == 1
+    assert rendered["tse_1_signature_duration_seconds_count"] == 1
+    assert rendered["tse_1_claim_to_sign_delay_seconds_bucket_le_0.05"] == 1
+    assert rendered["tse_1_claim_to_sign_delay_seconds_sum"] == pytest.approx(0.01)
+    assert rendered["tse_1_signatures"] == 3
+    assert rendered["tse_1_failures"] == 1
+    assert rendered["tse_1_reconnects"] == 2
+    # every histogram has its buckets plus inf, sum and count
+    assert len(rendered) == 2 * (len(metrics.signature_duration.buckets) + 3) + 3
+
+
+async def test_metrics_server_serves_all_callbacks():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+    signatures = 0
+
+    server_task = asyncio.create_task(
+        run_metrics_server(
+            host="localhost", port=port, metrics=[lambda: {"signatures": signatures}, lambda: {"failures": 1}]
+        )
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+
+            async def scrape() -> dict:
+                async with asyncio.timeout(5):
+                    while True:
+                        try:
+                            async with session.get(f"http://localhost:{port}/metrics") as response:
+                                assert response.status == 200
+                                return await response.json()
+                        except aiohttp.ClientConnectionError:
+                            await asyncio.sleep(0.05)
+
+            assert await scrape() == {"signatures": 0, "failures": 1}
+            # the metrics are collected anew on every request
+            signatures = 5
+            assert await scrape() == {"signatures": 5, "failures": 1}
+    finally:
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+async def test_queue_depths_are_exported_per_tse(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    tse_with_tills: TseWithTills,
+    cashier: Cashier,
+):
+    till_a, till_b, _ = tse_with_tills.till_ids
+    await book_order(db_connection, cashier, till_a)
+    await book_order(db_connection, cashier, till_a)
+    await book_order(db_connection, cashier, till_b)
+    # the claimed request is counted for the TSE it was claimed by, the new ones for the TSE of their till
+    await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=1)
+
+    processor = SignatureProcessor(config=config)
+    processor.db_pool = setup_test_db_pool
+    tse = TSEWrapper(tse_id=tse_with_tills.tse_id, factory_function=lambda: None)  # type: ignore
+    processor.tses[tse_with_tills.tse_id] = tse
+    prefix = f"tse_{tse_with_tills.tse_id}"
+    assert processor.metrics()[f"{prefix}_new_requests"] == 0
+
+    refresh_task = asyncio.create_task(processor._refresh_queue_depths())
+    try:
+        await wait_for(lambda: processor.metrics()[f"{prefix}_new_requests"] > 0)
+    finally:
+        refresh_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await refresh_task
+
+    metrics = processor.metrics()
+    assert metrics[f"{prefix}_new_requests"] == 2
+    assert metrics[f"{prefix}_pending_requests"] == 1
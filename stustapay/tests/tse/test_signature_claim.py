@@ -0,0 +1,95 @@
+# pylint: disable=attribute-defined-outside-init,unexpected-keyword-arg,missing-kwoa
+import asyncio
+
+import asyncpg
+from sftkit.database import Connection
+
+from stustapay.tse.wrapper import claim_signature_requests
+
+from ..conftest import Cashier
+from .conftest import TseWithTills, book_order, finish_request, reset_requests, signature_status
+
+
+async def test_claim_only_oldest_request_per_till(
+    db_connection: Connection, tse_with_tills: TseWithTills, cashier: Cashier
+):
+    till_a, till_b, _ = tse_with_tills.till_ids
+    a1 = await book_order(db_connection, cashier, till_a)
+    b1 = await book_order(db_connection, cashier, till_b)
+    a2 = await book_order(db_connection, cashier, till_a)
+    b2 = await book_order(db_connection, cashier, till_b)
+
+    claimed = await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=10)
+    assert claimed == [(a1, str(till_a)), (b1, str(till_b))]
+    assert await signature_status(db_connection, a2) == "new"
+    assert await signature_status(db_connection, b2) == "new"
+
+    # the limit caps the number of claimed tills
+    await reset_requests(db_connection, [a1, b1])
+    claimed = await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=1)
+    assert claimed == [(a1, str(till_a))]
+
+
+async def test_claim_skips_till_with_pending_request(
+    db_connection: Connection, tse_with_tills: TseWithTills, cashier: Cashier
+):
+    till_a, till_b, _ = tse_with_tills.till_ids
+    a1 = await book_order(db_connection, cashier, till_a)
+    a2 = await book_order(db_connection, cashier, till_a)
+    b1 = await book_order(db_connection, cashier, till_b)
+
+    claimed = await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=1)
+    assert claimed == [(a1, str(till_a))]
+
+    # a1 is still pending, the next request of till a must wait for it
+    claimed = await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=10)
+    assert claimed == [(b1, str(till_b))]
+    assert await signature_status(db_connection, a2) == "new"
+
+    await finish_request(db_connection, a1)
+    await finish_request(db_connection, b1)
+    claimed = await claim_signature_requests(conn=db_connection, tse_id=tse_with_tills.tse_id, limit=10)
+    assert claimed == [(a2, str(till_a))]
+
+
+async def test_concurrent_claims_are_disjoint(
+    setup_test_db_pool: asyncpg.Pool, db_connection: Connection, tse_with_tills: TseWithTills, cashier: Cashier
+):
+    order_ids: list[int] = []
+    for _ in range(5):
+        for till_id in tse_with_tills.till_ids:
+            order_ids.append(await book_order(db_connection, cashier, till_id))
+
+    async with setup_test_db_pool.acquire() as conn_1, setup_test_db_pool.acquire() as conn_2:
+        # a claim which is not yet committed locks its rows, a concurrent claimer must skip them instead of waiting
+        async with conn_1.transaction():
+            claimed_1 = await claim_signature_requests(conn=conn_1, tse_id=tse_with_tills.tse_id, limit=2)
+            claimed_2 = await asyncio.wait_for(
+                claim_signature_requests(conn=conn_2, tse_id=tse_with_tills.tse_id, limit=10), timeout=5
+            )
+        assert len(claimed_1) == 2
+        assert len(claimed_2) == 1
+        assert not {order_id for order_id, _ in claimed_1} & {order_id for order_id, _ in claimed_2}
+
+        await reset_requests(db_connection, order_ids)
+
+        async def claim_until_done(conn: Connection) -> list[int]:
+            claimed_ids: list[int] = []
+            while True:
+                claimed = await claim_signature_requests(conn=conn, tse_id=tse_with_tills.tse_id, limit=1)
+                if not claimed:
+                    pending = await conn.fetchval(
+                        "select count(*) from tse_signature where id = any($1) and signature_status in ('new', 'pending')",
+                        order_ids,
+                    )
+                    if pending == 0:
+                        return claimed_ids
+                for order_id, _ in claimed:
+                    claimed_ids.append(order_id)
+                    await finish_request(conn, order_id)
+                await asyncio.sleep(0)
+
+        claimed_ids_1, claimed_ids_2 = await asyncio.gather(claim_until_done(conn_1), claim_until_done(conn_2))
+
+    assert not set(claimed_ids_1) & set(claimed_ids_2)
+    assert sorted(claimed_ids_1 + claimed_ids_2) == sorted(order_ids)
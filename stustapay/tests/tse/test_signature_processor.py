@@ -0,0 +1,279 @@
+# pylint: disable=redefined-outer-name,protected-access
+import asyncio
+import functools
+import json
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+import asyncpg
+import pytest
+from sftkit.database import Connection
+
+from stustapay.core.config import Config
+from stustapay.core.schema.till import Till
+from stustapay.core.schema.tree import NewNode, Node
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.tree.service import create_node
+from stustapay.tse.signature_processor import SIGNATURE_DISPATCH_INTERVAL, SignatureProcessor
+from stustapay.tse.wrapper import TSEWrapper
+
+from ..common import wait_for
+from ..conftest import Cashier
+from .conftest import TseWithTills, book_order
+
+
+@dataclass
+class ProcessorSetup:
+    processor: SignatureProcessor
+    # ids of the TSEs woken by the processor, in order
+    notified: list[int]
+    tse_a: int
+    tse_b: int
+    till_a: int
+    till_b: int
+    feral_till: int
+
+
+async def _create_tse(conn: Connection, node: Node, name: str, status: str = "active") -> int:
+    return await conn.fetchval(
+        "insert into tse (name, serial, status, node_id) values ($1, $1, $2, $3) returning id", name, status, node.id
+    )
+
+
+async def _create_till(conn: Connection, node: Node, till: Till, name: str, tse_id: int | None) -> int:
+    return await conn.fetchval(
+        "insert into till (name, node_id, active_profile_id, tse_id) values ($1, $2, $3, $4) returning id",
+        name,
+        node.id,
+        till.active_profile_id,
+        tse_id,
+    )
+
+
+@pytest.fixture
+async def processor_setup(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    event_node: Node,
+    till: Till,
+    tse_with_tills: TseWithTills,
+) -> AsyncGenerator[ProcessorSetup, None]:
+    tse_b = await _create_tse(db_connection, event_node, "test-tse-b")
+    till_b = await _create_till(db_connection, event_node, till, "test-till-b", tse_b)
+    feral_till = await _create_till(db_connection, event_node, till, "test-till-feral", None)
+
+    processor = SignatureProcessor(config=config)
+    processor.db_pool = setup_test_db_pool
+    notified: list[int] = []
+    for tse_id in (tse_with_tills.tse_id, tse_b):
+        tse = TSEWrapper(tse_id=tse_id, factory_function=lambda: None)  # type: ignore
+        # the wrappers are not started, only record which of them are woken
+        tse.notify_maybe_orders_available = functools.partial(notified.append, tse_id)  # type: ignore
+        processor.tses[tse_id] = tse
+
+    dispatch_task = asyncio.create_task(processor._dispatch_signature_requests())
+    try:
+        yield ProcessorSetup(
+            processor=processor,
+            notified=notified,
+            tse_a=tse_with_tills.tse_id,
+            tse_b=tse_b,
+            till_a=tse_with_tills.till_ids[0],
+            till_b=till_b,
+            feral_till=feral_till,
+        )
+    finally:
+        dispatch_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await dispatch_task
+
+
+@pytest.fixture
+async def listening_processor(
+    setup_test_db_pool: asyncpg.Pool, config: Config, processor_setup: ProcessorSetup
+) -> AsyncGenerator[ProcessorSetup, None]:
+    till_tses = processor_setup.processor.till_tses
+    listener_task = asyncio.create_task(NotificationListener([till_tses]).run(config.database, setup_test_db_pool))
+    try:
+        await wait_for(lambda: till_tses.active)
+        yield processor_setup
+    finally:
+        if listener_task is not None:
+            listener_task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener_task
+
+
+def _payload(till_id: int) -> str:
+    # same payload as sent by the order insert trigger on the tse_signature channel
+    return json.dumps({"order_id": 1, "till_id": till_id})
+
+
+async def _settle():
+    # lets the dispatcher finish the current and any further dispatch
+    await asyncio.sleep(SIGNATURE_DISPATCH_INTERVAL * 4)
+
+
+async def test_dispatch_wakes_only_owning_tse(listening_processor: ProcessorSetup):
+    setup = listening_processor
+    await setup.processor.handle_hook(_payload(setup.till_a))
+    await wait_for(lambda: len(setup.notified) > 0)
+    await _settle()
+    assert setup.notified == [setup.tse_a]
+
+    setup.notified.clear()
+    await setup.processor.handle_hook(_payload(setup.till_b))
+    await wait_for(lambda: len(setup.notified) > 0)
+    await _settle()
+    assert setup.notified == [setup.tse_b]
+
+
+async def test_dispatch_coalesces_notification_bursts(
+    listening_processor: ProcessorSetup, tse_with_tills: TseWithTills
+):
+    setup = listening_processor
+    # a burst arriving at once results in a single wake-up per TSE
+    for _ in range(10):
+        for till_id in tse_with_tills.till_ids:
+            await setup.processor.handle_hook(_payload(till_id))
+    await wait_for(lambda: len(setup.notified) > 0)
+    await _settle()
+    assert setup.notified == [setup.tse_a]
+
+    # notifications arriving while a dispatch is in progress are handled together by the next dispatch
+    setup.notified.clear()
+    await setup.processor.handle_hook(_payload(setup.till_a))
+    await wait_for(lambda: len(setup.notified) > 0)
+    for _ in range(10):
+        await setup.processor.handle_hook(_payload(setup.till_a))
+        await setup.processor.handle_hook(_payload(setup.till_b))
+    await _settle()
+    assert sorted(setup.notified) == sorted([setup.tse_a, setup.tse_a, setup.tse_b])
+
+
+async def test_dispatch_wakes_all_tses_for_unknown_tills(listening_processor: ProcessorSetup):
+    setup = listening_processor
+    all_tses = sorted([setup.tse_a, setup.tse_b])
+
+    # a till without TSE
+    await setup.processor.handle_hook(_payload(setup.feral_till))
+    await wait_for(lambda: len(setup.notified) >= 2)
+    await _settle()
+    assert sorted(setup.notified) == all_tses
+
+    # a till unknown to the map
+    setup.notified.clear()
+    await setup.processor.handle_hook(_payload(setup.till_b + 1000))
+    await wait_for(lambda: len(setup.notified) >= 2)
+    await _settle()
+    assert sorted(setup.notified) == all_tses
+
+    # the initial run of the hook
+    setup.notified.clear()
+    await setup.processor.handle_hook(None)
+    await wait_for(lambda: len(setup.notified) >= 2)
+    await _settle()
+    assert sorted(setup.notified) == all_tses
+
+
+async def test_dispatch_wakes_all_tses_without_till_map(processor_setup: ProcessorSetup):
+    setup = processor_setup
+    assert not setup.processor.till_tses.active
+    await setup.processor.handle_hook(_payload(setup.till_a))
+    await wait_for(lambda: len(setup.notified) >= 2)
+    await _settle()
+    assert sorted(setup.notified) == sorted([setup.tse_a, setup.tse_b])
+
+
+async def test_till_reassignment_reloads_till_tse_map(db_connection: Connection, listening_processor: ProcessorSetup):
+    setup = listening_processor
+    till_tses = setup.processor.till_tses
+    assert till_tses.get_tse_id(setup.till_a) == setup.tse_a
+    assert till_tses.get_tse_id(setup.feral_till) is None
+
+    version = till_tses.version
+    await db_connection.execute(
+        "update till set tse_id = $1 where id = any($2)", setup.tse_b, [setup.till_a, setup.feral_till]
+    )
+    await wait_for(lambda: till_tses.version > version and till_tses.active)
+    assert till_tses.get_tse_id(setup.till_a) == setup.tse_b
+    assert till_tses.get_tse_id(setup.feral_till) == setup.tse_b
+
+    await setup.processor.handle_hook(_payload(setup.till_a))
+    await wait_for(lambda: len(setup.notified) > 0)
+    await _settle()
+    assert setup.notified == [setup.tse_b]
+
+
+@pytest.mark.parametrize("with_till_map", [True, False])
+async def test_feral_tills_are_spread_over_least_loaded_tses(
+    setup_test_db_pool: asyncpg.Pool,
+    config: Config,
+    db_connection: Connection,
+    event_node: Node,
+    till: Till,
+    cashier: Cashier,
+    with_till_map: bool,
+):
+    sub_node = await create_node(
+        conn=db_connection,
+        parent_id=event_node.id,
+        new_node=NewNode(
+            name="sub node", description="", forbidden_objects_at_node=[], forbidden_objects_in_subtree=[]
+        ),
+    )
+    tse_1 = await _create_tse(db_connection, event_node, "test-tse-1")
+    tse_2 = await _create_tse(db_connection, event_node, "test-tse-2")
+    inactive_tse = await _create_tse(db_connection, event_node, "test-tse-inactive", status="new")
+    sub_node_tse = await _create_tse(db_connection, sub_node, "test-tse-sub-node")
+    await _create_till(db_connection, event_node, till, "test-till-assigned", tse_1)
+    feral_tills = [await _create_till(db_connection, event_node, till, f"test-till-{i}", None) for i in range(5)]
+    sub_node_till = await _create_till(db_connection, sub_node, till, "test-till-sub-node", None)
+    # a till without new signature requests keeps having no TSE
+    idle_till = await _create_till(db_connection, event_node, till, "test-till-idle", None)
+    for till_id in feral_tills + [sub_node_till]:
+        await book_order(db_connection, cashier, till_id)
+
+    processor = SignatureProcessor(config=config)
+    processor.db_pool = setup_test_db_pool
+    for tse_id in (tse_1, tse_2, inactive_tse, sub_node_tse):
+        processor.tses[tse_id] = TSEWrapper(tse_id=tse_id, factory_function=lambda: None)  # type: ignore
+    till_tses = processor.till_tses
+    listener_task = None
+    if with_till_map:
+        listener_task = asyncio.create_task(NotificationListener([till_tses]).run(config.database, setup_test_db_pool))
+    try:
+        if listener_task is not None:
+            await wait_for(lambda: till_tses.active)
+        else:
+            # the tills per TSE are counted in the database instead
+            assert not till_tses.active
+
+        await processor._handle_feral_tses(conn=db_connection)
+
+        tse_ids = {
+            row["id"]: row["tse_id"]
+            for row in await db_connection.fetch(
+                "select id, tse_id from till where node_id = any($1)", [event_node.id, sub_node.id]
+            )
+        }
+        # each till goes to the active TSE with the fewest tills, tse 1 already has one, ties go to the lower id
+        assert [tse_ids[till_id] for till_id in feral_tills] == [tse_2, tse_1, tse_2, tse_1, tse_2]
+        # the unused TSEs of the sub node and the inactive TSE are no candidates for tills of the event node,
+        # TSEs of a sub node are only available to the tills of that sub node
+        assert tse_ids[sub_node_till] == sub_node_tse
+        assert tse_ids[idle_till] is None
+
+        if listener_task is not None:
+            await wait_for(lambda: till_tses.get_tse_id(sub_node_till) == sub_node_tse)
+            metrics = processor.metrics()
+            assert metrics[f"tse_{tse_1}_tills"] == 3
+            assert metrics[f"tse_{tse_2}_tills"] == 3
+            assert metrics[f"tse_{sub_node_tse}_tills"] == 1
+            assert metrics[f"tse_{inactive_tse}_tills"] == 0
+    finally:
+        if listener_task is not None:
+            listener_task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener_task
@@ -0,0 +1,194 @@
+# pylint: disable=redefined-outer-name,protected-access
+import asyncio
+
+import asyncpg
+import pytest
+from sftkit.database import Connection
+
+from stustapay.tse.handler import TSESignatureRequest
+from stustapay.tse.wrapper import TSEWrapper
+
+from ..common import count_queries
+from ..conftest import Cashier
+from .conftest import TseSimulator, TseWithTills, book_order
+
+
+@pytest.fixture
+async def simulated_tse(db_connection: Connection, tse_with_tills: TseWithTills) -> TseWithTills:
+    # the wrapper registers a new TSE with the master data of the simulator on connect
+    await db_connection.execute("update tse set status = 'new' where id = $1", tse_with_tills.tse_id)
+    return tse_with_tills
+
+
+def _make_wrapper(tse: TseWithTills, tse_simulator: TseSimulator) -> TSEWrapper:
+    return TSEWrapper(tse_id=tse.tse_id, factory_function=lambda: tse_simulator.handler(f"tse {tse.tse_id}"))
+
+
+async def _book_orders(conn: Connection, cashier: Cashier, till_ids: list[int], n_per_till: int) -> list[int]:
+    return [await book_order(conn, cashier, till_id) for _ in range(n_per_till) for till_id in till_ids]
+
+
+async def _signature_rows(conn: Connection, order_ids: list[int]) -> dict[int, dict]:
+    rows = await conn.fetch(
+        "select s.*, o.till_id from tse_signature s join ordr o on o.id = s.id where s.id = any($1)", order_ids
+    )
+    return {row["id"]: dict(row) for row in rows}
+
+
+async def _wait_until_signed(conn: Connection, order_ids: list[int], timeout: float = 20):
+    async with asyncio.timeout(timeout):
+        while await conn.fetchval(
+            "select count(*) from tse_signature where id = any($1) and signature_status in ('new', 'pending')",
+            order_ids,
+        ):
+            await asyncio.sleep(0.05)
+
+
+async def test_wrapper_signs_all_requests_in_till_order(
+    setup_test_db_pool: asyncpg.Pool,
+    db_connection: Connection,
+    simulated_tse: TseWithTills,
+    tse_simulator: TseSimulator,
+    cashier: Cashier,
+):
+    order_ids = await _book_orders(db_connection, cashier, simulated_tse.till_ids, n_per_till=4)
+
+    wrapper = _make_wrapper(simulated_tse, tse_simulator)
+    wrapper.start(setup_test_db_pool)
+    wrapper.notify_maybe_orders_available()
+    try:
+        await _wait_until_signed(db_connection, order_ids)
+    finally:
+        await wrapper.stop()
+
+    rows = await _signature_rows(db_connection, order_ids)
+    assert all(row["signature_status"] == "done" for row in rows.values())
+    assert all(row["tse_id"] == simulated_tse.tse_id for row in rows.values())
+    assert all(row["tse_signature"] and row["transaction_process_data"] for row in rows.values())
+    for till_id in simulated_tse.till_ids:
+        # the signature counter of the TSE increases with every signature, a till's orders are signed in order
+        counters = [
+            int(rows[order_id]["tse_signaturenr"]) for order_id in order_ids if rows[order_id]["till_id"] == till_id
+        ]
+        assert counters == sorted(counters)
+    assert wrapper.metrics.signatures == len(order_ids)
+    assert not wrapper._results
+    assert not wrapper._claimed_at
+
+
+async def test_wrapper_returns_queued_requests_on_stop(
+    setup_test_db_pool: asyncpg.Pool,
+    db_connection: Connection,
+    simulated_tse: TseWithTills,
+    tse_simulator: TseSimulator,
+    cashier: Cashier,
+):
+    order_ids = await _book_orders(db_connection, cashier, simulated_tse.till_ids, n_per_till=3)
+
+    wrapper = _make_wrapper(simulated_tse, tse_simulator)
+    request_done = wrapper._request_done
+    return_requests = wrapper._return_requests
+    returned: list[int] = []
+
+    def stop_after_first_signature(request, result):
+        request_done(request, result)
+        wrapper._stop = True
+
+    async def record_returned_requests(conn, requests: list[TSESignatureRequest]):
+        returned.extend(request.order_id for request in requests)
+        await return_requests(conn, requests)
+
+    wrapper._request_done = stop_after_first_signature  # type: ignore
+    wrapper._return_requests = record_returned_requests  # type: ignore
+    wrapper.start(setup_test_db_pool)
+    wrapper.notify_maybe_orders_available()
+    await asyncio.wait_for(wrapper._task, timeout=20)
+
+    rows = await _signature_rows(db_connection, order_ids)
+    # every claimed request was either signed or handed back to be claimed again
+    assert not [order_id for order_id, row in rows.items() if row["signature_status"] == "pending"]
+    done = [order_id for order_id, row in rows.items() if row["signature_status"] == "done"]
+    assert len(done) == 1
+    assert returned
+    assert not set(returned) & set(done)
+    for order_id in returned:
+        assert rows[order_id]["signature_status"] == "new"
+        assert rows[order_id]["tse_id"] is None
+    assert not wrapper._claimed_at
+
+
+@pytest.fixture
+async def signed_requests(
+    db_connection: Connection, simulated_tse: TseWithTills, tse_simulator: TseSimulator, cashier: Cashier
+):
+    """
+    Claims one request per till with a wrapper connected to the simulator and signs all of them,
+    the results are kept in the wrapper and not yet written to the database.
+    """
+    await _book_orders(db_connection, cashier, simulated_tse.till_ids, n_per_till=1)
+    wrapper = _make_wrapper(simulated_tse, tse_simulator)
+    requests = await wrapper._claim_requests(db_connection, limit=len(simulated_tse.till_ids))
+    assert len(requests) == len(simulated_tse.till_ids)
+    async with tse_simulator.handler("test") as handler:
+        wrapper._tse_handler = handler
+        for request in requests:
+            await handler.register_client_id(request.till_id)
+        signatures = [await wrapper._sign(request) for request in requests]
+    return wrapper, requests, signatures
+
+
+async def test_flush_results_writes_all_results_in_one_statement(db_connection: Connection, signed_requests):
+    wrapper, requests, signatures = signed_requests
+    for request, signature in zip(requests[:-1], signatures[:-1]):
+        wrapper._request_done(request, signature)
+    wrapper._fail_request(requests[-1], "test failure")
+
+    with count_queries(db_connection) as counter:
+        await wrapper._flush_results(db_connection)
+    assert not wrapper._results
+
+    rows = await _signature_rows(db_connection, [request.order_id for request in requests])
+    # the query logger is called asynchronously, the counter is complete once the rows have been fetched
+    assert len(counter) == 1
+    for request, signature in zip(requests[:-1], signatures[:-1]):
+        row = rows[request.order_id]
+        assert row["signature_status"] == "done"
+        assert row["result_message"] == "success"
+        assert row["transaction_process_data"] == request.process_data
+        assert row["tse_signature"] == signature.tse_signature
+        assert row["tse_signaturenr"] == str(signature.tse_signaturenr)
+        assert row["tse_duration"] == pytest.approx(signature.tse_duration)
+    failed = rows[requests[-1].order_id]
+    assert failed["signature_status"] == "failure"
+    assert failed["result_message"] == "test failure"
+    assert failed["tse_signature"] is None
+
+
+async def test_failed_flush_keeps_results_for_next_flush(db_connection: Connection, signed_requests):
+    wrapper, requests, signatures = signed_requests
+    write_results = wrapper._write_results
+    n_writes = 0
+
+    async def fail_first_write(conn, results):
+        nonlocal n_writes
+        n_writes += 1
+        if n_writes == 1:
+            raise ConnectionError("test")
+        await write_results(conn, results)
+
+    wrapper._write_results = fail_first_write
+    wrapper._request_done(requests[0], signatures[0])
+    wrapper._request_done(requests[1], signatures[1])
+    with pytest.raises(ConnectionError):
+        await wrapper._flush_results(db_connection)
+    assert [request for request, _, _, _ in wrapper._results] == requests[:2]
+    rows = await _signature_rows(db_connection, [request.order_id for request in requests])
+    assert all(row["signature_status"] == "pending" for row in rows.values())
+
+    # results finished in the meantime are written together with the retained ones
+    wrapper._request_done(requests[2], signatures[2])
+    await wrapper._flush_results(db_connection)
+    assert n_writes == 2
+    assert not wrapper._results
+    rows = await _signature_rows(db_connection, [request.order_id for request in requests])
+    assert all(row["signature_status"] == "done" for row in rows.values())
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+import uuid
+
+import asyncpg
+from sftkit.database import Connection
+
+from stustapay.core.config import Config
+from stustapay.core.database import get_database
+from stustapay.core.schema.tree import Node
+from stustapay.core.service.tree.common import fetch_node
+
+from .wrapper import claim_signature_requests
+
+
+class TseClaimBenchmark:
+    """
+    Measures the signature throughput of an increasing number of simulated TSEs sharing a fixed number of tills.
+
+    For every number of TSEs the benchmark creates that many active TSEs and n_tills tills at the given node, assigns
+    the tills round robin to the TSEs and books n_orders orders evenly distributed over the tills. Every simulated TSE
+    then claims the signature requests of its tills one by one, exactly as the signature processor does, waits
+    sign_time to emulate the TSE and marks the signature as done. All created rows are deleted afterwards.
+
+    The booked orders notify a running signature processor, the benchmark should therefore not be run against a
+    database with an active signature processor.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        node_id: int,
+        tse_counts: list[int],
+        n_tills: int = 50,
+        n_orders: int = 2000,
+        sign_time: float = 0.0,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.node_id = node_id
+        self.tse_counts = tse_counts
+        self.n_tills = n_tills
+        self.n_orders = n_orders
+        self.sign_time = sign_time
+
+    async def _setup(self, conn: Connection, node: Node, cashier_id: int, n_tses: int) -> tuple[list[int], list[int]]:
+        run_id = uuid.uuid4().hex[:8]
+        async with conn.transaction():
+            tse_ids = [
+                await conn.fetchval(
+                    "insert into tse (name, serial, status, node_id) values ($1, $2, 'active', $3) returning id",
+                    f"benchmark tse {run_id} {i}",
+                    f"benchmark-{run_id}-{i}",
+                    node.id,
+                )
+                for i in range(n_tses)
+            ]
+            till_ids = [
+                await conn.fetchval(
+                    "insert into till (name, node_id, active_profile_id, tse_id) "
+                    "values ($1, $2, (select id from till_profile where node_id = any($3) order by id limit 1), $4) "
+                    "returning id",
+                    f"benchmark till {run_id} {i}",
+                    node.id,
+                    node.ids_to_root,
+                    tse_ids[i % n_tses],
+                )
+                for i in range(self.n_tills)
+            ]
+            await conn.execute(
+                "insert into ordr (payment_method, z_nr, order_type, cashier_id, till_id) "
+                "select 'cash', 1, 'sale', $1, ($2::bigint[])[i % cardinality($2) + 1] "
+                "from generate_series(0, $3 - 1) as i",
+                cashier_id,
+                till_ids,
+                self.n_orders,
+            )
+        return tse_ids, till_ids
+
+    @staticmethod
+    async def _teardown(conn: Connection, tse_ids: list[int], till_ids: list[int]):
+        async with conn.transaction():
+            order_ids = await conn.fetchval("select array_agg(id) from ordr where till_id = any($1)", till_ids)
+            await conn.execute("delete from bon where id = any($1)", order_ids)
+            await conn.execute("delete from tse_signature where id = any($1)", order_ids)
+            await conn.execute("delete from ordr where id = any($1)", order_ids)
+            await conn.execute("delete from till where id = any($1)", till_ids)
+            await conn.execute("delete from tse where id = any($1)", tse_ids)
+
+    async def _tse_worker(self, conn: Connection, tse_id: int, n_signatures: int) -> int:
+        n_claims = 0
+        while n_signatures > 0:
+            claimed = await claim_signature_requests(conn=conn, tse_id=tse_id, limit=1)
+            n_claims += 1
+            for order_id, _ in claimed:
+                if self.sign_time > 0:
+                    await asyncio.sleep(self.sign_time)
+                await conn.execute(
+                    "update tse_signature set signature_status = 'done', result_message = 'benchmark', "
+                    "transaction_process_type = '', transaction_process_data = '', tse_transaction = '', "
+                    "tse_signaturenr = '', tse_start = '', tse_end = '', tse_signature = '' where id = $1",
+                    order_id,
+                )
+                n_signatures -= 1
+        return n_claims
+
+    async def _measure(self, db_pool: asyncpg.Pool, node: Node, cashier_id: int, n_tses: int) -> tuple[float, float]:
+        async with db_pool.acquire() as conn:
+            tse_ids, till_ids = await self._setup(conn=conn, node=node, cashier_id=cashier_id, n_tses=n_tses)
+        connections = [await db_pool.acquire() for _ in range(n_tses)]
+        try:
+            # order i is booked at till i % n_tills which belongs to TSE i % n_tills % n_tses
+            n_signatures = [0] * n_tses
+            for i in range(self.n_orders):
+                n_signatures[i % self.n_tills % n_tses] += 1
+            start = time.monotonic()
+            n_claims = await asyncio.gather(
+                *[
+                    self._tse_worker(conn=conn, tse_id=tse_id, n_signatures=n)
+                    for conn, tse_id, n in zip(connections, tse_ids, n_signatures)
+                ]
+            )
+            elapsed = time.monotonic() - start
+            return self.n_orders / elapsed, sum(n_claims) / elapsed
+        finally:
+            for conn in connections:
+                await db_pool.release(conn)
+            async with db_pool.acquire() as conn:
+                await self._teardown(conn=conn, tse_ids=tse_ids, till_ids=till_ids)
+
+    async def run(self):
+        db = get_database(self.config.database)
+        db_pool = await db.create_pool(n_connections=max(self.tse_counts) + 1)
+        try:
+            async with db_pool.acquire() as conn:
+                node = await fetch_node(conn=conn, node_id=self.node_id)
+                assert node is not None
+                cashier_id = await conn.fetchval(
+                    "select id from usr where node_id = any($1) order by id limit 1", node.ids_to_event_node
+                )
+                assert cashier_id is not None, "the benchmark books orders on behalf of an existing user"
+
+            print("tses".ljust(8) + f"{'signatures':>16}{'claims':>16}")
+            for n_tses in self.tse_counts:
+                signatures, claims = await self._measure(
+                    db_pool=db_pool, node=node, cashier_id=cashier_id, n_tses=n_tses
+                )
+                self.logger.info(f"{n_tses = }: {signatures:.1f} signatures/s, {claims:.1f} claims/s")
+                print(str(n_tses).ljust(8) + f"{f'{signatures:.1f}/s':>16}{f'{claims:.1f}/s':>16}")
+        finally:
+            await db_pool.close()
@@ -597,6 +597,7 @@ class WebsocketInterface:
     ):
         self.host: str = host
         self.port: int = port
+        self._webserver: Optional[uvicorn.Server] = None
 
         self.tse = VirtualTSE(delay, fast, real, private_key_hex, gen_key, broken)
 
@@ -624,7 +625,7 @@ class WebsocketInterface:
             title="TSE Simulator",
             license_info={"name": "AGPL-3.0"},
         )
-        app.add_websocket_route("/", self.websocket_handler)
+        app.add_api_websocket_route("/", self.websocket_handler)
 
         uvicorn_config = uvicorn.Config(
             app,
@@ -632,5 +633,10 @@ class WebsocketInterface:
             port=self.port,
             log_level=logging.root.level,
         )
-        webserver = uvicorn.Server(uvicorn_config)
-        await webserver.serve()
+        self._webserver = uvicorn.Server(uvicorn_config)
+        await self._webserver.serve()
+
+    def stop(self):
+        # makes run() return after closing all connections
+        if self._webserver is not None:
+            self._webserver.should_exit = True
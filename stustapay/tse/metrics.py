@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Sequence
+
+from aiohttp import web
+
+from stustapay.core.healthcheck import MetricsCallback
+
+LOGGER = logging.getLogger(__name__)
+
+# bucket upper bounds in seconds
+SIGNATURE_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed durations, exported as one counter per bucket upper bound plus sum and count.
+    """
+
+    def __init__(self, buckets: Sequence[float] = SIGNATURE_DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[i] += 1
+
+    def metrics(self, prefix: str) -> dict[str, float]:
+        metrics: dict[str, float] = {
+            f"{prefix}_bucket_le_{upper_bound:g}": count for upper_bound, count in zip(self.buckets, self.bucket_counts)
+        }
+        metrics[f"{prefix}_bucket_le_inf"] = self.count
+        metrics[f"{prefix}_sum"] = self.sum
+        metrics[f"{prefix}_count"] = self.count
+        return metrics
+
+
+class TseMetrics:
+    """
+    Signing metrics of a single TSE, updated by its TSEWrapper.
+    """
+
+    def __init__(self):
+        # time the TSE took to create a signature
+        self.signature_duration = Histogram()
+        # time between claiming a signature request and passing it to the TSE
+        self.claim_to_sign_delay = Histogram()
+        self.signatures = 0
+        self.failures = 0
+        self.reconnects = 0
+
+    def metrics(self, prefix: str) -> dict[str, float]:
+        return {
+            **self.signature_duration.metrics(f"{prefix}_signature_duration_seconds"),
+            **self.claim_to_sign_delay.metrics(f"{prefix}_claim_to_sign_delay_seconds"),
+            f"{prefix}_signatures": self.signatures,
+            f"{prefix}_failures": self.failures,
+            f"{prefix}_reconnects": self.reconnects,
+        }
+
+
+async def run_metrics_server(host: str, port: int, metrics: Sequence[MetricsCallback]) -> None:
+    """
+    Serves the collected metrics as a JSON object on http://host:port/metrics until cancelled.
+    """
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        del request
+        collected: dict[str, float] = {}
+        for callback in metrics:
+            collected.update(callback())
+        return web.json_response(collected)
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, host=host, port=port)
+        try:
+            await site.start()
+        except OSError:
+            LOGGER.exception(f"failed to start the TSE metrics endpoint on {host}:{port}")
+            return
+        LOGGER.info(f"serving TSE metrics on http://{host}:{port}/metrics")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,5 +1,6 @@
 import asyncio
 import contextlib
+import json
 import logging
 
 import asyncpg
@@ -9,13 +10,22 @@ from stustapay.core.config import Config
 from stustapay.core.database import get_database
 from stustapay.core.healthcheck import run_healthcheck
 from stustapay.core.schema.tse import Tse
+from stustapay.core.service.common.notification_cache import NotificationListener
+from stustapay.core.service.tree.cache import node_tree_cache
 from stustapay.core.service.tree.common import fetch_node
 
 from .config import get_tse_handler
+from .metrics import run_metrics_server
+from .till_tse_map import TillTseMap
 from .wrapper import TSEWrapper
 
 LOGGER = logging.getLogger(__name__)
 
+# minimum time between two dispatches of new signature requests, notifications arriving meanwhile are handled at once
+SIGNATURE_DISPATCH_INTERVAL = 0.05
+# interval in which the number of new and pending signature requests per TSE is refreshed for the metrics
+QUEUE_DEPTH_REFRESH_INTERVAL = 5.0
+
 
 class SignatureProcessor:
     def __init__(self, config: Config):
@@ -23,6 +33,13 @@ class SignatureProcessor:
         self.tses: dict[int, TSEWrapper] = {}  # tse_id -> Tse
         self.db_pool: asyncpg.Pool | None = None
         # contains event objects for each object that is waiting for new events.
+        self.till_tses = TillTseMap()
+        # tills with new signature requests since the last dispatch, see _dispatch_signature_requests
+        self._pending_till_ids: set[int] = set()
+        self._notify_all_tses = False
+        self._signature_requests_available = asyncio.Event()
+        # tse_id -> signature status -> number of signature requests, see _refresh_queue_depths
+        self._queue_depths: dict[int, dict[str, int]] = {}
 
     async def run(self) -> None:
         db = get_database(self.config.database)
@@ -77,13 +94,25 @@ class SignatureProcessor:
             LOGGER.info(f"Configured TSEs: {self.tses}")
 
             db_hook = DatabaseHook(self.db_pool, "tse_signature", self.handle_hook, initial_run=True)
-            await db_hook.run()
             await asyncio.gather(
                 db_hook.run(),
-                run_healthcheck(db, service_name="tses"),
+                NotificationListener([node_tree_cache, self.till_tses]).run(self.config.database, self.db_pool),
+                self._dispatch_signature_requests(),
+                self._refresh_queue_depths(),
+                run_healthcheck(db, service_name="tses", metrics=[self.metrics]),
+                run_metrics_server(
+                    host=self.config.tse.metrics_host, port=self.config.tse.metrics_port, metrics=[self.metrics]
+                ),
                 return_exceptions=True,
             )
 
+    async def _count_tills_per_tse(self, conn: Connection) -> dict[int, int]:
+        counts = self.till_tses.count_tills_per_tse()
+        if counts is not None:
+            return counts
+        rows = await conn.fetch("select tse_id, count(*) as n_tills from till where tse_id is not null group by tse_id")
+        return {row["tse_id"]: row["n_tills"] for row in rows}
+
     async def _handle_feral_tses(self, conn: Connection):
         feral_till_id_rows = await conn.fetch(
             """
@@ -97,6 +126,7 @@ class SignatureProcessor:
                 where
                     tse_signature.signature_status = 'new' and
                     till.tse_id is null
+                order by till.id
                 """
         )
         if not feral_till_id_rows:
@@ -104,49 +134,140 @@ class SignatureProcessor:
 
         LOGGER.info(f"till(s) without TSE but an order {feral_till_id_rows}")
         LOGGER.info(f"{len(feral_till_id_rows)} till(s) need a TSE")
-        # assign TSEs
+
+        active_tses = await conn.fetch("select id, node_id from tse where status='active'")
+        tse_stats = await self._count_tills_per_tse(conn=conn)
+        # TSEs available at a node are all active TSEs from the event node down to the node itself
+        candidates_per_node: dict[int, list[int]] = {}
+        assignments: list[tuple[int, int]] = []
         for till in feral_till_id_rows:
-            node = await fetch_node(conn=conn, node_id=till["node_id"])
-            assert node is not None
-            # get number of assigned tills per tse, but only of active TSEs
-            tse_stats = dict()
-            active_tses = await conn.fetch(
-                "select id from tse where status='active' and node_id = any($1)", node.ids_to_event_node
-            )
-            if len(active_tses) == 0:  # no tse found for this node -> ignore this node
+            node_id = till["node_id"]
+            if node_id not in candidates_per_node:
+                node = node_tree_cache.get_node(node_id) or await fetch_node(conn=conn, node_id=node_id)
+                assert node is not None
+                ids_to_event_node = set(node.ids_to_event_node or [])
+                candidates_per_node[node_id] = [tse["id"] for tse in active_tses if tse["node_id"] in ids_to_event_node]
+            candidates = candidates_per_node[node_id]
+            if len(candidates) == 0:  # no tse found for this node -> ignore this node
+                LOGGER.error(f"no active TSE available for till with ID={till['till_id']}")
                 continue
-            for tse in active_tses:
-                # TODO optimize this statement for really really large installations...
-                tse_stats[tse["id"]] = await conn.fetchval(
-                    "select count(*) from till join tse on till.tse_id = tse.id where tse.id = $1 and tse.status='active'",
-                    tse["id"],
-                )
 
-            tse_ranked = sorted(tse_stats.items(), key=lambda x: x[1])
-            # assign this till to tse with the lowest number
-            till_id_to_assign_to_tse = till["till_id"]
+            # assign this till to tse with the lowest number of tills
+            tse_id_to_assign_to_till = min(candidates, key=lambda tse_id: (tse_stats.get(tse_id, 0), tse_id))
+            tse_stats[tse_id_to_assign_to_till] = tse_stats.get(tse_id_to_assign_to_till, 0) + 1
+            assignments.append((till["till_id"], tse_id_to_assign_to_till))
+
+        if not assignments:
+            return
+        await conn.execute(
+            """
+            update
+                till
+            set
+                tse_id = a.tse_id
+            from
+                unnest($1::bigint[], $2::bigint[]) as a(till_id, tse_id)
+            where
+                till.id = a.till_id and
+                till.tse_id is null
+            """,
+            [till_id for till_id, _ in assignments],
+            [tse_id for _, tse_id in assignments],
+        )
+        for till_id, tse_id in assignments:
+            LOGGER.info(f"Till with ID={till_id} is assigned to TSE: {tse_id}")
+        LOGGER.info(f"Tills per TSE: {tse_stats}")
+
+    async def _fetch_queue_depths(self, conn: Connection) -> dict[int, dict[str, int]]:
+        rows = await conn.fetch(
+            """
+            select
+                coalesce(tse_signature.tse_id, till.tse_id) as tse_id,
+                tse_signature.signature_status::text as signature_status,
+                count(*) as n_requests
+            from
+                tse_signature
+                join ordr on ordr.id = tse_signature.id
+                join till on ordr.till_id = till.id
+            where
+                tse_signature.signature_status in ('new', 'pending')
+            group by 1, 2
+            """
+        )
+        queue_depths: dict[int, dict[str, int]] = {}
+        for row in rows:
+            if row["tse_id"] is not None:
+                queue_depths.setdefault(row["tse_id"], {})[row["signature_status"]] = row["n_requests"]
+        return queue_depths
+
+    async def _refresh_queue_depths(self):
+        assert self.db_pool is not None
+        while True:
             try:
-                tse_id_to_assign_to_till = tse_ranked[0][0]
-                await conn.execute(
-                    "update till set tse_id = $1 where id = $2", tse_id_to_assign_to_till, till_id_to_assign_to_tse
-                )
-                LOGGER.info(f"Till with ID={till_id_to_assign_to_tse} is assigned to TSE: {tse_id_to_assign_to_till}")
-            except IndexError:
-                LOGGER.error("ERROR: no more active TSEs available")
-                LOGGER.warning("will set all signature requests to 'failure'")
-                await conn.execute(
-                    "update tse_signature set signature_status = 'failure', result_message = 'TSE failure, no active TSE available', tse_id = 1 where signature_status='new'"
-                )
+                async with self.db_pool.acquire() as conn:
+                    self._queue_depths = await self._fetch_queue_depths(conn=conn)
+            except Exception:
+                LOGGER.exception("failed to fetch the TSE queue depths")
+            await asyncio.sleep(QUEUE_DEPTH_REFRESH_INTERVAL)
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Signing metrics of all configured TSEs, served on the metrics endpoint and written to the healthcheck.
+        """
+        tse_stats = self.till_tses.count_tills_per_tse() or {}
+        metrics: dict[str, float] = {}
+        for tse_id, tse in self.tses.items():
+            prefix = f"tse_{tse_id}"
+            queue_depth = self._queue_depths.get(tse_id, {})
+            metrics[f"{prefix}_tills"] = tse_stats.get(tse_id, 0)
+            metrics[f"{prefix}_new_requests"] = queue_depth.get("new", 0)
+            metrics[f"{prefix}_pending_requests"] = queue_depth.get("pending", 0)
+            metrics.update(tse.metrics.metrics(prefix))
+        return metrics
 
     async def handle_hook(self, payload):
+        """
+        Collects the tills of new signature requests, the responsible TSEs are notified by
+        _dispatch_signature_requests such that a burst of orders is handled at once.
+        """
+        if payload is None:
+            self._notify_all_tses = True
+        else:
+            self._pending_till_ids.add(json.loads(payload)["till_id"])
+        self._signature_requests_available.set()
+
+    async def _dispatch_signature_requests(self):
         assert self.db_pool is not None
-        del payload  # unused
-        LOGGER.info("tse_signature hook")
+        while True:
+            await self._signature_requests_available.wait()
+            self._signature_requests_available.clear()
+            till_ids = self._pending_till_ids
+            self._pending_till_ids = set()
+            notify_all_tses = self._notify_all_tses
+            self._notify_all_tses = False
+            LOGGER.info(f"tse_signature hook for tills {sorted(till_ids)}")
+
+            tse_ids = set()
+            for till_id in till_ids:
+                tse_id = self.till_tses.get_tse_id(till_id)
+                if tse_id is None:
+                    # the till has no TSE yet or the till mapping is not loaded
+                    notify_all_tses = True
+                else:
+                    tse_ids.add(tse_id)
+
+            if notify_all_tses:
+                # check if it is from a till without an assigned TSE
+                try:
+                    async with self.db_pool.acquire() as conn:
+                        await self._handle_feral_tses(conn=conn)
+                except Exception:
+                    LOGGER.exception("failed to assign TSEs to tills")
+                tse_ids = set(self.tses)
 
-        # check if it is from a till without an assigned TSE
-        async with self.db_pool.acquire() as conn:
-            await self._handle_feral_tses(conn=conn)
+            for tse_id in tse_ids:
+                tse = self.tses.get(tse_id)
+                if tse is not None:
+                    tse.notify_maybe_orders_available()
 
-        # notify all TSEs
-        for tse in self.tses.values():
-            tse.notify_maybe_orders_available()
+            await asyncio.sleep(SIGNATURE_DISPATCH_INTERVAL)
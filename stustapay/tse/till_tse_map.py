@@ -0,0 +1,39 @@
+from collections import Counter
+
+from sftkit.database import Connection
+
+from stustapay.core.service.common.notification_cache import NotificationInvalidatedSnapshot
+
+TILL_TSE_CHANGED_CHANNEL = "till_tse_changed"
+
+
+class TillTseMap(NotificationInvalidatedSnapshot[dict[int, int | None]]):
+    """
+    In-memory mapping of all tills to the TSE they are assigned to, used by the signature processor to only notify the
+    TSE responsible for a new signature request. Invalidated via the till_tse_changed notification channel, see
+    notify_till_tse_changed in 0002-triggers.sql.
+    """
+
+    channels = (TILL_TSE_CHANGED_CHANNEL,)
+
+    def get_tse_id(self, till_id: int) -> int | None:
+        """
+        Returns the id of the TSE the till is assigned to, None if the till has no TSE, is not known or the map is
+        inactive.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return snapshot.get(till_id)
+
+    def count_tills_per_tse(self) -> dict[int, int] | None:
+        """
+        Returns the number of tills assigned to each TSE which has at least one till, None if the map is inactive.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return dict(Counter(tse_id for tse_id in snapshot.values() if tse_id is not None))
+
+    async def _load_snapshot(self, conn: Connection) -> dict[int, int | None]:
+        return {row["id"]: row["tse_id"] for row in await conn.fetch("select id, tse_id from till")}
@@ -1,4 +1,5 @@
 import asyncio
+import collections
 import contextlib
 import datetime
 import logging
@@ -13,11 +14,83 @@ from sftkit.util import create_task_protected
 
 from .handler import TSEHandler, TSESignature, TSESignatureRequest
 from .kassenbeleg_v1 import Kassenbeleg_V1
+from .metrics import TseMetrics
 
 LOGGER = logging.getLogger(__name__)
 
 PAYMENT_METHOD_TO_ZAHLUNGSART = {"cash": "Bar", "sumup": "Unbar", "tag": "Unbar", "sumup_online": "Unbar"}
 
+# number of claimed signature requests a TSE keeps queued, such that the next one is ready once a signature is done
+SIGNATURE_PREFETCH_SIZE = 4
+
+
+async def claim_signature_requests(*, conn: Connection, tse_id: int, limit: int) -> list[tuple[int, str]]:
+    """
+    Claims up to limit signature requests for the tills assigned to the given TSE by marking them as 'pending'.
+
+    Only the oldest 'new' request of a till is claimable and only if the till has no other pending request, such
+    that the signatures of a till are created in order. The claimed rows are locked with skip locked, concurrent
+    signature processors therefore never wait for each other or claim the same request twice.
+
+    Returns (order_id, till_id) pairs ordered by order id, the till_id is converted to a string to be used as TSE
+    ClientID.
+    """
+    rows = await conn.fetch(
+        """
+        with next_per_till as (
+            select distinct on (o.till_id)
+                s.id,
+                o.till_id
+            from
+                tse_signature s
+                join ordr o on o.id = s.id
+                join till t on o.till_id = t.id
+            where
+                s.signature_status = 'new' and
+                t.tse_id = $1
+            order by o.till_id, s.id
+        ),
+        claimable as (
+            select
+                s.id,
+                n.till_id
+            from
+                tse_signature s
+                join next_per_till n on s.id = n.id
+            where
+                s.signature_status = 'new' and
+                not exists (
+                    select
+                        1
+                    from
+                        tse_signature p
+                        join ordr po on po.id = p.id
+                    where
+                        p.signature_status = 'pending' and
+                        po.till_id = n.till_id
+                )
+            order by s.id
+            limit $2
+            for update of s skip locked
+        )
+        update
+            tse_signature
+        set
+            signature_status = 'pending',
+            tse_id = $1
+        from
+            claimable
+        where
+            tse_signature.id = claimable.id
+        returning
+            tse_signature.id as order_id,
+            claimable.till_id
+        """,
+        tse_id,
+        limit,
+    )
+    return sorted((row["order_id"], str(row["till_id"])) for row in rows)
+
 
 class TSEWrapper:
     def __init__(self, tse_id: int, factory_function: Callable[[], TSEHandler]):
@@ -37,6 +110,13 @@ class TSEWrapper:
         self._stop = False
         # Set this event to notify that new orders are available in the DB
         self._orders_available_event = asyncio.Event()
+        # Results of finished signature requests which still have to be written to the database:
+        # (request, signature_status, result_message, signature)
+        self._results: list[tuple[TSESignatureRequest, str, str, TSESignature | None]] = []
+        # time.monotonic() at which the queued requests were claimed, by order id
+        self._claimed_at: dict[int, float] = {}
+        # signing metrics exported by the signature processor
+        self.metrics = TseMetrics()
 
     def start(self, db_pool: asyncpg.Pool):
         self._task = create_task_protected(self.run(db_pool), f"tse_wrapper_task {self.name}")
@@ -69,6 +149,7 @@ class TSEWrapper:
                 if self._stop:
                     return
                 LOGGER.error(f"{self.name!r}: waiting before reconnect")
+                self.metrics.reconnects += 1
 
                 ##############################################
                 LOGGER.error("checking for new transactions and fail those older than 10 seconds")
@@ -126,6 +207,7 @@ class TSEWrapper:
                             request["order_id"],
                             self.tse_id,
                         )
+                        self.metrics.failures += 1
                         # set tse_status to failed
                         await conn.execute(
                             "update tse set status='failed' where id=$1 and status='active'", self.tse_id
@@ -255,32 +337,59 @@ class TSEWrapper:
         # The TSE is now ready to be used.
         # Ready to execute signatures from the database.
 
-        while not self._stop and not self._tse_handler.is_stop_set():
-            LOGGER.info(f"TSE {self.name!r}: getting next request")
-            next_request = await self._grab_next_request(conn)
-            LOGGER.info(f"TSE {self.name!r}: {next_request=!r}")
+        # claimed requests waiting to be signed, all of them belong to distinct tills
+        queue: collections.deque[TSESignatureRequest] = collections.deque()
+        try:
+            while not self._stop and not self._tse_handler.is_stop_set():
+                if not queue:
+                    # nothing left to sign, write all results before waiting for new orders
+                    await self._flush_results(conn)
+                    LOGGER.info(f"TSE {self.name!r}: getting next requests")
+                    queue.extend(await self._grab_next_requests(conn, limit=SIGNATURE_PREFETCH_SIZE))
+                    if not queue:
+                        continue
+
+                next_request = queue.popleft()
+                LOGGER.info(f"TSE {self.name!r}: {next_request=!r}")
+                if next_request.till_id not in self._tills:
+                    LOGGER.info(f"registering new ClientID {next_request.till_id} with TSE {self.name}")
+                    await self._till_add(conn, next_request.till_id)
 
-            if next_request is not None:
                 # TODO handle unclean failures (reported via exception)
-                result = await self._sign(conn, next_request)
-                LOGGER.info(f"signature result: {result!r}")
-                if result is None:
-                    # fail this request
-                    await self._fail_request(conn, next_request, "TSE operation failed, timeout")
-                else:
-                    # the signature was completed successfully
-                    await self._request_done(conn, next_request, result)
-
-            # TODO break out of while loop if the TSE connection has failed somehow
-
-    async def _grab_next_request(self, conn: Connection, timeout: float = 2) -> typing.Optional[TSESignatureRequest]:
+                self.metrics.claim_to_sign_delay.observe(
+                    time.monotonic() - self._claimed_at.pop(next_request.order_id, time.monotonic())
+                )
+                sign_task = asyncio.create_task(self._sign(next_request))
+                try:
+                    # keep the TSE busy, write the previous results and claim further requests while it is signing
+                    await self._flush_results(conn)
+                    if not self._stop:
+                        queue.extend(await self._claim_requests(conn, limit=SIGNATURE_PREFETCH_SIZE - len(queue)))
+                finally:
+                    result = await sign_task
+                    LOGGER.info(f"signature result: {result!r}")
+                    if result is None:
+                        # fail this request
+                        self._fail_request(next_request, "TSE operation failed, timeout")
+                    else:
+                        # the signature was completed successfully
+                        self._request_done(next_request, result)
+
+                # TODO break out of while loop if the TSE connection has failed somehow
+        finally:
+            try:
+                await self._flush_results(conn)
+            finally:
+                # the queued requests were never passed to the TSE, someone can safely sign them later on
+                await self._return_requests(conn, list(queue))
+
+    async def _grab_next_requests(self, conn: Connection, limit: int, timeout: float = 2) -> list[TSESignatureRequest]:
         """
         Waits until the 'order available' event is set,
-        then fetches the next TSE signature request for this TSE from the database,
-        marks it as 'pending' and fetches all the details, returning them as a TSESignatureRequest.
+        then claims up to limit TSE signature requests for this TSE, see _claim_requests.
 
         Checks anyway after the timeout has elapsed.
-        Returns None if no signature is pending.
+        Returns an empty list if no signature is pending.
         """
         # wait until an order is potentially available
         try:
@@ -291,166 +400,177 @@ class TSEWrapper:
             LOGGER.info(f"TSE wrapper {self.name}: timeout while waiting for orders available, but checking anyway")
 
         if self._stop:
-            return None
-
-        async with conn.transaction(isolation="serializable"):
-            next_sig = await conn.fetchrow(
-                """
-                with currently_signing as (
-                    select
-                        till_id
-                    from
-                        tse_signature
-                        join ordr on ordr.id=tse_signature.id
-                    where
-                        tse_signature.signature_status = 'pending'
-                )
-                select
-                    ordr.id as order_id,
-                    till.id as till_id
-                from
-                    tse_signature
-                    join ordr on ordr.id=tse_signature.id
-                    join till on ordr.till_id=till.id
-                where
-                    tse_signature.signature_status='new' and
-                    till.tse_id = $1 and
-                    not exists (
-                        select
-                            1
-                        from
-                            currently_signing
-                        where
-                            currently_signing.till_id=ordr.till_id
-                    )
-                order by ordr.id
-                limit 1
-                """,
-                self.tse_id,
-            )
-            if next_sig is None:
-                # no orders are available, return None
-                return None
-            else:
-                # set the orders available event;
-                # that way, next time this function is called it will run instantly
-                # instead of first waiting on the event.
-                self._orders_available_event.set()
-
-            order_id = next_sig["order_id"]
-            till_id = str(
-                next_sig["till_id"]
-            )  # use till_id converted to string as TSE ClientID to satisfy naming constraints
-
-            await conn.execute(
-                """
-                update
-                    tse_signature
-                set
-                    signature_status='pending',
-                    tse_id=$1
-                where
-                    id=$2
-                """,
-                self.tse_id,
-                order_id,
-            )
+            return []
 
-        return await self._make_signature_request(conn, order_id, till_id)
+        requests = await self._claim_requests(conn, limit=limit)
+        if requests:
+            # set the orders available event;
+            # that way, next time this function is called it will run instantly
+            # instead of first waiting on the event.
+            self._orders_available_event.set()
+        return requests
 
-    async def _make_signature_request(self, conn: Connection, order_id: int, till_id: str):
+    async def _claim_requests(self, conn: Connection, limit: int) -> list[TSESignatureRequest]:
         """
-        Collects all required information for signing the order,
-        and passes the signing request to the TSE.
+        Fetches the next TSE signature requests for this TSE from the database, at most one per till,
+        marks them as 'pending' and fetches all the details, returning them as TSESignatureRequests.
         """
-        payment_method = await conn.fetchval("select payment_method from ordr where ordr.id=$1", order_id)
-        if payment_method is None:
-            raise RuntimeError(f"invalid order {order_id!r}")
-        beleg = Kassenbeleg_V1()
-        total = 0
-        try:
-            zahlungsart = PAYMENT_METHOD_TO_ZAHLUNGSART[payment_method]
-        except KeyError as exc:
-            raise RuntimeError(f"invalid payment_method {payment_method!r}") from exc
-
-        for row in await conn.fetch("select total_price, tax_name from line_item where order_id = $1", order_id):
-            beleg.add_line_item(row["total_price"], row["tax_name"])
-            total += row["total_price"]
-        # TODO: get currency from database config
-        beleg.add_zahlung(total, zahlungsart=zahlungsart, waehrung="EUR")
-
-        return TSESignatureRequest(
-            order_id=order_id,
-            till_id=till_id,
-            process_type=beleg.get_process_type(),
-            process_data=beleg.get_process_data(),
-        )
-
-    async def _return_request(self, conn: Connection, request: TSESignatureRequest):
+        if limit <= 0:
+            return []
+        claimed = await claim_signature_requests(conn=conn, tse_id=self.tse_id, limit=limit)
+        if not claimed:
+            return []
+        claimed_at = time.monotonic()
+        for order_id, _ in claimed:
+            self._claimed_at[order_id] = claimed_at
+        return await self._make_signature_requests(conn, claimed)
+
+    async def _make_signature_requests(
+        self, conn: Connection, claimed: list[tuple[int, str]]
+    ) -> list[TSESignatureRequest]:
         """
-        Returns a request which has been cleanly aborted to the database,
-        to be attempted at a later point by us or somebody else.
+        Collects all required information for signing the given (order_id, till_id) pairs
+        and builds the signing requests for the TSE.
         """
-        await conn.execute(
+        belege: dict[int, tuple[Kassenbeleg_V1, str]] = {}
+        totals: dict[int, float] = {}
+        for row in await conn.fetch(
             """
-            update tse_signature set signature_status='new', tse_id=NULL where id=$1
+            select
+                o.id as order_id,
+                o.payment_method,
+                l.total_price,
+                l.tax_name
+            from
+                ordr o
+                left join line_item l on l.order_id = o.id
+            where
+                o.id = any($1)
+            order by o.id, l.item_id
             """,
-            request.order_id,
-        )
+            [order_id for order_id, _ in claimed],
+        ):
+            order_id = row["order_id"]
+            if order_id not in belege:
+                try:
+                    zahlungsart = PAYMENT_METHOD_TO_ZAHLUNGSART[row["payment_method"]]
+                except KeyError as exc:
+                    raise RuntimeError(f"invalid payment_method {row['payment_method']!r}") from exc
+                belege[order_id] = (Kassenbeleg_V1(), zahlungsart)
+                totals[order_id] = 0
+            if row["total_price"] is not None:
+                belege[order_id][0].add_line_item(row["total_price"], row["tax_name"])
+                totals[order_id] += row["total_price"]
+
+        requests = []
+        for order_id, till_id in claimed:
+            if order_id not in belege:
+                raise RuntimeError(f"invalid order {order_id!r}")
+            beleg, zahlungsart = belege[order_id]
+            # TODO: get currency from database config
+            beleg.add_zahlung(totals[order_id], zahlungsart=zahlungsart, waehrung="EUR")
+            requests.append(
+                TSESignatureRequest(
+                    order_id=order_id,
+                    till_id=till_id,
+                    process_type=beleg.get_process_type(),
+                    process_data=beleg.get_process_data(),
+                )
+            )
+        return requests
 
-    async def _fail_request(self, conn: Connection, request: TSESignatureRequest, reason: str):
+    async def _return_requests(self, conn: Connection, requests: list[TSESignatureRequest]):
         """
-        Set the request in the database to failed
+        Returns requests which have been cleanly aborted to the database,
+        to be attempted at a later point by us or somebody else.
         """
+        if not requests:
+            return
+        for request in requests:
+            self._claimed_at.pop(request.order_id, None)
         await conn.execute(
             """
-            update tse_signature set signature_status='failure', result_message=$2 where id=$1
+            update tse_signature set signature_status='new', tse_id=NULL where id = any($1)
             """,
-            request.order_id,
-            reason,
+            [request.order_id for request in requests],
         )
 
-    async def _request_done(self, conn: Connection, request: TSESignatureRequest, result: TSESignature):
+    def _fail_request(self, request: TSESignatureRequest, reason: str):
         """
-        Writes the results from the request to the database, marking the signature
-        as done.
+        Set the request to failed, written to the database with the next _flush_results
+        """
+        self.metrics.failures += 1
+        self._results.append((request, "failure", reason, None))
+
+    def _request_done(self, request: TSESignatureRequest, result: TSESignature):
+        """
+        Marks the signature as done, the result is written to the database with the next _flush_results
         """
         LOGGER.info(f"duration {result.tse_duration}")
+        self.metrics.signatures += 1
+        self._results.append((request, "done", "success", result))
+
+    async def _flush_results(self, conn: Connection):
+        """
+        Writes the results of all finished requests to the database in one statement.
+        """
+        if not self._results:
+            return
+        results = self._results
+        self._results = []
+        try:
+            await self._write_results(conn, results)
+        except BaseException:
+            # keep the results for the next flush, their requests stay pending until then
+            self._results = results + self._results
+            raise
+
+    async def _write_results(
+        self, conn: Connection, results: list[tuple[TSESignatureRequest, str, str, TSESignature | None]]
+    ):
         await conn.execute(
             """
             update
                 tse_signature
             set
-                signature_status='done',
-                result_message='success',
-                transaction_process_type=$1,
-                transaction_process_data=$2,
-                tse_transaction=$3,
-                tse_signaturenr=$4,
-                tse_start=$5,
-                tse_end=$6,
-                tse_signature=$7,
-                tse_duration=$8
+                signature_status=r.signature_status::tse_signature_status,
+                result_message=r.result_message,
+                transaction_process_type=r.transaction_process_type,
+                transaction_process_data=r.transaction_process_data,
+                tse_transaction=r.tse_transaction,
+                tse_signaturenr=r.tse_signaturenr,
+                tse_start=r.tse_start,
+                tse_end=r.tse_end,
+                tse_signature=r.tse_signature,
+                tse_duration=r.tse_duration
+            from
+                unnest(
+                    $1::bigint[], $2::text[], $3::text[], $4::text[], $5::text[], $6::text[],
+                    $7::text[], $8::text[], $9::text[], $10::text[], $11::float8[]
+                ) as r(
+                    id, signature_status, result_message, transaction_process_type, transaction_process_data,
+                    tse_transaction, tse_signaturenr, tse_start, tse_end, tse_signature, tse_duration
+                )
             where
-                id=$9
+                tse_signature.id=r.id
             """,
-            request.process_type,
-            request.process_data,
-            str(result.tse_transaction),
-            str(result.tse_signaturenr),
-            result.tse_start,
-            result.tse_end,
-            result.tse_signature,
-            result.tse_duration,
-            request.order_id,
+            [request.order_id for request, _, _, _ in results],
+            [status for _, status, _, _ in results],
+            [message for _, _, message, _ in results],
+            [request.process_type if result else None for request, _, _, result in results],
+            [request.process_data if result else None for request, _, _, result in results],
+            [str(result.tse_transaction) if result else None for _, _, _, result in results],
+            [str(result.tse_signaturenr) if result else None for _, _, _, result in results],
+            [result.tse_start if result else None for _, _, _, result in results],
+            [result.tse_end if result else None for _, _, _, result in results],
+            [result.tse_signature if result else None for _, _, _, result in results],
+            [result.tse_duration if result else None for _, _, _, result in results],
         )
 
-    async def _sign(self, conn: Connection, signing_request: TSESignatureRequest) -> typing.Optional[TSESignature]:
+    async def _sign(self, signing_request: TSESignatureRequest) -> typing.Optional[TSESignature]:
         assert self._tse_handler is not None
-        # must be called when the TSE is connected and operational.
-        if signing_request.till_id not in self._tills:
-            LOGGER.info(f"registering new ClientID {signing_request.till_id} with TSE {self.name}")
-            await self._till_add(conn, signing_request.till_id)
+        # must be called when the TSE is connected and operational
+        # and the till is registered with the TSE.
         start = time.monotonic()
         try:
             result = await self._tse_handler.sign(signing_request)
@@ -464,6 +584,7 @@ class TSEWrapper:
         #  e.g. because self._tse_handler is no longer valid)
         LOGGER.info(f"{self.name!r}: signature done ({signing_request}) in TIME {stop - start:.3f}s")
         result.tse_duration = float(stop - start)  # duratoion
+        self.metrics.signature_duration.observe(result.tse_duration)
         return result
 
     async def _till_add(self, conn: Connection, till):